@@ -0,0 +1,198 @@
+import time
+
+from bitboard import full_lines_mask, get_shape_masks, shape_key
+from game_state import BLOCK_SHAPES, LINE_CLEAR_POINTS
+
+# советчик ходов: лучевой поиск по порядку и позициям блоков из лотка с таблицей транспозиций.
+# работает прямо на битовых масках и укладывается в заданный бюджет времени
+
+DEFAULT_TIME_BUDGET = 0.016
+DEFAULT_BEAM_WIDTH = 48
+EVAL_CACHE_LIMIT = 200000
+DEADLINE_SHARE = 0.9
+
+# веса эвристики; ключи совпадают с признаками в BoardEvaluator.features
+DEFAULT_WEIGHTS = {
+    "points": 1.0,
+    "empty_cells": 1.5,
+    "isolated_holes": -12.0,
+    "transitions": -1.5,
+    # ожидание для следующей раздачи: сколько форм вообще помещается на поле
+    "placeable_shapes": 10.0,
+}
+
+
+# признаки доски для эвристики, считаются битовыми операциями, результат кэшируется
+class BoardEvaluator:
+    def __init__(self, size, weights=None, block_shapes=BLOCK_SHAPES):
+        self.size = size
+        self.weights = dict(DEFAULT_WEIGHTS if weights is None else weights)
+        self.full_mask = (1 << size * size) - 1
+        left_column = sum(1 << (r * size) for r in range(size))
+        self.not_left = self.full_mask & ~left_column
+        self.not_right = self.full_mask & ~(left_column << (size - 1))
+        unique = {}
+        for block_shape in block_shapes:
+            unique.setdefault(shape_key(block_shape), get_shape_masks(block_shape, size))
+        self.shape_masks = list(unique.values())
+        self.cache = {}
+
+    def features(self, occupancy):
+        size = self.size
+        empty = ~occupancy & self.full_mask
+        # пустая клетка, у которой нет ни одного пустого соседа
+        has_empty_neighbour = ((empty << 1) & self.not_left) | ((empty >> 1) & self.not_right) \
+            | (empty << size) | (empty >> size)
+        isolated = empty & ~has_empty_neighbour
+        # смены "занято/пусто" между соседними клетками по строкам и столбцам
+        horizontal = (occupancy ^ (occupancy >> 1)) & self.not_right
+        vertical = (occupancy ^ (occupancy >> size)) & (self.full_mask >> size)
+        placeable = 0
+        for masks in self.shape_masks:
+            for _, mask in masks.anchors:
+                if not occupancy & mask:
+                    placeable += 1
+                    break
+        return {
+            "empty_cells": bin(empty).count("1"),
+            "isolated_holes": bin(isolated).count("1"),
+            "transitions": bin(horizontal).count("1") + bin(vertical).count("1"),
+            "placeable_shapes": placeable,
+        }
+
+    # оценка доски без учета набранных очков
+    def board_value(self, occupancy):
+        value = self.cache.get(occupancy)
+        if value is None:
+            if len(self.cache) >= EVAL_CACHE_LIMIT:
+                self.cache.clear()
+            weights = self.weights
+            value = sum(weights.get(name, 0.0) * amount for name, amount in self.features(occupancy).items())
+            self.cache[occupancy] = value
+        return value
+
+    def value(self, occupancy, points):
+        return self.weights.get("points", 0.0) * points + self.board_value(occupancy)
+
+
+# результат поиска: ходы в порядке выполнения, индексы - позиции в исходном лотке
+class Advice:
+    def __init__(self, moves, value, nodes, elapsed, complete):
+        self.moves = moves
+        self.value = value
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.complete = complete
+
+    @property
+    def first_move(self):
+        return self.moves[0] if self.moves else None
+
+    def nodes_per_second(self):
+        return self.nodes / self.elapsed if self.elapsed else 0.0
+
+
+class MoveAdvisor:
+    def __init__(self, size, weights=None, beam_width=DEFAULT_BEAM_WIDTH, depth=None,
+                 time_budget=DEFAULT_TIME_BUDGET, line_clear_points=LINE_CLEAR_POINTS, block_shapes=BLOCK_SHAPES):
+        self.size = size
+        self.evaluator = BoardEvaluator(size, weights, block_shapes)
+        self.beam_width = beam_width
+        # depth=None - искать до конца лотка
+        self.depth = depth
+        self.time_budget = time_budget
+        self.line_clear_points = line_clear_points
+
+    # tray - формы в лотке, forced_first - индекс блока, который обязан идти первым (уже взят в руку)
+    def advise(self, occupancy, tray, forced_first=None):
+        perf_counter = time.perf_counter
+        start = perf_counter()
+        # часть бюджета оставляем на сортировку последнего уровня
+        deadline = start + self.time_budget * DEADLINE_SHARE
+        size = self.size
+        shape_masks = [get_shape_masks(block_shape, size) for block_shape in tray]
+        shape_keys = [masks.key for masks in shape_masks]
+        depth = len(tray) if self.depth is None else min(self.depth, len(tray))
+        evaluator = self.evaluator
+        points_per_line = self.line_clear_points
+
+        # узел: (оценка, занятость, набранные очки, оставшиеся индексы, ходы)
+        beam = [(evaluator.value(occupancy, 0), occupancy, 0, tuple(range(len(tray))), ())]
+        # таблица транспозиций: (занятость, оставшиеся формы) -> лучшие очки, с которыми туда приходили
+        seen = {}
+        best = None
+        nodes = 0
+        complete = True
+
+        for level in range(depth):
+            children = []
+            for _, node_occupancy, points, remaining, moves in beam:
+                tried_shapes = set()
+                candidates = remaining if level or forced_first is None else (forced_first,)
+                for tray_index in candidates:
+                    # одинаковые формы в лотке дают одинаковые ветки
+                    if shape_keys[tray_index] in tried_shapes:
+                        continue
+                    tried_shapes.add(shape_keys[tray_index])
+                    masks = shape_masks[tray_index]
+                    rest = tuple(i for i in remaining if i != tray_index)
+                    rest_key = tuple(sorted(shape_keys[i] for i in rest))
+                    for (grid_r, grid_c), mask in masks.anchors:
+                        if node_occupancy & mask:
+                            continue
+                        if perf_counter() > deadline:
+                            complete = False
+                            break
+                        nodes += 1
+                        placed = node_occupancy | mask
+                        cleared, lines = full_lines_mask(placed, size)
+                        placed &= ~cleared
+                        gained = points + masks.cell_count + lines * points_per_line
+                        table_key = (placed, rest_key)
+                        if seen.get(table_key, -1) >= gained:
+                            continue
+                        seen[table_key] = gained
+                        children.append((evaluator.value(placed, gained), placed, gained, rest,
+                                         moves + ((tray_index, grid_r, grid_c),)))
+                    if not complete:
+                        break
+                if not complete:
+                    break
+            if not children:
+                break
+            children.sort(key=lambda node: node[0], reverse=True)
+            beam = children[:self.beam_width]
+            best = beam[0]
+            if not complete:
+                break
+
+        elapsed = time.perf_counter() - start
+        if best is None:
+            return Advice([], None, nodes, elapsed, complete)
+        return Advice(list(best[4]), best[0], nodes, elapsed, complete)
+
+    # совет для живой партии GameState (или BlockBlast с блоком в руке)
+    def advise_state(self, state, held_block=None):
+        tray = list(state.available_blocks)
+        forced_first = None
+        if held_block is not None:
+            tray.append(held_block)
+            forced_first = len(tray) - 1
+        return self.advise(state.grid.occupancy, tray, forced_first)
+
+
+# политика для selfplay: первый ход лучшей найденной последовательности.
+# бюджет времени отключен, иначе партия зависела бы от скорости машины
+_policy_advisors = {}
+
+
+def advisor_policy(state, moves, rng):
+    # в ключе id набора форм; сам набор хранится рядом, чтобы id не достался другому объекту
+    key = (state.grid_size, id(state.block_shapes), state.line_clear_points)
+    entry = _policy_advisors.get(key)
+    if entry is None:
+        advisor = MoveAdvisor(state.grid_size, time_budget=float("inf"),
+                              line_clear_points=state.line_clear_points, block_shapes=state.block_shapes)
+        entry = (advisor, state.block_shapes)
+        _policy_advisors[key] = entry
+    return entry[0].advise_state(state).first_move or moves[0]
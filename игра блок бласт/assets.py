@@ -0,0 +1,188 @@
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
+
+import pygame
+
+# загрузка ресурсов без задержки первого кадра: фон берется из дискового кэша уже масштабированным,
+# музыка и звуки грузятся в фоновом потоке, шрифты создаются при первом обращении
+
+CACHE_DIR_ENV = "BLOCKBLAST_CACHE_DIR"
+# сколько последних размеров фона хранится на диске (окно, полный экран и еще один)
+BACKGROUND_CACHE_SIZES = 3
+
+
+def default_cache_dir():
+    base = os.environ.get(CACHE_DIR_ENV)
+    if base:
+        return base
+    xdg = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(xdg, "block_blast")
+
+
+class AssetManager:
+    def __init__(self, asset_dir, cache_dir=None, font_specs=None):
+        self.asset_dir = asset_dir
+        self.cache_dir = cache_dir or default_cache_dir()
+        # имя шрифта -> (семейство, размер, жирный)
+        self.font_specs = dict(font_specs or {})
+        self.fonts = {}
+        self.loaded = queue.Queue()
+        self.threads = []
+        # фон декодируется по одному: нужный сейчас (имя, размер), с какого момента его можно начинать
+        # и поток, который уже работает. пока размер окна меняется, декодировать нечего
+        self.background_lock = threading.Lock()
+        self.background_wanted = None
+        self.background_due = 0.0
+        self.background_thread = None
+
+    def path(self, name):
+        return os.path.join(self.asset_dir, name)
+
+    # шрифт под масштаб раскладки; у каждого размера свой объект, после смены масштаба назад он не создается заново
+    def font(self, name, scale=1.0):
+        family, size, bold = self.font_specs[name]
+        size = max(1, round(size * scale))
+        font = self.fonts.get((name, size))
+        if font is None:
+            font = pygame.font.SysFont(family, size, bold=bold)
+            self.fonts[(name, size)] = font
+        return font
+
+    # имя файла кэша зависит от времени изменения и размера исходника и от разрешения
+    def background_cache_path(self, name, size):
+        stat = os.stat(self.path(name))
+        stem = os.path.splitext(name)[0]
+        return os.path.join(self.cache_dir, f"{stem}_{size[0]}x{size[1]}_{stat.st_mtime_ns}_{stat.st_size}.rgb")
+
+    # фон: из кэша сразу, иначе заглушка цвета fallback_color (или растянутый placeholder - прежний фон
+    # при смене размера окна), а картинка нужного размера приедет через poll(). декодирование начнется
+    # не раньше чем через delay_ms: при перетаскивании края окна размер меняется каждый кадр
+    def load_background(self, name, size, fallback_color, placeholder=None, delay_ms=0):
+        size = tuple(size)
+        cached = self._read_background_cache(name, size)
+        with self.background_lock:
+            self.background_wanted = None if cached is not None else (name, size)
+            self.background_due = time.monotonic() + delay_ms / 1000
+        if cached is not None:
+            return cached
+
+        self._start_background_decode()
+        if placeholder is not None:
+            return pygame.transform.scale(placeholder, size)
+        placeholder = pygame.Surface(size)
+        placeholder.fill(fallback_color)
+        return placeholder
+
+    def _read_background_cache(self, name, size):
+        try:
+            cache_path = self.background_cache_path(name, size)
+            with open(cache_path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) != size[0] * size[1] * 3:
+            return None
+        # время файла - когда размер нужен был последний раз, по нему чистится кэш
+        try:
+            os.utime(cache_path)
+        except OSError:
+            pass
+        return pygame.image.frombytes(data, size, "RGB").convert()
+
+    # новый поток только когда прежний закончил, а размер не меняется delay_ms
+    def _start_background_decode(self):
+        with self.background_lock:
+            request = self.background_wanted
+            if request is None or time.monotonic() < self.background_due:
+                return
+            if self.background_thread is not None and self.background_thread.is_alive():
+                return
+            self.background_thread = self._start(self._decode_background, *request)
+
+    def _decode_background(self, name, size):
+        try:
+            surface = pygame.transform.scale(pygame.image.load(self.path(name)), size)
+        except (pygame.error, FileNotFoundError) as e:
+            surface = None
+            error = e
+        with self.background_lock:
+            # пока шло декодирование, окно сменило размер: результат не нужен, следующий запустит poll()
+            if self.background_wanted != (name, size):
+                return
+            self.background_wanted = None
+        if surface is None:
+            self.loaded.put(("error", "background", f"Ошибка загрузки фона: {error}"))
+            return
+        self.loaded.put(("background", name, surface))
+        self._write_background_cache(name, size, surface)
+
+    # запись через временный файл и os.replace, чтобы другой процесс не прочитал недописанный кэш
+    def _write_background_cache(self, name, size, surface):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            cache_path = self.background_cache_path(name, size)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(pygame.image.tobytes(surface, "RGB"))
+            os.replace(tmp_path, cache_path)
+            self._prune_background_cache(name)
+        except (OSError, pygame.error) as e:
+            print(f"Не удалось сохранить кэш фона: {e}")
+
+    # у каждого размера окна свой файл в полный кадр: остаются только последние нужные
+    def _prune_background_cache(self, name):
+        stem = os.path.splitext(name)[0]
+        pattern = re.compile(re.escape(stem) + r"_\d+x\d+_\d+_\d+\.rgb")
+        paths = [os.path.join(self.cache_dir, entry) for entry in os.listdir(self.cache_dir)
+                 if pattern.fullmatch(entry)]
+        paths.sort(key=os.path.getmtime, reverse=True)
+        for path in paths[BACKGROUND_CACHE_SIZES:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # музыка и звуки эффектов в фоне: sounds - словарь ключ -> имя файла
+    def load_audio(self, music_name, sounds):
+        self._start(self._decode_audio, music_name, dict(sounds))
+
+    def _decode_audio(self, music_name, sounds):
+        try:
+            for key, name in sounds.items():
+                self.loaded.put(("sound", key, pygame.mixer.Sound(self.path(name))))
+            pygame.mixer.music.load(self.path(music_name))
+            self.loaded.put(("music", music_name, True))
+        except (pygame.error, FileNotFoundError) as e:
+            self.loaded.put(("error", "audio", f"Ошибка загрузки звуков: {e}. Звуки будут отключены."))
+
+    def _start(self, target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        self.threads.append(thread)
+        thread.start()
+        return thread
+
+    # забирает готовые ресурсы в главном потоке; поверхности конвертируются здесь, под формат экрана
+    def poll(self):
+        self._start_background_decode()
+        ready = []
+        while True:
+            try:
+                kind, key, value = self.loaded.get_nowait()
+            except queue.Empty:
+                return ready
+            if kind == "background":
+                value = value.convert()
+            ready.append((kind, key, value))
+
+    def pending(self):
+        self.threads = [thread for thread in self.threads if thread.is_alive()]
+        return bool(self.threads) or not self.loaded.empty() or self.background_wanted is not None
+
+    # ожидание всех фоновых загрузок (для тестовых прогонов и бенчмарков)
+    def wait(self, timeout=None):
+        for thread in self.threads:
+            thread.join(timeout)
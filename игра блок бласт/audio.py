@@ -0,0 +1,156 @@
+import queue
+import threading
+import time
+
+import pygame
+
+# звук в отдельном потоке: кадр только кладет команды в очередь, а поток сам вызывает микшер.
+# у каждого эффекта свои зарезервированные каналы, так что частые очистки линий не обрывают
+# друг друга и не отнимают канал у другого эффекта. громкость со слайдеров применяется не чаще
+# раза в VOLUME_DEBOUNCE_MS - при перетаскивании слайдера берется только последнее значение
+
+VOLUME_DEBOUNCE_MS = 50
+# каналов на эффект по умолчанию
+DEFAULT_CHANNELS = 2
+
+
+class AudioService:
+    # channels - словарь эффект -> число каналов, multipliers - эффект -> множитель громкости
+    def __init__(self, channels, multipliers=None, music_volume=0.5, effect_volume=0.5,
+                 debounce_ms=VOLUME_DEBOUNCE_MS):
+        self.multipliers = dict(multipliers or {})
+        self.debounce_s = debounce_ms / 1000
+        self.sounds = {}
+        self.pools = {}
+        self.next_channel = {}
+        self.enabled = pygame.mixer.get_init() is not None
+        if self.enabled:
+            total = sum(channels.values())
+            pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), total))
+            # зарезервированные каналы не достаются вызовам Sound.play() без канала
+            pygame.mixer.set_reserved(total)
+            first = 0
+            for name, count in channels.items():
+                self.pools[name] = [pygame.mixer.Channel(i) for i in range(first, first + count)]
+                self.next_channel[name] = 0
+                first += count
+
+        self.music_volume = music_volume
+        self.effect_volume = effect_volume
+        # последние значения громкости, которые еще не дошли до микшера
+        self.pending_volume = {}
+        self.volume_lock = threading.Lock()
+        self.last_volume_apply = 0.0
+
+        self.commands = queue.Queue()
+        self.played = 0
+        self.volume_applies = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    # команды из кадра: только очередь, без вызовов микшера
+    def register(self, name, sound):
+        self.commands.put(("register", name, sound))
+
+    def play(self, name):
+        self.commands.put(("play", name))
+
+    def play_music(self, loops=-1):
+        self.commands.put(("music_play", loops))
+
+    def stop_music(self):
+        self.commands.put(("music_stop",))
+
+    def set_music_volume(self, volume):
+        self._set_volume("music", volume)
+
+    def set_effect_volume(self, volume):
+        self._set_volume("effects", volume)
+
+    # новая громкость заменяет еще не примененную, в очередь попадает одно напоминание
+    def _set_volume(self, kind, volume):
+        with self.volume_lock:
+            wake = not self.pending_volume
+            self.pending_volume[kind] = volume
+        if wake:
+            self.commands.put(("volume",))
+
+    def _run(self):
+        while True:
+            timeout = None
+            if self.pending_volume:
+                timeout = max(0.0, self.last_volume_apply + self.debounce_s - time.perf_counter())
+            try:
+                command = self.commands.get(timeout=timeout)
+            except queue.Empty:
+                command = None
+            if command and command[0] == "stop":
+                break
+            try:
+                if command:
+                    self._execute(command)
+                if self.pending_volume and time.perf_counter() - self.last_volume_apply >= self.debounce_s:
+                    self._apply_volume()
+            except pygame.error as e:
+                print(f"Ошибка звука: {e}")
+
+    # "volume" только будит поток: громкость применяется в _run, когда пройдет пауза
+    def _execute(self, command):
+        kind = command[0]
+        if kind == "call":
+            command[1].set()
+        elif kind == "register":
+            self.sounds[command[1]] = command[2]
+        elif not self.enabled:
+            return
+        elif kind == "play":
+            self._play(command[1])
+        elif kind == "music_play":
+            pygame.mixer.music.set_volume(self.music_volume)
+            pygame.mixer.music.play(command[1])
+        elif kind == "music_stop":
+            pygame.mixer.music.stop()
+
+    def _apply_volume(self):
+        with self.volume_lock:
+            pending = self.pending_volume
+            self.pending_volume = {}
+        self.last_volume_apply = time.perf_counter()
+        self.volume_applies += 1
+        if "music" in pending:
+            self.music_volume = pending["music"]
+            if self.enabled:
+                pygame.mixer.music.set_volume(self.music_volume)
+        if "effects" in pending:
+            self.effect_volume = pending["effects"]
+
+    # свободный канал из пула эффекта, если все заняты - тот, что запускался раньше всех
+    def _play(self, name):
+        sound = self.sounds.get(name)
+        pool = self.pools.get(name)
+        if sound is None or not pool:
+            return
+        start = self.next_channel[name]
+        channel = pool[start]
+        for offset in range(len(pool)):
+            candidate = pool[(start + offset) % len(pool)]
+            if not candidate.get_busy():
+                channel = candidate
+                start = (start + offset) % len(pool)
+                break
+        self.next_channel[name] = (start + 1) % len(pool)
+        channel.set_volume(min(1.0, self.effect_volume * self.multipliers.get(name, 1.0)))
+        channel.play(sound)
+        self.played += 1
+
+    # ожидание, пока поток не выполнит все отправленные команды (для тестовых прогонов)
+    def flush(self, timeout=1.0):
+        done = threading.Event()
+        self.commands.put(("call", done))
+        done.wait(timeout)
+
+    def close(self):
+        if self.thread.is_alive():
+            self.stop_music()
+            self.commands.put(("stop",))
+            self.thread.join()
@@ -0,0 +1,200 @@
+import numpy as np
+
+from bitboard import get_line_masks, get_shape_masks, shape_key
+from game_state import GRID_SIZE, LINE_CLEAR_POINTS
+
+# пакетная оценка множества досок сразу: доски - массив bool формы (N, size, size).
+# правила те же, что у GameState: очки за клетки формы плюс line_clear_points за каждую полную
+# строку и столбец, полные линии снимаются одновременно после постановки.
+# доски до 8x8 внутри упаковываются в uint64 с той же нумерацией битов, что у BitGrid,
+# и считаются побитовыми операциями над массивами; большие поля считаются на массивах bool
+
+PACKED_MAX_CELLS = 64
+
+
+# целые числа занятости (как BitGrid.occupancy) -> доски (N, size, size)
+def occupancy_to_boards(occupancies, size=GRID_SIZE):
+    byte_count = (size * size + 7) // 8
+    data = b"".join(occupancy.to_bytes(byte_count, "little") for occupancy in occupancies)
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8).reshape(-1, byte_count), axis=1, bitorder="little")
+    return bits[:, :size * size].reshape(-1, size, size).astype(bool)
+
+
+def boards_to_occupancies(boards):
+    count, size, _ = boards.shape
+    packed = np.packbits(boards.reshape(count, size * size), axis=1, bitorder="little")
+    return [int.from_bytes(row.tobytes(), "little") for row in packed]
+
+
+# доски (..., size, size) при size * size <= 64 -> uint64 (...)
+def pack_boards(boards):
+    size = boards.shape[-1]
+    flat = boards.reshape(-1, size * size)
+    if size * size < PACKED_MAX_CELLS:
+        flat = np.pad(flat, ((0, 0), (0, PACKED_MAX_CELLS - size * size)))
+    packed = np.packbits(flat, axis=1, bitorder="little").view("<u8")
+    return packed.reshape(boards.shape[:-2]).astype(np.uint64)
+
+
+def unpack_boards(packed, size):
+    data = np.ascontiguousarray(packed, dtype="<u8").reshape(-1, 1).view(np.uint8)
+    bits = np.unpackbits(data, axis=1, bitorder="little")[:, :size * size]
+    return bits.reshape(*np.shape(packed), size, size).astype(bool)
+
+
+# якоря формы и ее маска в каждом якоре, в том же порядке, что ShapeMasks.anchors
+class ShapeBatchMasks:
+    def __init__(self, block_shape, size):
+        masks = get_shape_masks(block_shape, size)
+        self.cell_count = masks.cell_count
+        self.anchors = np.array([anchor for anchor, _ in masks.anchors], dtype=np.int16).reshape(-1, 2)
+        self.masks = occupancy_to_boards([mask for _, mask in masks.anchors], size)
+        self.packed = None
+        if size * size <= PACKED_MAX_CELLS:
+            self.packed = np.array([mask for _, mask in masks.anchors], dtype=np.uint64)
+        self.index = {anchor: i for i, (anchor, _) in enumerate(masks.anchors)}
+
+
+_batch_masks = {}
+_packed_line_masks = {}
+
+
+def get_batch_masks(block_shape, size):
+    key = (shape_key(block_shape), size)
+    masks = _batch_masks.get(key)
+    if masks is None:
+        masks = ShapeBatchMasks(block_shape, size)
+        _batch_masks[key] = masks
+    return masks
+
+
+def get_packed_line_masks(size):
+    masks = _packed_line_masks.get(size)
+    if masks is None:
+        row_masks, col_masks = get_line_masks(size)
+        masks = np.array(row_masks + col_masks, dtype=np.uint64)
+        _packed_line_masks[size] = masks
+    return masks
+
+
+# снимает полные строки и столбцы; доски любой формы (..., size, size)
+def clear_full_lines(boards):
+    full_rows = boards.all(axis=-1)
+    full_cols = boards.all(axis=-2)
+    lines = full_rows.sum(axis=-1) + full_cols.sum(axis=-1)
+    cleared = boards & ~(full_rows[..., :, None] | full_cols[..., None, :])
+    return cleared, lines
+
+
+# то же для упакованных досок любой формы
+def clear_full_lines_packed(packed, size):
+    lines = np.zeros(packed.shape, dtype=np.int64)
+    cleared = np.zeros(packed.shape, dtype=np.uint64)
+    zero = np.uint64(0)
+    for mask in get_packed_line_masks(size):
+        full = (packed & mask) == mask
+        lines += full
+        cleared |= np.where(full, mask, zero)
+    return packed & ~cleared, lines
+
+
+# результат для всех якорей одной формы: оси (доска, якорь)
+class PlacementBatch:
+    def __init__(self, anchors, legal, lines, score_delta, size, boards=None, packed=None):
+        # anchors - (A, 2) строка и столбец якоря
+        self.anchors = anchors
+        # legal - (N, A); для недопустимых ходов доска остается прежней, линии и очки - нули
+        self.legal = legal
+        self.lines = lines
+        self.score_delta = score_delta
+        self.size = size
+        self._boards = boards
+        # упакованные доски после хода (N, A) uint64, если поле не больше 8x8
+        self.packed = packed
+
+    # доски после хода (N, A, size, size); из упакованных распаковываются при первом обращении
+    @property
+    def boards(self):
+        if self._boards is None:
+            self._boards = unpack_boards(self.packed, self.size)
+        return self._boards
+
+    def legal_count(self):
+        return self.legal.sum(axis=1)
+
+
+def legal_placements(boards, block_shape):
+    size = boards.shape[-1]
+    masks = get_batch_masks(block_shape, size)
+    if masks.packed is not None:
+        return (pack_boards(boards)[:, None] & masks.packed[None]) == 0
+    return ~(boards[:, None] & masks.masks[None]).any(axis=(2, 3))
+
+
+# все постановки формы на все доски
+def evaluate_placements(boards, block_shape, line_clear_points=LINE_CLEAR_POINTS):
+    size = boards.shape[-1]
+    masks = get_batch_masks(block_shape, size)
+    if masks.packed is not None:
+        packed = pack_boards(boards)[:, None]
+        legal = (packed & masks.packed[None]) == 0
+        placed = np.where(legal, packed | masks.packed[None], packed)
+        after, lines = clear_full_lines_packed(placed, size)
+        after = np.where(legal, after, packed)
+        lines = np.where(legal, lines, 0)
+        score_delta = np.where(legal, masks.cell_count + lines * line_clear_points, 0)
+        return PlacementBatch(masks.anchors, legal, lines, score_delta, size, packed=after)
+
+    # большие поля: память - N * A * size * size байт, большие пачки лучше делить
+    stacked = boards[:, None]
+    legal = ~(stacked & masks.masks[None]).any(axis=(2, 3))
+    placed = stacked | (masks.masks[None] & legal[:, :, None, None])
+    after, lines = clear_full_lines(placed)
+    after = np.where(legal[:, :, None, None], after, stacked)
+    lines = np.where(legal, lines, 0)
+    score_delta = np.where(legal, masks.cell_count + lines * line_clear_points, 0)
+    return PlacementBatch(masks.anchors, legal, lines, score_delta, size, boards=after)
+
+
+# одна постановка на каждую доску: rows и cols - массивы длины N.
+# возвращает (доски после хода, линии, очки, допустимость хода)
+def place_batch(boards, block_shape, rows, cols, line_clear_points=LINE_CLEAR_POINTS):
+    size = boards.shape[-1]
+    masks = get_batch_masks(block_shape, size)
+    anchor_ids = np.array([masks.index.get((int(r), int(c)), -1) for r, c in zip(rows, cols)], dtype=np.int64)
+    in_bounds = anchor_ids >= 0
+    shape_boards = masks.masks[np.where(in_bounds, anchor_ids, 0)] & in_bounds[:, None, None]
+    legal = in_bounds & ~(boards & shape_boards).any(axis=(1, 2))
+    placed = boards | (shape_boards & legal[:, None, None])
+    after, lines = clear_full_lines(placed)
+    after = np.where(legal[:, None, None], after, boards)
+    lines = np.where(legal, lines, 0)
+    score_delta = np.where(legal, masks.cell_count + lines * line_clear_points, 0)
+    return after, lines, score_delta, legal
+
+
+# для каждой доски: помещается ли хоть одна форма ее лотка. occupancies - целые числа занятости,
+# trays - списки форм. каждая форма проверяется один раз для всех досок, где она есть в лотке;
+# формы лотков обычно одни и те же объекты из набора правил, поэтому группировка идет по id
+def trays_fit(occupancies, trays, size=GRID_SIZE):
+    fits = np.zeros(len(occupancies), dtype=bool)
+    boards_by_shape = {}
+    for board_index, tray in enumerate(trays):
+        for block_shape in tray:
+            entry = boards_by_shape.get(id(block_shape))
+            if entry is None:
+                entry = boards_by_shape[id(block_shape)] = (block_shape, [])
+            entry[1].append(board_index)
+    if size * size <= PACKED_MAX_CELLS:
+        packed = np.array(occupancies, dtype=np.uint64)
+    else:
+        boards = occupancy_to_boards(occupancies, size)
+    for block_shape, board_indexes in boards_by_shape.values():
+        board_indexes = np.array(board_indexes, dtype=np.int64)
+        masks = get_batch_masks(block_shape, size)
+        if masks.packed is not None:
+            legal = (packed[board_indexes, None] & masks.packed[None]) == 0
+        else:
+            legal = ~(boards[board_indexes, None] & masks.masks[None]).any(axis=(2, 3))
+        fits[board_indexes] |= legal.any(axis=1)
+    return fits
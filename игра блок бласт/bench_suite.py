@@ -0,0 +1,312 @@
+import argparse
+import asyncio
+import contextlib
+import gc
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+# окно и звук - пустые драйверы SDL, набор идет без экрана и звуковой карты
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from bitboard import get_line_masks
+from game_state import GameState
+from profiler import percentile
+from replay import REPLAY_DIR_ENV
+from scores import SCORES_DB_ENV
+
+# набор бенчмарков для сравнения прогонов: правила игры, отрисовка и целые сессии через
+# game_loop_iteration с синтетическим игроком. у каждого замера value - время одной операции в
+# микросекундах (меньше - лучше), результат пишется в JSON. с --baseline замеры сравниваются
+# с прошлым файлом результатов, и замедление больше чем на threshold дает код выхода 1:
+#   python bench_suite.py --out base.json
+#   python bench_suite.py --baseline base.json --threshold 0.25
+
+DEFAULT_THRESHOLD = 0.25
+REPEAT = 5
+PARTICLE_BURST = 200
+
+
+# повторы замера на свежих данных, берется лучший: prepare() - данные, run(data) - число операций.
+# сборщик мусора на время замера выключен, как в timeit
+def best_time(prepare, run, repeat=REPEAT):
+    best = None
+    for _ in range(repeat):
+        data = prepare()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            count = run(data)
+            per_op = (time.perf_counter() - start) / count * 1e6
+        finally:
+            gc.enable()
+        best = per_op if best is None else min(best, per_op)
+    return best
+
+
+# партии на случайных досках заданной заполненности, индекс мест включен, как в игре
+def make_states(count, seed, densities=(0.3, 0.6, 0.85)):
+    rng = random.Random(seed)
+    states = []
+    for _ in range(count):
+        state = GameState(random.Random(rng.getrandbits(32)))
+        state.grid.fill_random(rng.choice(densities), state.colors, rng)
+        states.append(state)
+    return states
+
+
+def bench_can_place(size):
+    states = make_states(size, 1)
+    calls = [(state, block_shape, grid_r, grid_c) for state in states for block_shape in state.block_shapes
+             for grid_r in range(state.grid_size) for grid_c in range(state.grid_size)]
+
+    def run(calls):
+        for state, block_shape, grid_r, grid_c in calls:
+            state.can_place_block_at(block_shape, grid_r, grid_c)
+        return len(calls)
+
+    return {"value": best_time(lambda: calls, run), "calls": len(calls)}
+
+
+# на каждой доске одна-три полные линии; доски готовятся заново перед каждым повтором
+def bench_clear_lines(size):
+    def prepare():
+        rng = random.Random(2)
+        states = make_states(size, 2, (0.3, 0.6))
+        for state in states:
+            row_masks, col_masks = get_line_masks(state.grid_size)
+            for mask in rng.sample(row_masks + col_masks, rng.randint(1, 3)):
+                state.grid.fill_mask(mask & ~state.grid.occupancy, itertools.repeat(rng.choice(state.colors)))
+        return states
+
+    def run(states):
+        for state in states:
+            state.clear_completed_lines()
+        return len(states)
+
+    return {"value": best_time(prepare, run), "boards": size}
+
+
+def bench_game_over(size):
+    states = make_states(size, 3, (0.6, 0.85, 0.95))
+    rng = random.Random(3)
+    for state in states:
+        state.available_blocks = [rng.choice(state.block_shapes) for _ in range(3)]
+
+    def run(states):
+        for state in states:
+            state.check_if_game_is_over()
+        return len(states)
+
+    return {"value": best_time(lambda: states * 20, run), "boards": size}
+
+
+def bench_draw_3d_block(game, size):
+    calls = [(game.grid_offset_x + c * game.cell_size, game.grid_offset_y + r * game.cell_size, color)
+             for r in range(game.grid_size) for c in range(game.grid_size) for color in game.colors][:size]
+
+    def run(calls):
+        for x, y, color in calls:
+            game.draw_3d_block(x, y, color)
+        return len(calls)
+
+    return {"value": best_time(lambda: calls, run), "calls": len(calls)}
+
+
+# вспышка частиц посреди поля: время draw_particles на кадр, пока частицы живы
+def bench_particle_burst(game, repeat=3):
+    best = None
+    for _ in range(repeat):
+        game.particles.clear()
+        game.particles.emit(game.grid_offset_x + game.grid_size * game.cell_size // 2,
+                            game.grid_offset_y + game.grid_size * game.cell_size // 2, PARTICLE_BURST)
+        frame_times = []
+        while game.particles and len(frame_times) < 600:
+            game.update_particles()
+            start = time.perf_counter()
+            game.draw_particles()
+            frame_times.append((time.perf_counter() - start) * 1e6)
+        result = {"value": sum(frame_times) / len(frame_times), "peak": max(frame_times), "frames": len(frame_times)}
+        if best is None or result["value"] < best["value"]:
+            best = result
+    game.particles.clear()
+    return best
+
+
+# полная перерисовка кадра в окне size; с render_height кадр рисуется в поверхность меньше окна,
+# а растягивает его SDL при выводе. после замера окно возвращается к прежнему размеру
+def bench_full_frame(game, size, render_height=None, frames=60):
+    windowed_size, old_render_height = game.windowed_size, game.render_height
+    game.windowed_size, game.render_height = size, render_height
+    try:
+        game.set_window_mode(False)
+        game.assets.wait()
+        game.apply_loaded_assets()
+        surface_size = game.screen.get_size()
+
+        def run(_):
+            for _ in range(frames):
+                game.profiler.begin_frame()
+                game.dirty.mark_all()
+                game.update_and_draw(0, 0)
+            return frames
+
+        value = best_time(lambda: None, run)
+    finally:
+        game.windowed_size, game.render_height = windowed_size, old_render_height
+        game.set_window_mode(False)
+    return {"value": value, "window": f"{size[0]}x{size[1]}", "surface": f"{surface_size[0]}x{surface_size[1]}"}
+
+
+# сессия как у игрока: синтетический игрок берет блоки, тащит и ставит их, иногда возвращает
+# блок правой кнопкой и двигает слайдеры. после конца партии сразу начинается новая
+def bench_session(game, frames, seed=5):
+    from input_source import PygameInput, ScriptedInput, SyntheticPlayer
+    player = SyntheticPlayer(game, seed)
+    game.input = ScriptedInput(player)
+    frame_times = []
+    finished_moves = 0
+    games = 1
+
+    async def play():
+        nonlocal finished_moves, games
+        while len(frame_times) < frames:
+            if game.game_over:
+                # экран конца игры - отдельный цикл, здесь партия начинается заново сразу
+                finished_moves += game.moves_made
+                games += 1
+                game.reset_game_state()
+                game.input.frames.clear()
+            start = time.perf_counter()
+            await game.game_loop_iteration()
+            frame_times.append((time.perf_counter() - start) * 1e6)
+
+    started = time.perf_counter()
+    try:
+        asyncio.run(play())
+    finally:
+        game.input = PygameInput()
+    elapsed = time.perf_counter() - started
+    moves = finished_moves + game.moves_made
+    ordered = sorted(frame_times)
+    return {"value": sum(frame_times) / len(frame_times), "p95": percentile(ordered, 95),
+            "p99": percentile(ordered, 99), "frames": len(frame_times), "moves": moves, "games": games,
+            "moves_per_second": moves / elapsed}
+
+
+# окно игры без ограничения частоты кадров; результаты и реплеи пишутся во временный каталог
+def make_game(data_dir):
+    os.environ[SCORES_DB_ENV] = os.path.join(data_dir, "scores.sqlite3")
+    os.environ[REPLAY_DIR_ENV] = os.path.join(data_dir, "replays")
+    import block_blast2
+    game = block_blast2.BlockBlast()
+    game.frame_limit = False
+    game.assets.wait()
+    game.apply_loaded_assets()
+    return game
+
+
+def close_game(game):
+    import pygame
+    game.audio.close()
+    game.profiler.close()
+    if game.score_writer:
+        game.score_writer.close()
+    pygame.quit()
+
+
+# имя -> (нужно ли окно игры, функция от (game, quick)); сообщения игры во время замеров идут в stderr,
+# чтобы без --out в stdout был только JSON
+BENCHMARKS = {
+    "can_place_block_at": (False, lambda game, quick: bench_can_place(20 if quick else 100)),
+    "clear_completed_lines": (False, lambda game, quick: bench_clear_lines(200 if quick else 1000)),
+    "check_if_game_is_over": (False, lambda game, quick: bench_game_over(200 if quick else 1000)),
+    "draw_3d_block": (True, lambda game, quick: bench_draw_3d_block(game, 200 if quick else 1000)),
+    "draw_particles_burst": (True, lambda game, quick: bench_particle_burst(game, 1 if quick else 3)),
+    "full_frame_550x700": (True, lambda game, quick: bench_full_frame(game, (550, 700), frames=10 if quick else 60)),
+    "full_frame_1920x1080": (True, lambda game, quick: bench_full_frame(game, (1920, 1080), frames=10 if quick else 60)),
+    "full_frame_3840x2160_scaled": (True, lambda game, quick: bench_full_frame(game, (3840, 2160), 720,
+                                                                                10 if quick else 60)),
+    "session_frame": (True, lambda game, quick: bench_session(game, 200 if quick else 2000)),
+}
+
+
+def run_benchmarks(names, quick=False):
+    results = {}
+    game = None
+    data_dir = tempfile.TemporaryDirectory(prefix="block_blast_bench_")
+    try:
+        for name in names:
+            needs_game, bench = BENCHMARKS[name]
+            with contextlib.redirect_stdout(sys.stderr):
+                if needs_game and game is None:
+                    game = make_game(data_dir.name)
+                result = bench(game, quick)
+            result["unit"] = "us"
+            results[name] = result
+            print(f"{name:<28} {result['value']:12.2f} мкс", file=sys.stderr)
+    finally:
+        if game is not None:
+            close_game(game)
+        data_dir.cleanup()
+    return results
+
+
+# замеры, которые медленнее базовых больше чем в 1 + threshold раз
+def find_regressions(results, baseline, threshold=DEFAULT_THRESHOLD):
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("benchmarks", {}).get(name)
+        if not base or base.get("value", 0) <= 0:
+            continue
+        ratio = result["value"] / base["value"]
+        if ratio > 1 + threshold:
+            regressions.append({"name": name, "value": result["value"], "baseline": base["value"],
+                                "ratio": round(ratio, 3)})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки Block Blast без окна")
+    parser.add_argument("--out", help="файл для результатов в JSON")
+    parser.add_argument("--baseline", help="результаты прошлого прогона для сравнения")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="допустимое замедление относительно базы (0.25 = на 25%%)")
+    parser.add_argument("--only", help="имена замеров через запятую: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--quick", action="store_true", help="меньше данных и повторов, для быстрой проверки")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"неизвестные замеры: {', '.join(unknown)}")
+
+    report = {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(), "quick": args.quick,
+                 "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "benchmarks": run_benchmarks(names, args.quick),
+    }
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["threshold"] = args.threshold
+        report["regressions"] = find_regressions(report["benchmarks"], baseline, args.threshold)
+        for regression in report["regressions"]:
+            print(f"Замедление {regression['name']}: {regression['value']:.2f} мкс против "
+                  f"{regression['baseline']:.2f} (x{regression['ratio']})", file=sys.stderr)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,417 @@
+import os
+import random
+import time
+import timeit
+
+import numpy as np
+
+from advisor import MoveAdvisor
+from batch_eval import evaluate_placements, occupancy_to_boards, trays_fit
+from bitboard import BitGrid
+from game_state import BLOCK_SHAPES, COLORS, GRID_SIZE, GameState
+from replay import ReplayRecorder, parse_replay, verify_replay
+from rules import rules_from_dict
+
+
+# старая реализация на списке списков, нужна только для сравнения
+def legacy_can_place_block_at(grid, block_shape, grid_r, grid_c):
+    for r_offset, row_data in enumerate(block_shape):
+        for c_offset, cell_val in enumerate(row_data):
+            if cell_val:
+                actual_r, actual_c = grid_r + r_offset, grid_c + c_offset
+                if not (0 <= actual_r < GRID_SIZE and 0 <= actual_c < GRID_SIZE) or \
+                   grid[actual_r][actual_c] is not None:
+                    return False
+    return True
+
+
+def legacy_check_if_game_is_over(grid, available_blocks):
+    for block_shape in available_blocks:
+        for r in range(GRID_SIZE):
+            for c in range(GRID_SIZE):
+                if legacy_can_place_block_at(grid, block_shape, r, c):
+                    return False
+    return True
+
+
+def bitgrid_to_lists(bit_grid):
+    return [[bit_grid.color_at(r, c) for c in range(GRID_SIZE)] for r in range(GRID_SIZE)]
+
+
+# набор случайных досок разной заполненности
+def make_boards(count, seed=1, size=GRID_SIZE):
+    rng = random.Random(seed)
+    boards = []
+    for _ in range(count):
+        bit_grid = BitGrid(size)
+        bit_grid.fill_random(rng.choice([0.3, 0.6, 0.85, 0.95]), COLORS, rng)
+        boards.append(bit_grid)
+    return boards
+
+
+def measure(label, func, number):
+    best = min(timeit.repeat(func, number=number, repeat=5))
+    per_call_us = best / number * 1e6
+    print(f"{label:<40} {per_call_us:10.2f} мкс")
+    return per_call_us
+
+
+def bench_placement(boards):
+    lists = [bitgrid_to_lists(b) for b in boards]
+    anchors = [(r, c) for r in range(GRID_SIZE) for c in range(GRID_SIZE)]
+
+    def legacy():
+        for grid in lists:
+            for block_shape in BLOCK_SHAPES:
+                for r, c in anchors:
+                    legacy_can_place_block_at(grid, block_shape, r, c)
+
+    def bitboard():
+        for bit_grid in boards:
+            for block_shape in BLOCK_SHAPES:
+                for r, c in anchors:
+                    bit_grid.can_place(block_shape, r, c)
+
+    # так поле сканируют поиск хода и подсветка: все якоря для каждой формы
+    def legacy_scan():
+        for grid in lists:
+            for block_shape in BLOCK_SHAPES:
+                [(r, c) for r, c in anchors if legacy_can_place_block_at(grid, block_shape, r, c)]
+
+    def bitboard_scan():
+        for bit_grid in boards:
+            for block_shape in BLOCK_SHAPES:
+                bit_grid.legal_anchors(block_shape)
+
+    old = measure("can_place_block_at (список списков)", legacy, 3)
+    new = measure("can_place_block_at (битовое поле)", bitboard, 3)
+    print(f"  ускорение: x{old / new:.1f}")
+    old = measure("все допустимые якоря (список списков)", legacy_scan, 3)
+    new = measure("все допустимые якоря (битовое поле)", bitboard_scan, 3)
+    print(f"  ускорение: x{old / new:.1f}")
+
+
+def bench_game_over(boards):
+    lists = [bitgrid_to_lists(b) for b in boards]
+    rng = random.Random(2)
+    trays = [[rng.choice(BLOCK_SHAPES) for _ in range(3)] for _ in boards]
+
+    def legacy():
+        for grid, tray in zip(lists, trays):
+            legacy_check_if_game_is_over(grid, tray)
+
+    def bitboard():
+        for bit_grid, tray in zip(boards, trays):
+            not bit_grid.any_fits(tray)
+
+    for bit_grid, grid, tray in zip(boards, lists, trays):
+        assert legacy_check_if_game_is_over(grid, tray) == (not bit_grid.any_fits(tray))
+
+    old = measure("check_if_game_is_over (список списков)", legacy, 3)
+    new = measure("check_if_game_is_over (битовое поле)", bitboard, 3)
+    print(f"  ускорение: x{old / new:.1f}")
+    # все доски одним пакетом, как на сервере партий
+    occupancies = [bit_grid.occupancy for bit_grid in boards]
+    measure("check_if_game_is_over (пакет trays_fit)", lambda: trays_fit(occupancies, trays), 3)
+
+
+# сколько целых партий в секунду проходит GameState со случайными ходами
+def bench_headless_games(count=200):
+    rng = random.Random(3)
+    start = time.perf_counter()
+    for _ in range(count):
+        state = GameState(rng)
+        while not state.game_over:
+            state.play_move(*rng.choice(state.legal_moves()))
+    elapsed = time.perf_counter() - start
+    print(f"{'партий без pygame в секунду':<40} {count / elapsed:10.0f}")
+
+
+# скорость поиска советчика: узлов в секунду и время ответа в бюджете кадра
+def bench_advisor(count=100):
+    rng = random.Random(4)
+    advisor = MoveAdvisor(GRID_SIZE)
+    unlimited = MoveAdvisor(GRID_SIZE, time_budget=float("inf"))
+    nodes = 0
+    elapsed = 0.0
+    worst = 0.0
+    complete = 0
+    for bit_grid in make_boards(count, seed=5):
+        tray = [rng.choice(BLOCK_SHAPES) for _ in range(3)]
+        advice = advisor.advise(bit_grid.occupancy, tray)
+        worst = max(worst, advice.elapsed)
+        complete += advice.complete
+        full = unlimited.advise(bit_grid.occupancy, tray)
+        nodes += full.nodes
+        elapsed += full.elapsed
+    print(f"{'советчик: узлов в секунду':<40} {nodes / elapsed:10.0f}")
+    print(f"{'советчик: худший ответ при бюджете 16 мс':<40} {worst * 1e3:10.2f} мс")
+    print(f"{'советчик: досчитано до конца лотка':<40} {complete:10d} из {count}")
+
+
+# запись случайных партий в реплей, размер записи и скорость воспроизведения без окна
+def bench_replay(games=50):
+    rng = random.Random(8)
+    replays = []
+    for seed in range(games):
+        # запись начинается с новой партии на свежем генераторе, как в игре
+        state = GameState()
+        state.rng = random.Random(seed)
+        state.recorder = ReplayRecorder(seed, GRID_SIZE, state.block_shapes, state.colors)
+        state.reset_game_state()
+        while not state.game_over:
+            state.play_move(*rng.choice(state.legal_moves()))
+        replays.append((parse_replay(state.recorder.to_bytes(state.score, True)), state.moves_made,
+                        len(state.recorder.data)))
+    start = time.perf_counter()
+    for replay, _, _ in replays:
+        result = verify_replay(replay)
+        assert result["ok"] and not result["deal_mismatches"], result
+    elapsed = time.perf_counter() - start
+    moves = sum(moves for _, moves, _ in replays)
+    print(f"{'реплей: байт на ход':<40} {sum(size for _, _, size in replays) / moves:10.1f}")
+    print(f"{'реплей: ходов в секунду при проверке':<40} {moves / elapsed:10.0f}")
+
+
+# пакетная оценка против постановок по одной через BitGrid
+def bench_batch_eval(boards):
+    stack = occupancy_to_boards([bit_grid.occupancy for bit_grid in boards])
+    big = np.repeat(stack, max(1, 20000 // len(stack)), axis=0)
+    start = time.perf_counter()
+    for block_shape in BLOCK_SHAPES:
+        evaluate_placements(big, block_shape)
+    elapsed = time.perf_counter() - start
+    print(f"{'пакетная оценка: досок x форм в секунду':<40} {len(big) * len(BLOCK_SHAPES) / elapsed:10.0f}")
+
+    start = time.perf_counter()
+    for block_shape in BLOCK_SHAPES:
+        for bit_grid in boards:
+            for grid_r, grid_c in bit_grid.legal_anchors(block_shape):
+                grid = bit_grid.copy()
+                grid.place(block_shape, grid_r, grid_c, None)
+                grid.clear_lines(*grid.find_full_lines())
+    elapsed = time.perf_counter() - start
+    print(f"{'через BitGrid по одной: досок x форм в с':<40} {len(boards) * len(BLOCK_SHAPES) / elapsed:10.0f}")
+
+
+# конец игры и список ходов: с индексом мест и со сканированием поля
+def bench_placement_index(boards):
+    rng = random.Random(7)
+    trays = [[rng.choice(BLOCK_SHAPES) for _ in range(3)] for _ in boards]
+    indexed = []
+    for bit_grid in boards:
+        copy = bit_grid.copy()
+        copy.track_shapes(BLOCK_SHAPES)
+        indexed.append(copy)
+
+    def scan():
+        for bit_grid, tray in zip(boards, trays):
+            bit_grid.any_fits(tray)
+            for block_shape in tray:
+                bit_grid.legal_anchors(block_shape)
+
+    def index():
+        for bit_grid, tray in zip(indexed, trays):
+            bit_grid.any_fits(tray)
+            for block_shape in tray:
+                bit_grid.legal_anchors(block_shape)
+
+    old = measure("конец игры + ходы (сканирование)", scan, 3)
+    new = measure("конец игры + ходы (индекс мест)", index, 3)
+    print(f"  ускорение: x{old / new:.1f}")
+
+
+# как растет стоимость с размером поля: поиск мест, конец игры, очистка линий, целые партии
+# и отрисовка поля; формы - классика и пентамино с поворотами
+def bench_board_sizes(sizes=(8, 10, 12, 16), games=20):
+    print(f"{'поле, формы':<22}{'места мкс':>11}{'конец мкс':>11}{'линии мкс':>11}{'ходов/с':>10}{'кадр мкс':>10}")
+    for pack_name, packs in (("классика", ["classic"]), ("пентамино", ["classic", "pentomino"])):
+        for size in sizes:
+            game_rules = rules_from_dict({"grid_size": size, "packs": packs, "rotate": pack_name != "классика"})
+            block_shapes = game_rules.block_shapes
+            rng = random.Random(size)
+            boards = make_boards(50, seed=size, size=size)
+            for bit_grid in boards:
+                bit_grid.track_shapes(block_shapes)
+            trays = [[rng.choice(block_shapes) for _ in range(3)] for _ in boards]
+            # доски, где заполнены по две строки и два столбца без одной клетки
+            line_boards = []
+            for bit_grid in boards:
+                lines = bit_grid.copy()
+                for i in (1, size - 2):
+                    for j in range(size):
+                        for r, c in ((i, j), (j, i)):
+                            if not lines.is_occupied(r, c):
+                                lines.place([[1]], r, c, COLORS[0])
+                line_boards.append(lines)
+
+            def placement():
+                for bit_grid, tray in zip(boards, trays):
+                    for block_shape in tray:
+                        bit_grid.legal_anchors(block_shape)
+
+            def game_over():
+                for bit_grid, tray in zip(boards, trays):
+                    bit_grid.any_fits(tray)
+
+            def clearing():
+                for bit_grid in line_boards:
+                    grid = bit_grid.copy()
+                    grid.clear_lines(*grid.find_full_lines())
+
+            per_board = len(boards)
+            placement_us = min(timeit.repeat(placement, number=3, repeat=3)) / 3 / per_board * 1e6
+            game_over_us = min(timeit.repeat(game_over, number=3, repeat=3)) / 3 / per_board * 1e6
+            clearing_us = min(timeit.repeat(clearing, number=3, repeat=3)) / 3 / per_board * 1e6
+
+            moves = 0
+            start = time.perf_counter()
+            for seed in range(games):
+                state = GameState(random.Random(seed), rules=game_rules.as_dict())
+                while not state.game_over:
+                    state.play_move(*rng.choice(state.legal_moves()))
+                moves += state.moves_made
+            moves_per_second = moves / (time.perf_counter() - start)
+
+            frame_us = bench_board_render(size, boards)
+            print(f"{f'{size}x{size}, {pack_name}':<22}{placement_us:11.1f}{game_over_us:11.1f}{clearing_us:11.1f}"
+                  f"{moves_per_second:10.0f}{frame_us:10.0f}")
+
+
+# отрисовка поля как в игре: подложка и спрайт на каждую занятую клетку, клетка под поле 450 пикселей
+def bench_board_render(size, boards):
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from sprites import BlockSprites, render_grid_backdrop
+    if not pygame.display.get_init() or pygame.display.get_surface() is None:
+        pygame.display.init()
+        pygame.display.set_mode((1, 1))
+    cell_size = min(50, 450 // size)
+    screen = pygame.Surface((size * cell_size + 10, size * cell_size + 10))
+    sprites = BlockSprites(cell_size, (50, 50, 50, 100), 5, COLORS)
+    backdrop = render_grid_backdrop(size, cell_size, (70, 0, 105, 153), (128, 128, 128))
+
+    def draw():
+        for bit_grid in boards:
+            screen.blit(backdrop, (0, 0))
+            for r, c, color in bit_grid.occupied_cells():
+                screen.blit(sprites.get(color), (c * cell_size, r * cell_size))
+
+    return min(timeit.repeat(draw, number=1, repeat=3)) / len(boards) * 1e6
+
+
+# журнал ходов: время отмены хода и перехода к любому ходу в случайных партиях.
+# совпадение с партией проверяет tests/test_history.py
+def bench_history(games=30):
+    rng = random.Random(11)
+    undo_time = seek_time = 0.0
+    undo_count = seek_count = 0
+    for seed in range(games):
+        state = GameState(random.Random(seed))
+        moves = 0
+        while not state.game_over:
+            state.play_move(*rng.choice(state.legal_moves()))
+            moves += 1
+        for _ in range(200):
+            action = rng.random()
+            start = time.perf_counter()
+            if action < 0.4:
+                state.undo()
+                undo_time += time.perf_counter() - start
+                undo_count += 1
+            elif action < 0.8:
+                state.redo()
+            else:
+                state.seek(rng.randrange(moves + 1))
+                seek_time += time.perf_counter() - start
+                seek_count += 1
+    print(f"{'журнал: отмена хода':<40} {undo_time / undo_count * 1e6:10.2f} мкс")
+    print(f"{'журнал: переход к любому ходу':<40} {seek_time / seek_count * 1e6:10.2f} мкс")
+
+
+# раздачи генераторов: время одной раздачи на плотных досках (с проверкой, что помещается),
+# сколько раздач без единого подходящего блока, повторяемость по сиду и длина партий
+def bench_generator(games=100):
+    from generators import FairGenerator, UniformGenerator
+    rng = random.Random(10)
+    states = []
+    for _ in range(200):
+        state = GameState(random.Random(rng.getrandbits(32)))
+        state.grid.fill_random(rng.choice([0.85, 0.95]), COLORS, rng)
+        states.append(state)
+    for generator in (UniformGenerator(), FairGenerator(), FairGenerator({1: 0.5, 4: 2.0})):
+        dead = 0
+        worst = 0.0
+        start = time.perf_counter()
+        for state in states:
+            deal_start = time.perf_counter()
+            blocks, _ = generator.deal(state, 3)
+            worst = max(worst, time.perf_counter() - deal_start)
+            dead += not state.grid.any_fits(blocks)
+        elapsed = time.perf_counter() - start
+        label = f"{generator.name} {generator.size_weights}" if generator.name == "fair" else generator.name
+        print(f"{f'раздача {label}':<40} {elapsed / len(states) * 1e6:10.2f} мкс, худшая {worst * 1e6:.1f} мкс,"
+              f" без хода {dead} из {len(states)}")
+
+    def play(seed, generator):
+        state = GameState(random.Random(seed), rules={"generator": generator})
+        policy_rng = random.Random(seed + 1)
+        deals = [list(state.available_blocks)]
+        while not state.game_over:
+            state.play_move(*policy_rng.choice(state.legal_moves()))
+            if len(state.available_blocks) == 3:
+                deals.append(list(state.available_blocks))
+        return state.moves_made, deals
+
+    for name in ("uniform", "fair"):
+        moves = [play(seed, name)[0] for seed in range(games)]
+        print(f"{f'{name}: ходов за партию в среднем':<40} {sum(moves) / games:10.1f}")
+    repeated = all(play(seed, "fair")[1] == play(seed, "fair")[1] for seed in range(20))
+    print(f"{'fair: раздачи повторяются по сиду':<40} {str(repeated):>10}")
+
+
+# перетаскивание слайдера громкости: 120 MOUSEMOTION за 2 секунды и серия очисток линий.
+# считается время вызова из кадра и сколько раз громкость реально дошла до микшера
+def bench_audio(motions=120, drag_ms=2000, clears=40):
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    import pygame
+    from audio import VOLUME_DEBOUNCE_MS, AudioService
+    try:
+        pygame.mixer.init()
+    except pygame.error as e:
+        print(f"звук: микшер недоступен ({e})")
+        return
+    audio = AudioService({"pickup_sound": 2, "destroy_sound": 4})
+    sound = pygame.mixer.Sound(buffer=bytes(44100))
+    audio.register("destroy_sound", sound)
+    frame_calls = []
+    for i in range(motions):
+        started = time.perf_counter()
+        audio.set_effect_volume((i + 1) / motions)
+        if i % (motions // clears) == 0:
+            audio.play("destroy_sound")
+        frame_calls.append(time.perf_counter() - started)
+        time.sleep(drag_ms / motions / 1000)
+    time.sleep(VOLUME_DEBOUNCE_MS / 1000 * 2)
+    audio.flush()
+    audio.close()
+    pygame.mixer.quit()
+    print(f"{'звук: вызов из кадра, худший':<40} {max(frame_calls) * 1e6:10.2f} мкс")
+    print(f"{'звук: громкость в микшер, раз':<40} {audio.volume_applies:10d} из {motions}")
+    print(f"{'звук: итоговая громкость эффектов':<40} {audio.effect_volume:10.2f}")
+    print(f"{'звук: эффектов проиграно':<40} {audio.played:10d}")
+
+
+if __name__ == "__main__":
+    boards = make_boards(200)
+    bench_placement(boards)
+    bench_game_over(boards)
+    bench_placement_index(boards)
+    bench_headless_games()
+    bench_advisor()
+    bench_replay()
+    bench_batch_eval(boards)
+    bench_board_sizes()
+    bench_generator()
+    bench_history()
+    bench_audio()
@@ -0,0 +1,421 @@
+import random
+
+# битовое поле: занятость клеток хранится в одном целом числе,
+# бит с номером r * size + c отвечает за клетку (r, c), цвета лежат отдельным слоем
+
+# ключ формы: список списков превращаем в кортеж кортежей, чтобы его можно было хэшировать
+def shape_key(block_shape):
+    return tuple(tuple(1 if cell else 0 for cell in row) for row in block_shape)
+
+
+# предрасчитанные данные одной формы для поля заданного размера
+class ShapeMasks:
+    def __init__(self, block_shape, size):
+        self.key = shape_key(block_shape)
+        self.size = size
+        self.cells = [(r, c) for r, row in enumerate(self.key) for c, cell in enumerate(row) if cell]
+        self.cell_count = len(self.cells)
+        # границы по заполненным клеткам, как в исходной проверке can_place_block_at
+        min_r = min(r for r, _ in self.cells)
+        max_r = max(r for r, _ in self.cells)
+        min_c = min(c for _, c in self.cells)
+        max_c = max(c for _, c in self.cells)
+        self.r_range = range(-min_r, size - max_r)
+        self.c_range = range(-min_c, size - max_c)
+        self.min_r, self.min_c = min_r, min_c
+        # та же маска, но сдвинутая так, чтобы верхняя левая заполненная клетка была в (0, 0);
+        # маска в якоре (r, c) - это она же, сдвинутая влево на (r + min_r) * size + c + min_c
+        self.corner_mask = 0
+        for r, c in self.cells:
+            self.corner_mask |= 1 << ((r - min_r) * size + c - min_c)
+
+        # все допустимые якоря и маска формы в каждом из них;
+        # cell_cover[клетка] - битовый набор номеров якорей, при которых форма накрывает эту клетку
+        self.anchor_masks = {}
+        self.cell_cover = [0] * (size * size)
+        for r in self.r_range:
+            for c in self.c_range:
+                mask = 0
+                anchor_bit = 1 << len(self.anchor_masks)
+                for dr, dc in self.cells:
+                    cell = (r + dr) * size + (c + dc)
+                    mask |= 1 << cell
+                    self.cell_cover[cell] |= anchor_bit
+                self.anchor_masks[(r, c)] = mask
+        self.anchors = list(self.anchor_masks.items())
+        # расшифровка набора якорей по байтам: [номер байта][значение байта] -> кортеж якорей,
+        # заполняется по мере надобности
+        self._anchor_chunks = [[None] * 256 for _ in range((len(self.anchors) + 7) // 8)]
+
+    # битовый набор номеров якорей -> список якорей (строка, столбец)
+    def decode_anchors(self, anchor_bits):
+        result = []
+        chunk_number = 0
+        while anchor_bits:
+            byte = anchor_bits & 0xFF
+            if byte:
+                chunk = self._anchor_chunks[chunk_number]
+                anchors = chunk[byte]
+                if anchors is None:
+                    base = chunk_number * 8
+                    anchors = tuple(self.anchors[base + bit][0] for bit in range(8) if byte >> bit & 1)
+                    chunk[byte] = anchors
+                result.extend(anchors)
+            anchor_bits >>= 8
+            chunk_number += 1
+        return result
+
+    def mask_at(self, grid_r, grid_c):
+        return self.anchor_masks.get((grid_r, grid_c))
+
+
+# маски полных строк и столбцов для поля размера size
+def build_line_masks(size):
+    row_masks = [((1 << size) - 1) << (r * size) for r in range(size)]
+    column_mask = 0
+    for r in range(size):
+        column_mask |= 1 << (r * size)
+    col_masks = [column_mask << c for c in range(size)]
+    return row_masks, col_masks
+
+
+COVER_CACHE_LIMIT = 4096
+
+_shape_cache = {}
+_cover_caches = {}
+_shape_id_cache = {}
+_line_cache = {}
+
+
+# формы в игре - одни и те же объекты из BLOCK_SHAPES, поэтому сначала ищем по id,
+# а объект храним рядом, чтобы id не переиспользовался после сборки мусора
+def get_shape_masks(block_shape, size):
+    cached = _shape_id_cache.get((id(block_shape), size))
+    if cached is not None and cached[0] is block_shape:
+        return cached[1]
+    cache_key = (shape_key(block_shape), size)
+    masks = _shape_cache.get(cache_key)
+    if masks is None:
+        masks = ShapeMasks(cache_key[0], size)
+        _shape_cache[cache_key] = masks
+    _shape_id_cache[(id(block_shape), size)] = (block_shape, masks)
+    return masks
+
+
+def get_line_masks(size):
+    masks = _line_cache.get(size)
+    if masks is None:
+        masks = build_line_masks(size)
+        _line_cache[size] = masks
+    return masks
+
+
+# поиск полных линий в битовой маске занятости
+def find_full_lines(occupancy, size):
+    row_masks, col_masks = get_line_masks(size)
+    rows = [r for r, mask in enumerate(row_masks) if occupancy & mask == mask]
+    cols = [c for c, mask in enumerate(col_masks) if occupancy & mask == mask]
+    return rows, cols
+
+
+# маска всех клеток, попадающих в полные линии
+def full_lines_mask(occupancy, size):
+    row_masks, col_masks = get_line_masks(size)
+    cleared = 0
+    lines = 0
+    for mask in row_masks:
+        if occupancy & mask == mask:
+            cleared |= mask
+            lines += 1
+    for mask in col_masks:
+        if occupancy & mask == mask:
+            cleared |= mask
+            lines += 1
+    return cleared, lines
+
+
+# проверка, влезает ли форма хоть куда-нибудь на поле
+def shape_fits_anywhere(occupancy, masks):
+    for _, mask in masks.anchors:
+        if not occupancy & mask:
+            return True
+    return False
+
+
+# номера установленных битов числа по возрастанию
+def iter_bits(value):
+    while value:
+        low_bit = value & -value
+        yield low_bit.bit_length() - 1
+        value ^= low_bit
+
+
+# индекс допустимых якорей: для каждой формы битовый набор якорей, куда ее можно поставить.
+# после хода пересчитываются только якоря, задевающие изменившиеся клетки
+class PlacementIndex:
+    def __init__(self, shape_masks_list):
+        self.slots = {}
+        self.masks = []
+        for masks in shape_masks_list:
+            if masks not in self.slots:
+                self.slots[masks] = len(self.masks)
+                self.masks.append(masks)
+        self.legal = [0] * len(self.masks)
+        # маска изменившихся клеток -> якоря, которые она задевает, по каждой форме;
+        # ходы и очищаемые линии повторяются, поэтому накрытие считается один раз
+        # и делится между всеми полями с тем же набором форм
+        self.cover_cache = _cover_caches.setdefault(tuple(self.masks), {})
+
+    def copy(self):
+        other = PlacementIndex.__new__(PlacementIndex)
+        other.slots = self.slots
+        other.masks = self.masks
+        other.legal = self.legal[:]
+        other.cover_cache = self.cover_cache
+        return other
+
+    def covered_anchors(self, changed_mask):
+        covered = self.cover_cache.get(changed_mask)
+        if covered is None:
+            if len(self.cover_cache) >= COVER_CACHE_LIMIT:
+                self.cover_cache.clear()
+            cells = list(iter_bits(changed_mask))
+            covered = []
+            for masks in self.masks:
+                cover = masks.cell_cover
+                anchors = 0
+                for cell in cells:
+                    anchors |= cover[cell]
+                covered.append(anchors)
+            self.cover_cache[changed_mask] = covered
+        return covered
+
+    # полный пересчет, нужен только при сбросе или произвольном заполнении поля
+    def rebuild(self, occupancy):
+        for slot, masks in enumerate(self.masks):
+            if not occupancy:
+                self.legal[slot] = (1 << len(masks.anchors)) - 1
+                continue
+            legal = 0
+            for anchor_number, (_, mask) in enumerate(masks.anchors):
+                if not occupancy & mask:
+                    legal |= 1 << anchor_number
+            self.legal[slot] = legal
+
+    # клетки стали заняты: все якоря, которые их накрывают, больше недопустимы
+    def occupy(self, changed_mask):
+        legal = self.legal
+        for slot, blocked in enumerate(self.covered_anchors(changed_mask)):
+            legal[slot] &= ~blocked
+
+    # клетки освободились: перепроверяем только якоря, которые их накрывают
+    def release(self, changed_mask, occupancy):
+        for slot, covered in enumerate(self.covered_anchors(changed_mask)):
+            legal = self.legal[slot]
+            anchors = self.masks[slot].anchors
+            candidates = covered & ~legal
+            while candidates:
+                low_bit = candidates & -candidates
+                if not occupancy & anchors[low_bit.bit_length() - 1][1]:
+                    legal |= low_bit
+                candidates ^= low_bit
+            self.legal[slot] = legal
+
+    # битовый набор допустимых якорей формы или None, если форма не отслеживается
+    def legal_bits(self, masks):
+        slot = self.slots.get(masks)
+        return None if slot is None else self.legal[slot]
+
+    # сверка с полным перебором, возвращает список расхождений
+    def mismatches(self, occupancy):
+        problems = []
+        for slot, masks in enumerate(self.masks):
+            for anchor_number, (anchor, mask) in enumerate(masks.anchors):
+                expected = not occupancy & mask
+                actual = bool(self.legal[slot] >> anchor_number & 1)
+                if expected != actual:
+                    problems.append((masks.key, anchor, expected, actual))
+        return problems
+
+
+# само игровое поле: занятость битами и цвета отдельным списком
+class BitGrid:
+    def __init__(self, size=8):
+        self.size = size
+        self._shape_lookup = {}
+        # (id формы, строка, столбец) -> (форма, маска в этом якоре или None): проверка одного места -
+        # одно обращение к словарю и одно AND
+        self._anchor_lookup = {}
+        self.cell_total = size * size
+        self.full_mask = (1 << self.cell_total) - 1
+        self.occupancy = 0
+        self.colors = [None] * self.cell_total
+        self.placement_index = None
+
+    def clear(self):
+        self.occupancy = 0
+        self.colors = [None] * self.cell_total
+        if self.placement_index is not None:
+            self.placement_index.rebuild(self.occupancy)
+
+    # копия без индекса дешевле; она нужна для черновых ходов в поиске
+    def copy(self, with_index=False):
+        other = BitGrid(self.size)
+        other._shape_lookup = self._shape_lookup
+        other._anchor_lookup = self._anchor_lookup
+        other.occupancy = self.occupancy
+        other.colors = self.colors[:]
+        if with_index and self.placement_index is not None:
+            other.placement_index = self.placement_index.copy()
+        return other
+
+    # включает индекс допустимых якорей для набора форм
+    def track_shapes(self, block_shapes):
+        self.placement_index = PlacementIndex([self.shape_masks(block_shape) for block_shape in block_shapes])
+        self.placement_index.rebuild(self.occupancy)
+
+    def shape_masks(self, block_shape):
+        cached = self._shape_lookup.get(id(block_shape))
+        if cached is None or cached[0] is not block_shape:
+            cached = (block_shape, get_shape_masks(block_shape, self.size))
+            self._shape_lookup[id(block_shape)] = cached
+        return cached[1]
+
+    def color_at(self, r, c):
+        return self.colors[r * self.size + c]
+
+    def is_occupied(self, r, c):
+        return bool(self.occupancy >> (r * self.size + c) & 1)
+
+    def occupied_count(self):
+        return bin(self.occupancy).count("1")
+
+    # все занятые клетки как (строка, столбец, цвет)
+    def occupied_cells(self):
+        occupancy = self.occupancy
+        size = self.size
+        while occupancy:
+            low_bit = occupancy & -occupancy
+            index = low_bit.bit_length() - 1
+            yield index // size, index % size, self.colors[index]
+            occupancy ^= low_bit
+
+    # проверка размещения сдвигом и побитовым И
+    def can_place(self, block_shape, grid_r, grid_c):
+        cached = self._anchor_lookup.get((id(block_shape), grid_r, grid_c))
+        if cached is None or cached[0] is not block_shape:
+            cached = self.anchor_entry(block_shape, grid_r, grid_c)
+        return cached[1] is not None and not self.occupancy & cached[1]
+
+    # запись для can_place; якоря далеко за полем (мышь за окном, чужой клиент) не кэшируются,
+    # чтобы словарь не рос без предела
+    def anchor_entry(self, block_shape, grid_r, grid_c):
+        entry = (block_shape, self.shape_masks(block_shape).mask_at(grid_r, grid_c))
+        if -self.size < grid_r < self.size and -self.size < grid_c < self.size:
+            self._anchor_lookup[(id(block_shape), grid_r, grid_c)] = entry
+        return entry
+
+    # битовый набор допустимых якорей из индекса или None, если индекса для формы нет
+    def legal_bits(self, block_shape):
+        if self.placement_index is None:
+            return None
+        return self.placement_index.legal_bits(self.shape_masks(block_shape))
+
+    # все якоря, куда форму можно поставить прямо сейчас
+    def legal_anchors(self, block_shape):
+        masks = self.shape_masks(block_shape)
+        legal = self.legal_bits(block_shape)
+        if legal is not None:
+            return masks.decode_anchors(legal)
+        occupancy = self.occupancy
+        return [anchor for anchor, mask in masks.anchors if not occupancy & mask]
+
+    # сколько всего есть мест для формы
+    def legal_count(self, block_shape):
+        legal = self.legal_bits(block_shape)
+        if legal is not None:
+            return bin(legal).count("1")
+        return len(self.legal_anchors(block_shape))
+
+    # ставит форму на поле, возвращает число занятых клеток
+    def place(self, block_shape, grid_r, grid_c, color):
+        masks = self.shape_masks(block_shape)
+        mask = masks.mask_at(grid_r, grid_c)
+        self.occupancy |= mask
+        for dr, dc in masks.cells:
+            self.colors[(grid_r + dr) * self.size + grid_c + dc] = color
+        if self.placement_index is not None:
+            self.placement_index.occupy(mask)
+        return masks.cell_count
+
+    def find_full_lines(self):
+        return find_full_lines(self.occupancy, self.size)
+
+    # убирает указанные строки и столбцы, возвращает список очищенных клеток
+    # в том же порядке, в каком их обходила старая реализация
+    def clear_lines(self, rows, cols):
+        cleared_mask = 0
+        cleared_cells = []
+        for r in rows:
+            for c in range(self.size):
+                bit = 1 << (r * self.size + c)
+                if self.occupancy & bit and not cleared_mask & bit:
+                    cleared_mask |= bit
+                    cleared_cells.append((r, c))
+        for c in cols:
+            for r in range(self.size):
+                bit = 1 << (r * self.size + c)
+                if self.occupancy & bit and not cleared_mask & bit:
+                    cleared_mask |= bit
+                    cleared_cells.append((r, c))
+        for r, c in cleared_cells:
+            self.colors[r * self.size + c] = None
+        self.occupancy &= ~cleared_mask
+        if cleared_mask and self.placement_index is not None:
+            self.placement_index.release(cleared_mask, self.occupancy)
+        return cleared_cells
+
+    # цвета клеток маски по возрастанию номера клетки
+    def cell_colors(self, mask):
+        colors = self.colors
+        return tuple(colors[index] for index in iter_bits(mask))
+
+    # занимает клетки маски; colors - цвета по возрастанию номера клетки (как у cell_colors)
+    def fill_mask(self, mask, colors):
+        for index, color in zip(iter_bits(mask), colors):
+            self.colors[index] = color
+        self.occupancy |= mask
+        if self.placement_index is not None:
+            self.placement_index.occupy(mask)
+
+    # освобождает клетки маски
+    def clear_mask(self, mask):
+        for index in iter_bits(mask):
+            self.colors[index] = None
+        self.occupancy &= ~mask
+        if self.placement_index is not None:
+            self.placement_index.release(mask, self.occupancy)
+
+    # есть ли хотя бы одна форма из списка, которую можно поставить
+    def any_fits(self, block_shapes):
+        for block_shape in block_shapes:
+            legal = self.legal_bits(block_shape)
+            if legal is None:
+                legal = shape_fits_anywhere(self.occupancy, self.shape_masks(block_shape))
+            if legal:
+                return True
+        return False
+
+    # формы из списка, которые можно поставить хотя бы в одно место
+    def fitting_shapes(self, block_shapes):
+        return [block_shape for block_shape in block_shapes if self.any_fits((block_shape,))]
+
+    # случайное заполнение для тестов и бенчмарков
+    def fill_random(self, density, colors, rng=random):
+        self.clear()
+        for index in range(self.cell_total):
+            if rng.random() < density:
+                self.occupancy |= 1 << index
+                self.colors[index] = rng.choice(colors)
+        if self.placement_index is not None:
+            self.placement_index.rebuild(self.occupancy)
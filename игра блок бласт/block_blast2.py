@@ -1,21 +1,61 @@
 import pygame
-import random
 import asyncio
+import argparse
 import platform
 import math
 import os
-
-# инициализация pygame
-pygame.init()
-pygame.mixer.init()
-
-# границы окна, кнопок и тп
-WIDTH, HEIGHT = 550, 700
-GRID_SIZE = 8
-CELL_SIZE = 50
-GRID_OFFSET_X = (WIDTH - GRID_SIZE * CELL_SIZE) // 2
-GRID_OFFSET_Y = 120
+import random
+import sqlite3
+import time
+
+from game_state import GameState
+from rules import GameRules, load_rules
+from generators import GENERATORS, make_generator
+from dirty_rects import DirtyRegions, union_of
+from layout import Layout, DESIGN_WIDTH, DESIGN_HEIGHT
+from sprites import BlockSprites, render_grid_backdrop, render_cell_highlight
+from particles import ParticlePool
+from advisor import MoveAdvisor
+from profiler import FrameProfiler
+from timestep import FixedTimestep
+from assets import AssetManager, default_cache_dir
+from audio import AudioService
+from input_source import INPUT_EVENTS, PygameInput
+from text_cache import TEXT_CACHE, DEFAULT_OUTLINE_OFFSETS, DigitAtlas, scale_offsets
+from scores import ScoreStore, ScoreWriter, default_player, default_scores_path, score_record
+from replay import ReplayError, ReplayRecorder, ReplayDeals, ReplayPlayer, load_replay, replay_file_name, REPLAY_DIR_ENV
+
+# окно по умолчанию размером с макет; его можно растягивать, F11 - полный экран.
+# все прямоугольники кадра берутся из раскладки (layout.py)
+WINDOW_SIZE = (DESIGN_WIDTH, DESIGN_HEIGHT)
 FPS = 60
+# режим экономии: без ввода дольше IDLE_AFTER_MS и без частиц кадры идут с частотой IDLE_FPS.
+# частоту можно задать через BLOCKBLAST_IDLE_FPS, 0 отключает режим
+IDLE_FPS_ENV = "BLOCKBLAST_IDLE_FPS"
+IDLE_FPS = 10
+IDLE_AFTER_MS = 2000
+DRAGGED_BLOCK_ALPHA = 200
+PARTICLES_PER_CELL = 8
+AUTOPLAY_MOVE_DELAY_MS = 250
+# доля кадра на поиск подсказки или хода автоигры: остальное остается на события и отрисовку
+ADVISOR_FRAME_SHARE = 0.4
+# фон под новый размер окна декодируется, когда размер не меняется столько миллисекунд
+BACKGROUND_RESIZE_DELAY_MS = 200
+# сколько каналов микшера зарезервировано под каждый эффект: очистки линий могут идти подряд
+EFFECT_CHANNELS = {"pickup_sound": 2, "destroy_sound": 4}
+# путь к файлу трассы кадров (.csv или JSON по строке на кадр), пусто - трасса не пишется
+PROFILE_TRACE_ENV = "BLOCKBLAST_TRACE"
+PROFILE_SECTIONS = ("events", "update", "background", "draw_grid", "draw_available_blocks", "draw_score_display",
+                    "draw_particles", "draw_volume_sliders", "drag", "overlay", "display_update")
+
+# картинки и звуки лежат рядом со скриптом
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+FONT_SPECS = {
+    "score": ("Arial", 48, True),
+    "game_over_title": ("Arial", 72, True),
+    "instruction": ("Arial", 30, True),
+    "slider_label": ("Arial", 20, True),
+}
 
 # цвета и фон
 WHITE = (255, 255, 255)
@@ -32,259 +72,448 @@ EFFECT_COLORS = [
     (138, 43, 226),
     (255, 105, 180)
 ]
-COLORS = [
-    (138, 43, 226),
-    (148, 0, 211),
-    (255, 20, 147),
-    (255, 105, 180),
-    (0, 0, 205),
-    (75, 0, 130),
-]
-
+# старый файл рекорда: его значение один раз переносится в хранилище результатов
 HIGHSCORE_FILE = "block_blast_highscore.txt"
-
-# формы блоков для игры
-BLOCK_SHAPES = [
-    [[1]], [[1, 1]], [[1], [1]], [[1, 1], [1, 1]],
-    [[1, 1, 1]], [[1], [1], [1]], [[1, 1], [0, 1]],
-]
-
-# функция затемнения цвета
-def darken_color(color, factor=0.7):
-    return tuple(int(c * factor) for c in color)
+# каждая партия записывается в реплей; папку можно задать через BLOCKBLAST_REPLAY_DIR
+RECORD_REPLAYS = True
+REPLAY_STEP_MS = 250
 
 # функция отрисовки текста с контуром
 def draw_text_with_custom_outline(screen, text_str, font, base_color, outline_color, base_pos, is_centered=True, custom_offsets=None):
-    text_surface = font.render(text_str, True, base_color)
-    outline_surface = font.render(text_str, True, outline_color)
+    if custom_offsets is None:
+        custom_offsets = DEFAULT_OUTLINE_OFFSETS
+    surface, corner, (text_w, text_h) = TEXT_CACHE.get(text_str, font, base_color, outline_color, custom_offsets)
 
     if is_centered:
-        text_w, text_h = font.size(text_str)
         actual_base_pos_for_text = (base_pos[0] - text_w // 2, base_pos[1] - text_h // 2)
     else:
         actual_base_pos_for_text = base_pos
 
-    if custom_offsets is None:
-        custom_offsets = [(-2, -2), (-2, 2), (2, -2), (2, 2), (-1, -1), (-1, 1), (1, -1), (1, 1)]
-
-    for dx, dy in custom_offsets:
-        screen.blit(outline_surface, (actual_base_pos_for_text[0] + dx, actual_base_pos_for_text[1] + dy))
-
-    screen.blit(text_surface, actual_base_pos_for_text)
-
-# класс частицы для анимации взрывов
-class Particle:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.vx = random.uniform(-3, 3)
-        self.vy = random.uniform(-4.5, -1.5)
-        self.angle = random.uniform(0, 360)
-        self.angular_velocity = random.uniform(-10, 10)
-        self.alpha = 255
-        self.size = random.randint(6, 12)
-        self.color = random.choice(EFFECT_COLORS)
-        self.gravity = 0.18
-
-    def update(self):
-        self.x += self.vx
-        self.y += self.vy
-        self.angle = (self.angle + self.angular_velocity) % 360
-        self.vy += self.gravity
-        self.alpha -= 7
-        return self.alpha > 0
-
-    def draw(self, screen):
-        if self.alpha > 0:
-            edge = self.size
-            particle_surf = pygame.Surface((edge, edge), pygame.SRCALPHA)
-            current_color_with_alpha = (self.color[0], self.color[1], self.color[2], int(self.alpha))
-            pygame.draw.rect(particle_surf, current_color_with_alpha, (0,0,edge,edge))
-
-            rotated_surface = pygame.transform.rotate(particle_surf, self.angle)
-            rotated_rect = rotated_surface.get_rect(center=(int(self.x), int(self.y)))
-            screen.blit(rotated_surface, rotated_rect.topleft)
-
-# основной класс игры BlockBlast
-class BlockBlast:
-    def __init__(self):
-        # инициализация экрана, шрифтов, загрузка фона и звуков
-        self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    screen.blit(surface, (actual_base_pos_for_text[0] + corner[0], actual_base_pos_for_text[1] + corner[1]))
+
+# основной класс игры BlockBlast: правила берутся из GameState, здесь только окно, звук и ввод
+class BlockBlast(GameState):
+    # False - кадры без ограничения частоты (бенчмарки): clock.tick(0) не ждет
+    frame_limit = True
+
+    # render_height - наибольшая высота кадра: на окне выше нее кадр рисуется в поверхность этой высоты,
+    # а на окно его растягивает SDL при выводе (режим SCALED), поэтому цена кадра не растет с размером окна
+    def __init__(self, rules=None, window_size=WINDOW_SIZE, fullscreen=False, render_height=None):
+        # инициализация pygame, экрана, шрифтов, загрузка фона и звуков
+        init_started_at = time.perf_counter()
+        # вариант игры: размер поля, формы и цвета (по умолчанию классика 8x8)
+        self.game_rules = rules or GameRules()
+        self.grid_size = self.game_rules.grid_size
+        pygame.init()
+        pygame.mixer.init()
         pygame.display.set_caption("Block Blast")
         self.clock = pygame.time.Clock()
 
-        self.score_font = pygame.font.SysFont("Arial", 48, bold=True)
-        self.game_over_title_font = pygame.font.SysFont("Arial", 72, bold=True)
-        self.instruction_font = pygame.font.SysFont("Arial", 30, bold=True)
-        self.slider_label_font = pygame.font.SysFont("Arial", 20, bold=True)
-
-        try:
-            self.background = pygame.image.load('eee.jpg').convert()
-            self.background = pygame.transform.scale(self.background, (WIDTH, HEIGHT))
-        except pygame.error as e:
-            print(f"Ошибка загрузки фона: {e}")
-            self.background = pygame.Surface((WIDTH, HEIGHT))
-            self.background.fill(DARK_PURPLE)
-
-        try:
-            pygame.mixer.music.load('track.mp3')
-            self.pickup_sound = pygame.mixer.Sound('classic_hurt.mp3')
-            self.destroy_sound = pygame.mixer.Sound('yra.mp3')
-        except pygame.error as e:
-            print(f"Ошибка загрузки звуков: {e}. Звуки будут отключены.")
-            self.pickup_sound = type('DummySound', (), {'play': lambda: None, 'set_volume': lambda x: None})()
-            self.destroy_sound = type('DummySound', (), {'play': lambda: None, 'set_volume': lambda x: None})()
+        # фон из дискового кэша (или заглушка до конца декодирования), звук грузится в фоне,
+        # шрифты - при первом обращении
+        self.assets = AssetManager(ASSET_DIR, font_specs=FONT_SPECS)
+        self.background = None
+        self.music_loaded = False
+        self.score_digit_atlas = None
+        self.music_requested = False
+        self.assets.load_audio('track.mp3', {"pickup_sound": 'classic_hurt.mp3', "destroy_sound": 'yra.mp3'})
 
+        # значения слайдеров; до микшера они доходят через поток звука
         self.music_volume = 0.5
         self.effect_volume = 0.5
-        self.pickup_sound.set_volume(self.effect_volume)
-        
         self.destroy_sound_base_multiplier = 1.0 
-        self.destroy_sound.set_volume(min(1.0, self.effect_volume * self.destroy_sound_base_multiplier))
-        pygame.mixer.music.set_volume(self.music_volume)
+        self.audio = AudioService(EFFECT_CHANNELS, {"destroy_sound": self.destroy_sound_base_multiplier},
+                                  self.music_volume, self.effect_volume)
 
         self.dragging_music_slider = False
         self.dragging_effect_slider = False
 
+        self.particles = ParticlePool(EFFECT_COLORS)
+
+        # подсказка (H) и автоигра (A) занимают только часть кадра, чтобы он успел отрисоваться вовремя
+        self.advisor = MoveAdvisor(self.grid_size, time_budget=ADVISOR_FRAME_SHARE / FPS,
+                                   line_clear_points=self.game_rules.line_clear_points,
+                                   block_shapes=self.game_rules.block_shapes)
+        self.hint = None
+        self.autoplay = False
+        self.last_autoplay_move_ms = 0
+
+        # частицы живут шагами фиксированной длины, кадр рисует их между двумя шагами
+        self.timestep = FixedTimestep()
+        self.last_frame_at = None
+        self.last_input_ms = 0
+        self.idle_fps = int(os.environ.get(IDLE_FPS_ENV, IDLE_FPS))
+
+        # замеры кадра, оверлей по F3
+        self.profiler = FrameProfiler(PROFILE_SECTIONS, trace_path=os.environ.get(PROFILE_TRACE_ENV) or None,
+                                      frame_budget_ms=1000 / FPS)
+        self.profiler_font = None
+        self.profiler_panel = None
+        self.profiler_panel_lines = None
+
+        # окно, раскладка и все поверхности под ее масштаб (resize)
+        self.render_height = render_height
+        self.windowed_size = tuple(window_size)
+        self.pending_window_size = None
+        self.set_window_mode(fullscreen)
+
         self.running = True
+        # откуда берутся мышь и клавиатура (input_source.py); сценарий подставляет ScriptedInput
+        self.input = PygameInput()
         self.load_high_score()
-        self.reset_game_state()
-
-    # работа с рекордом (чтение/запись)
+        GameState.__init__(self, rules=self.game_rules.as_dict())
+
+        # время от начала __init__ до первого показанного кадра
+        self.init_started_at = init_started_at
+        self.time_to_first_frame_ms = None
+
+    # окно в обычном или полноэкранном режиме; обычное окно можно растягивать
+    def set_window_mode(self, fullscreen):
+        self.fullscreen = fullscreen
+        size = pygame.display.get_desktop_sizes()[0] if fullscreen else self.windowed_size
+        flags = pygame.FULLSCREEN if fullscreen else pygame.RESIZABLE
+        self.scaled = bool(self.render_height) and size[1] > self.render_height
+        if self.scaled:
+            size = (max(1, round(size[0] * self.render_height / size[1])), self.render_height)
+            flags |= pygame.SCALED
+        try:
+            window = pygame.display.set_mode(size, flags)
+        except pygame.error:
+            # окно без SCALED нельзя переключить в SCALED на месте: SDL не создает для него рендерер
+            pygame.display.quit()
+            pygame.display.init()
+            pygame.display.set_caption("Block Blast")
+            window = pygame.display.set_mode(size, flags)
+        self.resize(window.get_size())
+
+    def toggle_fullscreen(self):
+        if not self.fullscreen and not self.scaled:
+            self.windowed_size = self.screen.get_size()
+        self.set_window_mode(not self.fullscreen)
+
+    # новый размер кадра: раскладка и все поверхности под ее масштаб (фон, спрайты блоков, подложка
+    # поля, цифры счета, частицы; шрифты - из кэша по размеру) строятся здесь один раз, а не в кадре
+    def resize(self, size):
+        self.screen = pygame.display.get_surface()
+        self.screen_size = tuple(size)
+        layout = Layout(self.screen_size, self.grid_size, self.game_rules.max_shape_size())
+        self.layout = layout
+        self.cell_size = layout.cell_size
+        self.block_overhang = layout.block_overhang
+        self.grid_offset_x = layout.grid_offset_x
+        self.grid_offset_y = layout.grid_offset_y
+        self.tray_y = layout.tray_y
+
+        # при смене размера до конца перетаскивания растягивается прежний фон
+        delay_ms = BACKGROUND_RESIZE_DELAY_MS if self.background is not None else 0
+        self.background = self.assets.load_background('eee.jpg', self.screen.get_size(), DARK_PURPLE, self.background,
+                                                      delay_ms)
+        # все блоки, подложка поля и подсветка рисуются один раз здесь, а в кадре только копируются
+        self.block_sprites = BlockSprites(self.cell_size, (*SHADOW, 100), self.block_overhang, self.game_rules.colors,
+                                          (255, DRAGGED_BLOCK_ALPHA))
+        self.grid_backdrop = render_grid_backdrop(self.grid_size, self.cell_size, GRID_BACKGROUND_COLOR, GRAY)
+        self.cell_highlight = render_cell_highlight(self.cell_size, HIGHLIGHT_FILL, HIGHLIGHT)
+        self.particles.set_scale(layout.scale)
+        self.outline_offsets = scale_offsets(DEFAULT_OUTLINE_OFFSETS, layout.scale)
+        # на столько пикселей контур текста выходит за сам текст
+        self.outline_padding = max(abs(d) for offset in self.outline_offsets for d in offset)
+        self.score_digit_atlas = None
+
+        # что было нарисовано в прошлом кадре, чтобы понять, какие области обновлять
+        self.dirty = DirtyRegions(self.screen.get_rect())
+        self.last_drag_rects = []
+        self.last_particle_rect = None
+        self.last_score_rect = None
+        self.last_scene_state = None
+
+    # события окна во всех циклах: перерисовка, смена размера (применяется в apply_window_size
+    # один раз за кадр, сколько бы событий ни пришло) и F11. в режиме SCALED кадр при смене размера
+    # окна остается прежним, его растягивает SDL
+    def handle_window_event(self, event):
+        if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED):
+            self.dirty.mark_all()
+        elif event.type == pygame.VIDEORESIZE and not self.fullscreen and not self.scaled:
+            self.pending_window_size = event.size
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_F11:
+            self.toggle_fullscreen()
+
+    def apply_window_size(self):
+        size, self.pending_window_size = self.pending_window_size, None
+        if size is not None and tuple(size) != self.screen_size:
+            self.resize(pygame.display.get_surface().get_size())
+
+    # шрифты создаются при первом обращении, под масштаб раскладки
+    @property
+    def score_font(self):
+        return self.assets.font("score", self.layout.scale)
+
+    @property
+    def game_over_title_font(self):
+        return self.assets.font("game_over_title", self.layout.scale)
+
+    @property
+    def instruction_font(self):
+        return self.assets.font("instruction", self.layout.scale)
+
+    @property
+    def slider_label_font(self):
+        return self.assets.font("slider_label", self.layout.scale)
+
+    # подхватывает ресурсы, которые догрузились в фоне
+    def apply_loaded_assets(self):
+        for kind, key, value in self.assets.poll():
+            if kind == "background":
+                # фон для размера окна, который уже сменился, не нужен
+                if value.get_size() == self.screen.get_size():
+                    self.background = value
+                    self.dirty.mark_all()
+            elif kind == "sound":
+                self.audio.register(key, value)
+            elif kind == "music":
+                self.music_loaded = True
+                if self.music_requested:
+                    self.start_music()
+            elif kind == "error":
+                print(value)
+
+    def start_music(self):
+        self.audio.play_music(-1)
+
+    # работа с рекордом: чтение при запуске, запись результатов в фоновом потоке
     def load_high_score(self):
+        self.player_name = default_player()
+        self.high_score = 0
+        self.score_writer = None
+        path = default_scores_path()
         try:
-            with open(HIGHSCORE_FILE, "r") as f:
-                self.high_score = int(f.read())
-        except (FileNotFoundError, ValueError):
-            self.high_score = 0
+            store = ScoreStore(path)
+            store.import_legacy_high_score(HIGHSCORE_FILE, self.player_name)
+            self.high_score = store.best_score()
+            store.close()
+        except (sqlite3.Error, OSError) as e:
+            print(f"Не удалось открыть таблицу результатов {path}: {e}")
+            return
+        self.score_writer = ScoreWriter(path)
 
     def save_high_score(self):
-        try:
-            with open(HIGHSCORE_FILE, "w") as f:
-                f.write(str(self.high_score))
-        except IOError:
-            print(f"Error: Could not save high score to {HIGHSCORE_FILE}")
+        if self.score_writer:
+            self.score_writer.submit(score_record(self.player_name, self.score, self.moves_made,
+                                                  self.lines_cleared_total, self.seed))
 
+    # в хранилище попадает каждая партия, рекорд на экране обновляется сразу
     def update_high_score_on_game_over(self):
+        self.save_high_score()
         if self.score > self.high_score:
             self.high_score = self.score
-            self.save_high_score()
+
+    # конец партии: рекорд и реплей
+    def on_game_over(self):
+        self.update_high_score_on_game_over()
+        self.save_replay(finished=True)
+
+    # у каждой партии свой сид, чтобы ее можно было записать и воспроизвести.
+    # 63 бита - чтобы сид помещался в INTEGER таблицы результатов
+    def start_new_recording(self):
+        self.seed = random.getrandbits(63)
+        self.rng = random.Random(self.seed)
+        self.recorder = ReplayRecorder(self.seed, self.grid_size, self.block_shapes, self.colors) if RECORD_REPLAYS else None
+
+    def save_replay(self, finished):
+        if not self.recorder:
+            return
+        replay_dir = os.environ.get(REPLAY_DIR_ENV) or os.path.join(default_cache_dir(), "replays")
+        try:
+            self.recorder.save(os.path.join(replay_dir, replay_file_name(self.seed)), self.score, finished)
+        except OSError as e:
+            print(f"Не удалось сохранить реплей: {e}")
+        self.recorder = None
 
     # сброс состояния игры
     def reset_game_state(self):
-        self.grid = [[None for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
-        self.score = 0
-        self.game_over = False
-        self.current_block = None
-        self.current_block_color = None
         self.block_offset_x = 0
         self.block_offset_y = 0
-        self.available_blocks = self.generate_new_available_blocks()
-        self.particles = []
+        self.particles.clear()
+        self.last_frame_at = None
+        self.start_new_recording()
+        super().reset_game_state()
+        self.dirty.mark_all()
 
-        if self.check_if_game_is_over():
-            self.game_over = True
-
-    # генерация новых блоков для выбора игроком
-    def generate_new_available_blocks(self):
-        blocks = [random.choice(BLOCK_SHAPES) for _ in range(3)]
-        self.available_colors = [random.choice(COLORS) for _ in range(3)]
-        return blocks
-
-    # отрисовка одного блока с 3D-эффектом
+    # отрисовка одного блока с 3D-эффектом (готовый спрайт из атласа)
     def draw_3d_block(self, x, y, color, alpha=255):
-        shadow_surface = pygame.Surface((CELL_SIZE, CELL_SIZE), pygame.SRCALPHA)
-        shadow_surface.fill((*SHADOW, 100))
-        self.screen.blit(shadow_surface, (x + 5, y + 5))
-
-        block_surface = pygame.Surface((CELL_SIZE - 2, CELL_SIZE - 2))
-        if alpha < 255:
-            block_surface.set_alpha(alpha)
-        block_surface.fill(color)
-        self.screen.blit(block_surface, (x + 1, y + 1))
-
-        dark_color = darken_color(color)
-        pygame.draw.polygon(self.screen, dark_color, [
-            (x + CELL_SIZE - 2, y + 1),
-            (x + CELL_SIZE - 2, y + CELL_SIZE - 2),
-            (x + CELL_SIZE + 3, y + CELL_SIZE - 7),
-            (x + CELL_SIZE + 3, y + 6)
-        ])
-        pygame.draw.polygon(self.screen, dark_color, [
-            (x + 1, y + CELL_SIZE - 2),
-            (x + CELL_SIZE - 2, y + CELL_SIZE - 2),
-            (x + CELL_SIZE + 3, y + CELL_SIZE - 7),
-            (x + 6, y + CELL_SIZE - 7)
-        ])
+        self.screen.blit(self.block_sprites.get(color, alpha), (x, y))
 
     # отрисовка сетки поля и блоков на ней
     def draw_grid(self):
-        grid_surface = pygame.Surface((GRID_SIZE * CELL_SIZE, GRID_SIZE * CELL_SIZE), pygame.SRCALPHA)
-        grid_surface.fill(GRID_BACKGROUND_COLOR)
-        self.screen.blit(grid_surface, (GRID_OFFSET_X, GRID_OFFSET_Y))
-
-        for i in range(GRID_SIZE + 1):
-            pygame.draw.line(self.screen, GRAY,
-                           (GRID_OFFSET_X, GRID_OFFSET_Y + i * CELL_SIZE),
-                           (GRID_OFFSET_X + GRID_SIZE * CELL_SIZE, GRID_OFFSET_Y + i * CELL_SIZE), 1)
-            pygame.draw.line(self.screen, GRAY,
-                           (GRID_OFFSET_X + i * CELL_SIZE, GRID_OFFSET_Y),
-                           (GRID_OFFSET_X + i * CELL_SIZE, GRID_OFFSET_Y + GRID_SIZE * CELL_SIZE), 1)
-
-        for i in range(GRID_SIZE):
-            for j in range(GRID_SIZE):
-                if self.grid[i][j]:
-                    x = GRID_OFFSET_X + j * CELL_SIZE
-                    y = GRID_OFFSET_Y + i * CELL_SIZE
-                    self.draw_3d_block(x, y, self.grid[i][j])
+        self.screen.blit(self.grid_backdrop, (self.grid_offset_x, self.grid_offset_y))
+
+        for i, j, color in self.grid.occupied_cells():
+            x = self.grid_offset_x + j * self.cell_size
+            y = self.grid_offset_y + i * self.cell_size
+            self.draw_3d_block(x, y, color)
 
     # отрисовка доступных для выбора блоков
     def draw_available_blocks(self):
-        total_block_visual_width = 0
-        for block_shape in self.available_blocks:
-            block_width_cells = len(block_shape[0])
-            total_block_visual_width += block_width_cells * CELL_SIZE + 20
-        total_block_visual_width -= 20 if self.available_blocks else 0
-
-        x_start_offset = (WIDTH - total_block_visual_width) // 2
-        y_offset = 530 
-
-        current_x = x_start_offset
-        for idx, block_shape in enumerate(self.available_blocks):
+        for rect, idx in self.tray_block_rects():
             color = self.available_colors[idx]
-            max_block_width_pixels = 0
-            for r_idx, row_data in enumerate(block_shape):
+            for r_idx, row_data in enumerate(self.available_blocks[idx]):
                 for c_idx, cell_val in enumerate(row_data):
                     if cell_val:
-                        x_pos = current_x + c_idx * CELL_SIZE
-                        y_pos = y_offset + r_idx * CELL_SIZE
-                        self.draw_3d_block(x_pos, y_pos, color)
-                max_block_width_pixels = max(max_block_width_pixels, len(row_data) * CELL_SIZE)
-            current_x += max_block_width_pixels + 20
+                        self.draw_3d_block(rect.x + c_idx * self.cell_size, rect.y + r_idx * self.cell_size, color)
 
     # отрисовка текущего счета
     def draw_score_display(self):
-        draw_text_with_custom_outline(self.screen, str(self.score), self.score_font, WHITE, PURPLE_OUTLINE,
-                                     (WIDTH // 2, 60), is_centered=True)
+        self.score_digits().draw(self.screen, str(self.score), self.layout.score_center, is_centered=True)
 
-    # отрисовка и обновление частиц (эффекты)
-    def draw_particles(self):
-        for particle in self.particles[:]:
-            if not particle.update():
-                self.particles.remove(particle)
-            else:
-                particle.draw(self.screen)
+    # цифры счета рисуются из атласа, который строится при первом выводе счета
+    def score_digits(self):
+        if self.score_digit_atlas is None:
+            self.score_digit_atlas = DigitAtlas(self.score_font, WHITE, PURPLE_OUTLINE, self.outline_offsets)
+        return self.score_digit_atlas
 
-    # проверка, можно ли поставить блок в указанную позицию
-    def can_place_block_at(self, block_shape, grid_r, grid_c):
+    # обновление частиц (эффекты), один шаг симуляции
+    def update_particles(self):
+        self.particles.update()
+
+    # отрисовка частиц между двумя последними шагами симуляции
+    def draw_particles(self):
+        self.particles.draw(self.screen, self.timestep.alpha)
+
+    # столько шагов симуляции, сколько накопилось реального времени с прошлого кадра
+    def run_simulation(self):
+        now = time.perf_counter()
+        elapsed_ms = (now - self.last_frame_at) * 1000 if self.last_frame_at is not None else 0.0
+        self.last_frame_at = now
+        steps = self.timestep.advance(elapsed_ms)
+        for _ in range(steps):
+            self.update_particles()
+        return steps
+
+    # нет ввода, частиц, автоигры и блока в руке - можно рисовать реже
+    # (на экране конца игры частицы не двигаются и не мешают)
+    def is_idle(self):
+        return (self.idle_fps > 0 and (self.game_over or not self.particles) and not self.autoplay
+                and self.current_block is None and pygame.time.get_ticks() - self.last_input_ms > IDLE_AFTER_MS)
+
+    def frame_rate(self):
+        if not self.frame_limit:
+            return 0
+        return self.idle_fps if self.is_idle() else FPS
+
+    # область, занятая текстом счета вместе с контуром
+    def score_rect(self):
+        text_w, text_h = self.score_digits().size(str(self.score))
+        center_x, center_y = self.layout.score_center
+        pad = self.outline_padding
+        return pygame.Rect(center_x - text_w // 2 - pad, center_y - text_h // 2 - pad, text_w + 2 * pad, text_h + 2 * pad)
+
+    # область поля вместе с выступающими тенями крайних блоков
+    def grid_rect(self):
+        return pygame.Rect(self.grid_offset_x, self.grid_offset_y,
+                           self.grid_size * self.cell_size + self.block_overhang, self.grid_size * self.cell_size + self.block_overhang)
+
+    # перетаскиваемый блок и подсветка места под ним
+    def drag_rects(self, mouse_x, mouse_y):
+        if not self.current_block:
+            return []
+        block_w = len(self.current_block[0]) * self.cell_size + self.block_overhang
+        block_h = len(self.current_block) * self.cell_size + self.block_overhang
+        rects = [pygame.Rect(*self.get_dragged_block_top_left_screen_pos(mouse_x, mouse_y), block_w, block_h)]
+        snap_pos = self.find_snap_position_for_dragged_block(mouse_x, mouse_y)
+        if snap_pos:
+            rects.append(pygame.Rect(self.grid_offset_x + snap_pos[1] * self.cell_size, self.grid_offset_y + snap_pos[0] * self.cell_size,
+                                     block_w, block_h))
+        return rects
+
+    # подсказка: лучший первый ход по мнению советчика, пока поле не изменилось
+    def show_hint(self):
+        advice = self.advisor.advise_state(self, self.current_block)
+        if advice.first_move is None:
+            self.hint = None
+            return
+        tray_index, grid_r, grid_c = advice.first_move
+        block_shape = self.current_block if tray_index == len(self.available_blocks) else self.available_blocks[tray_index]
+        self.hint = (self.moves_made, block_shape, grid_r, grid_c)
+
+    # автоигра: советчик сам делает ход, пока игрок ничего не держит в руке
+    def autoplay_step(self):
+        now = pygame.time.get_ticks()
+        if self.current_block or self.game_over or now - self.last_autoplay_move_ms < AUTOPLAY_MOVE_DELAY_MS:
+            return
+        advice = self.advisor.advise_state(self)
+        if advice.first_move is None:
+            return
+        self.last_autoplay_move_ms = now
+        self.play_move(*advice.first_move)
+        if self.game_over:
+            self.on_game_over()
+
+    # прямоугольники блоков лотка для попадания мышью: [(rect, индекс)]
+    def tray_block_rects(self):
+        return [(rect, idx) for idx, rect in enumerate(self.layout.tray_block_rects(self.available_blocks))]
+
+    # подсветка клеток, которые займет форма в позиции (grid_r, grid_c)
+    def draw_shape_highlight(self, block_shape, grid_r, grid_c):
         for r_offset, row_data in enumerate(block_shape):
             for c_offset, cell_val in enumerate(row_data):
                 if cell_val:
-                    actual_r, actual_c = grid_r + r_offset, grid_c + c_offset
-                    if not (0 <= actual_r < GRID_SIZE and 0 <= actual_c < GRID_SIZE) or \
-                       self.grid[actual_r][actual_c] is not None:
-                        return False
-        return True
+                    r, c = grid_r + r_offset, grid_c + c_offset
+                    if 0 <= r < self.grid_size and 0 <= c < self.grid_size:
+                        self.screen.blit(self.cell_highlight,
+                                         (self.grid_offset_x + c * self.cell_size, self.grid_offset_y + r * self.cell_size))
+
+    # сколько поверхностей держат кэши отрисовки
+    def cached_surface_count(self):
+        return len(self.block_sprites) + self.particles.sprite_count() + 3
+
+    # оверлей профилировщика: панель перерисовывается, только когда меняются строки
+    def draw_profiler_overlay(self):
+        lines = self.profiler.overlay_text()
+        if lines is not self.profiler_panel_lines:
+            if self.profiler_font is None:
+                self.profiler_font = pygame.font.SysFont("Consolas", 14)
+            panel = pygame.Surface(self.layout.profiler_rect.size, pygame.SRCALPHA)
+            panel.fill((0, 0, 0, 170))
+            for line_number, line in enumerate(lines):
+                panel.blit(self.profiler_font.render(line, True, WHITE), (6, 4 + line_number * 15))
+            self.profiler_panel = panel
+            self.profiler_panel_lines = lines
+        self.screen.blit(self.profiler_panel, self.layout.profiler_rect.topleft)
+
+    # сравнивает кадр с предыдущим и помечает изменившиеся области
+    def collect_dirty_regions(self, mouse_x, mouse_y):
+        scene_state = (
+            (self.grid.occupancy, self.moves_made),
+            self.score,
+            (tuple(map(id, self.available_blocks)), tuple(self.available_colors)),
+            (self.music_volume, self.effect_volume),
+            self.hint,
+        )
+        last = self.last_scene_state
+        if last is None or last[0] != scene_state[0]:
+            self.dirty.mark(self.grid_rect())
+        if last is None or last[1] != scene_state[1]:
+            self.dirty.mark(self.last_score_rect)
+            self.last_score_rect = self.score_rect()
+            self.dirty.mark(self.last_score_rect)
+        if last is None or last[2] != scene_state[2]:
+            self.dirty.mark(self.layout.tray_rect)
+        if last is None or last[3] != scene_state[3]:
+            self.dirty.mark(self.layout.sliders_rect)
+        if last is not None and last[4] != scene_state[4]:
+            self.dirty.mark(self.grid_rect())
+        self.last_scene_state = scene_state
+
+        drag_rects = self.drag_rects(mouse_x, mouse_y)
+        if drag_rects != self.last_drag_rects:
+            for rect in self.last_drag_rects + drag_rects:
+                self.dirty.mark(rect)
+            self.last_drag_rects = drag_rects
+
+        particle_rect = self.particles.bounds()
+        if particle_rect or self.last_particle_rect:
+            self.dirty.mark(self.last_particle_rect)
+            self.dirty.mark(particle_rect)
+        self.last_particle_rect = particle_rect
 
     # получение позиции для перетаскиваемого блока
     def get_dragged_block_top_left_screen_pos(self, mouse_x, mouse_y):
@@ -297,125 +526,71 @@ class BlockBlast:
         if not self.current_block:
             return None
         dragged_block_screen_x, dragged_block_screen_y = self.get_dragged_block_top_left_screen_pos(mouse_x, mouse_y)
-        target_grid_c = round((dragged_block_screen_x - GRID_OFFSET_X) / CELL_SIZE)
-        target_grid_r = round((dragged_block_screen_y - GRID_OFFSET_Y) / CELL_SIZE)
+        target_grid_c = round((dragged_block_screen_x - self.grid_offset_x) / self.cell_size)
+        target_grid_r = round((dragged_block_screen_y - self.grid_offset_y) / self.cell_size)
         if self.can_place_block_at(self.current_block, target_grid_r, target_grid_c):
             return (target_grid_r, target_grid_c)
         return None
 
-    # размещение блока на сетке
-    def place_block_on_grid(self, block_shape, grid_r, grid_c, color):
-        placed_cells = 0
-        for r_offset, row_data in enumerate(block_shape):
-            for c_offset, cell_val in enumerate(row_data):
-                if cell_val:
-                    self.grid[grid_r + r_offset][grid_c + c_offset] = color
-                    placed_cells +=1
-        self.score += placed_cells
-
     # очистка заполненных линий и запуск эффектов
     def clear_completed_lines(self):
-        rows_to_clear = [r for r in range(GRID_SIZE) if all(self.grid[r][c] for c in range(GRID_SIZE))]
-        cols_to_clear = [c for c in range(GRID_SIZE) if all(self.grid[r][c] for r in range(GRID_SIZE))]
-        cleared_anything_this_turn = False
-        lines_cleared_count = 0
-        cleared_cells_coords = set()
-
-        if rows_to_clear:
-            cleared_anything_this_turn = True
-            lines_cleared_count += len(rows_to_clear)
-            for r_idx in rows_to_clear:
-                for c_idx in range(GRID_SIZE):
-                    if self.grid[r_idx][c_idx] is not None and (r_idx, c_idx) not in cleared_cells_coords:
-                        x = GRID_OFFSET_X + c_idx * CELL_SIZE + CELL_SIZE // 2
-                        y = GRID_OFFSET_Y + r_idx * CELL_SIZE + CELL_SIZE // 2
-                        for _ in range(8):
-                            self.particles.append(Particle(x, y))
-                        self.grid[r_idx][c_idx] = None
-                        cleared_cells_coords.add((r_idx, c_idx))
-
-        if cols_to_clear:
-            if not cleared_anything_this_turn:
-                 cleared_anything_this_turn = True
-            lines_cleared_count += len(cols_to_clear)
-            for c_idx in cols_to_clear:
-                for r_idx in range(GRID_SIZE):
-                    if self.grid[r_idx][c_idx] is not None and (r_idx, c_idx) not in cleared_cells_coords:
-                        x = GRID_OFFSET_X + c_idx * CELL_SIZE + CELL_SIZE // 2
-                        y = GRID_OFFSET_Y + r_idx * CELL_SIZE + CELL_SIZE // 2
-                        for _ in range(8):
-                            self.particles.append(Particle(x, y))
-                        self.grid[r_idx][c_idx] = None
-                        cleared_cells_coords.add((r_idx, c_idx))
-
-        if cleared_anything_this_turn:
-            self.destroy_sound.set_volume(min(1.0, self.effect_volume * self.destroy_sound_base_multiplier))
-            self.destroy_sound.play()
-            self.score += lines_cleared_count * 50
-
-    # проверка окончания игры (нет доступных ходов)
-    def check_if_game_is_over(self):
-        if not self.available_blocks:
-            return True
-        for block_shape in self.available_blocks:
-            for r in range(GRID_SIZE):
-                for c in range(GRID_SIZE):
-                    if self.can_place_block_at(block_shape, r, c):
-                        return False
-        return True
+        cleared_cells, lines_cleared_count = super().clear_completed_lines()
+
+        for r_idx, c_idx in cleared_cells:
+            x = self.grid_offset_x + c_idx * self.cell_size + self.cell_size // 2
+            y = self.grid_offset_y + r_idx * self.cell_size + self.cell_size // 2
+            self.particles.emit(x, y, PARTICLES_PER_CELL)
+
+        if lines_cleared_count:
+            self.audio.play("destroy_sound")
+        return cleared_cells, lines_cleared_count
 
     # отрисовка слайдеров громкости
     def draw_volume_sliders(self):
-        slider_width, slider_height = 180, 18
-        slider_x = 20 
-
-        slider_y_music = 30 
-        slider_y_effects = slider_y_music + 50 
-
-        pygame.draw.rect(self.screen, GRAY, (slider_x, slider_y_music, slider_width, slider_height), border_radius=5)
-        fill_width_music = int(slider_width * self.music_volume)
-        pygame.draw.rect(self.screen, PURPLE_OUTLINE, (slider_x, slider_y_music, fill_width_music, slider_height), border_radius=5)
-        pygame.draw.circle(self.screen, WHITE, (slider_x + fill_width_music, slider_y_music + slider_height // 2), 8)
-        draw_text_with_custom_outline(self.screen, "Music", self.slider_label_font, WHITE, DARK_PURPLE,
-                                     (slider_x + slider_width // 2, slider_y_music - 15), 
-                                     is_centered=True)
-
-        pygame.draw.rect(self.screen, GRAY, (slider_x, slider_y_effects, slider_width, slider_height), border_radius=5)
-        fill_width_effects = int(slider_width * self.effect_volume)
-        pygame.draw.rect(self.screen, PURPLE_OUTLINE, (slider_x, slider_y_effects, fill_width_effects, slider_height), border_radius=5)
-        pygame.draw.circle(self.screen, WHITE, (slider_x + fill_width_effects, slider_y_effects + slider_height // 2), 8)
-        draw_text_with_custom_outline(self.screen, "Effects", self.slider_label_font, WHITE, DARK_PURPLE,
-                                     (slider_x + slider_width // 2, slider_y_effects - 15), 
-                                     is_centered=True)
+        layout = self.layout
+        for rect, volume, label in ((layout.music_slider, self.music_volume, "Music"),
+                                    (layout.effects_slider, self.effect_volume, "Effects")):
+            pygame.draw.rect(self.screen, GRAY, rect, border_radius=layout.slider_border_radius)
+            fill_width = int(rect.width * volume)
+            pygame.draw.rect(self.screen, PURPLE_OUTLINE, (rect.x, rect.y, fill_width, rect.height),
+                             border_radius=layout.slider_border_radius)
+            pygame.draw.circle(self.screen, WHITE, (rect.x + fill_width, rect.y + rect.height // 2), layout.slider_knob_radius)
+            draw_text_with_custom_outline(self.screen, label, self.slider_label_font, WHITE, DARK_PURPLE,
+                                          (rect.centerx, rect.y - layout.slider_label_gap), is_centered=True,
+                                          custom_offsets=self.outline_offsets)
+
+    # полосы слайдеров музыки и эффектов
+    def slider_rects(self):
+        return self.layout.music_slider, self.layout.effects_slider
 
     # обработка взаимодействия со слайдерами громкости
     def handle_slider_interaction(self, mouse_x, mouse_y, is_dragging):
-        slider_width, slider_height = 180, 18
-        slider_x = 20
-        slider_y_music = 30 
-        slider_y_effects = slider_y_music + 50 
+        music_slider_rect, effects_slider_rect = self.slider_rects()
+        slider_x, slider_width = music_slider_rect.x, music_slider_rect.width
 
-        music_slider_rect = pygame.Rect(slider_x, slider_y_music, slider_width, slider_height)
         if self.dragging_music_slider or (is_dragging and music_slider_rect.collidepoint(mouse_x, mouse_y)):
             self.dragging_music_slider = True
             self.music_volume = max(0, min(1, (mouse_x - slider_x) / slider_width))
-            pygame.mixer.music.set_volume(self.music_volume)
+            self.audio.set_music_volume(self.music_volume)
 
-        effects_slider_rect = pygame.Rect(slider_x, slider_y_effects, slider_width, slider_height)
         if self.dragging_effect_slider or (is_dragging and effects_slider_rect.collidepoint(mouse_x, mouse_y)):
             self.dragging_effect_slider = True
             self.effect_volume = max(0, min(1, (mouse_x - slider_x) / slider_width))
-            self.pickup_sound.set_volume(self.effect_volume)
-            self.destroy_sound.set_volume(min(1.0, self.effect_volume * self.destroy_sound_base_multiplier))
+            self.audio.set_effect_volume(self.effect_volume)
 
     # основной игровой цикл (асинхронный)
     async def game_loop_iteration(self):
-        mouse_x, mouse_y = pygame.mouse.get_pos()
+        profiler = self.profiler
+        profiler.begin_frame()
+        self.apply_loaded_assets()
+        (mouse_x, mouse_y), events = self.input.poll()
 
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 self.running = False
                 return
+            if event.type in INPUT_EVENTS:
+                self.last_input_ms = pygame.time.get_ticks()
 
             if event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 1:
@@ -423,50 +598,25 @@ class BlockBlast:
 
                     if not (self.dragging_music_slider or self.dragging_effect_slider):
                         if self.current_block is None:
-                            total_block_visual_width = 0
-                            block_rects_and_indices = []
-                            _total_width_calc = sum(len(bs[0]) * CELL_SIZE + 20 for bs in self.available_blocks) -20 if self.available_blocks else 0
-                            temp_x_start_offset = (WIDTH - _total_width_calc) // 2
-                            temp_y_offset_available = 530 
-
-                            current_x_for_collision = temp_x_start_offset
-                            for idx, block_shape in enumerate(self.available_blocks):
-                                block_pixel_width = len(block_shape[0]) * CELL_SIZE
-                                block_pixel_height = len(block_shape) * CELL_SIZE
-                                block_rect = pygame.Rect(current_x_for_collision, temp_y_offset_available, block_pixel_width, block_pixel_height)
-                                block_rects_and_indices.append((block_rect, idx))
-                                current_x_for_collision += block_pixel_width + 20
-                            
-                            for rect, idx in block_rects_and_indices:
+                            for rect, idx in self.tray_block_rects():
                                 if rect.collidepoint(mouse_x, mouse_y):
-                                    self.current_block = self.available_blocks.pop(idx)
-                                    self.current_block_color = self.available_colors.pop(idx)
+                                    self.pick_block(idx)
                                     self.block_offset_x = mouse_x - rect.x
                                     self.block_offset_y = mouse_y - rect.y
-                                    self.pickup_sound.set_volume(self.effect_volume)
-                                    self.pickup_sound.play()
+                                    self.audio.play("pickup_sound")
                                     break
                         else:
                             snap_pos = self.find_snap_position_for_dragged_block(mouse_x, mouse_y)
                             if snap_pos:
-                                self.place_block_on_grid(self.current_block, snap_pos[0], snap_pos[1], self.current_block_color)
-                                self.clear_completed_lines()
-                                self.current_block = None
-                                self.current_block_color = None
+                                self.place_held_block(snap_pos[0], snap_pos[1])
                                 self.block_offset_x = 0
                                 self.block_offset_y = 0
-                                if not self.available_blocks:
-                                    self.available_blocks = self.generate_new_available_blocks()
-                                if self.check_if_game_is_over():
-                                    self.game_over = True
-                                    self.update_high_score_on_game_over()
+                                if self.game_over:
+                                    self.on_game_over()
 
                 elif event.button == 3:
                     if self.current_block:
-                        self.available_blocks.append(self.current_block)
-                        self.available_colors.append(self.current_block_color)
-                        self.current_block = None
-                        self.current_block_color = None
+                        self.return_held_block()
 
             if event.type == pygame.MOUSEBUTTONUP:
                 if event.button == 1:
@@ -477,80 +627,138 @@ class BlockBlast:
                 if self.dragging_music_slider or self.dragging_effect_slider:
                     self.handle_slider_interaction(mouse_x, mouse_y, False)
 
+            self.handle_window_event(event)
+
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_h:
+                    self.show_hint()
+                elif event.key == pygame.K_a:
+                    self.autoplay = not self.autoplay
+                elif event.key == pygame.K_z:
+                    # блок из руки сначала возвращается в лоток, как правой кнопкой
+                    if self.current_block is not None:
+                        self.return_held_block()
+                    self.undo()
+                elif event.key == pygame.K_y:
+                    self.redo()
+                elif event.key == pygame.K_F3:
+                    profiler.toggle_overlay()
+                    self.dirty.mark(self.layout.profiler_rect)
+        self.apply_window_size()
+        profiler.lap("events")
+
+        if self.autoplay:
+            self.autoplay_step()
+        if self.hint and self.hint[0] != self.moves_made:
+            self.hint = None
+
+        self.update_and_draw(mouse_x, mouse_y)
+        self.clock.tick(self.frame_rate())
+        # кадр окончен: управление другим задачам цикла asyncio (браузер, инструменты рядом с игрой)
+        await asyncio.sleep(0)
+
+    # шаги симуляции и отрисовка изменившихся областей кадра
+    def update_and_draw(self, mouse_x, mouse_y):
+        profiler = self.profiler
+        sim_steps = self.run_simulation()
+        self.collect_dirty_regions(mouse_x, mouse_y)
+        if profiler.overlay_visible:
+            self.dirty.mark(self.layout.profiler_rect)
+        profiler.lap("update")
+        if not self.dirty:
+            # ничего не изменилось - не рисуем и не трогаем дисплей
+            profiler.end_frame(particles=len(self.particles), surfaces=self.cached_surface_count(), dirty_rects=0,
+                               sim_steps=sim_steps)
+            return
+
+        dirty_rects = self.dirty.take()
+        self.screen.set_clip(union_of(dirty_rects))
         self.screen.blit(self.background, (0, 0))
+        profiler.lap("background")
         self.draw_grid()
+        profiler.lap("draw_grid")
         self.draw_available_blocks()
+        profiler.lap("draw_available_blocks")
         self.draw_score_display()
+        profiler.lap("draw_score_display")
         self.draw_particles()
+        profiler.lap("draw_particles")
         self.draw_volume_sliders()
+        profiler.lap("draw_volume_sliders")
+        if self.hint:
+            self.draw_shape_highlight(*self.hint[1:])
 
         if self.current_block:
             snap_pos_highlight = self.find_snap_position_for_dragged_block(mouse_x, mouse_y)
             if snap_pos_highlight:
-                highlight_surface = pygame.Surface((GRID_SIZE * CELL_SIZE, GRID_SIZE * CELL_SIZE), pygame.SRCALPHA)
-                for r_offset, row_data in enumerate(self.current_block):
-                    for c_offset, cell_val in enumerate(row_data):
-                        if cell_val:
-                            r, c = snap_pos_highlight[0] + r_offset, snap_pos_highlight[1] + c_offset
-                            if 0 <= r < GRID_SIZE and 0 <= c < GRID_SIZE:
-                                pygame.draw.rect(highlight_surface, HIGHLIGHT_FILL,
-                                                (c * CELL_SIZE, r * CELL_SIZE, CELL_SIZE, CELL_SIZE))
-                                pygame.draw.rect(highlight_surface, HIGHLIGHT,
-                                                (c * CELL_SIZE, r * CELL_SIZE, CELL_SIZE, CELL_SIZE), 3)
-                self.screen.blit(highlight_surface, (GRID_OFFSET_X, GRID_OFFSET_Y))
+                self.draw_shape_highlight(self.current_block, snap_pos_highlight[0], snap_pos_highlight[1])
 
             dragged_block_draw_x, dragged_block_draw_y = self.get_dragged_block_top_left_screen_pos(mouse_x, mouse_y)
             for r_offset, row_data in enumerate(self.current_block):
                 for c_offset, cell_val in enumerate(row_data):
                     if cell_val:
-                        self.draw_3d_block(dragged_block_draw_x + c_offset * CELL_SIZE,
-                                           dragged_block_draw_y + r_offset * CELL_SIZE,
-                                           self.current_block_color, alpha=200)
-
-        pygame.display.flip()
-        self.clock.tick(FPS)
-        if platform.system() == "Emscripten":
-            await asyncio.sleep(0)
+                        self.draw_3d_block(dragged_block_draw_x + c_offset * self.cell_size,
+                                           dragged_block_draw_y + r_offset * self.cell_size,
+                                           self.current_block_color, alpha=DRAGGED_BLOCK_ALPHA)
+        profiler.lap("drag")
+
+        if profiler.overlay_visible:
+            self.draw_profiler_overlay()
+        profiler.lap("overlay")
+
+        self.screen.set_clip(None)
+        pygame.display.update(dirty_rects)
+        profiler.lap("display_update")
+        if self.time_to_first_frame_ms is None:
+            self.time_to_first_frame_ms = (time.perf_counter() - self.init_started_at) * 1000
+            print(f"Первый кадр через {self.time_to_first_frame_ms:.0f} мс")
+        profiler.end_frame(particles=len(self.particles), surfaces=self.cached_surface_count(),
+                           dirty_rects=len(dirty_rects), sim_steps=sim_steps)
 
     # цикл экрана окончания игры
     async def game_over_screen_loop(self):
         while self.running:
-            for event in pygame.event.get():
+            self.apply_loaded_assets()
+            _, events = self.input.poll()
+            for event in events:
                 if event.type == pygame.QUIT:
                     self.running = False
                     return False
+                if event.type in INPUT_EVENTS:
+                    self.last_input_ms = pygame.time.get_ticks()
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_r:
                         return True
                     if event.key == pygame.K_q:
                         self.running = False
                         return False
+                self.handle_window_event(event)
+            self.apply_window_size()
 
+            title_pos, score_pos, high_score_pos, restart_pos, quit_pos = self.layout.game_over_positions
             self.screen.blit(self.background, (0, 0))
             draw_text_with_custom_outline(self.screen, "GAME OVER", self.game_over_title_font, WHITE, DARK_ORCHID,
-                                         (WIDTH // 2, HEIGHT // 3), is_centered=True)
+                                         title_pos, is_centered=True, custom_offsets=self.outline_offsets)
             draw_text_with_custom_outline(self.screen, f"Score: {self.score}", self.score_font, WHITE, PURPLE_OUTLINE,
-                                         (WIDTH // 2, HEIGHT // 2 - 20), is_centered=True)
+                                         score_pos, is_centered=True, custom_offsets=self.outline_offsets)
             draw_text_with_custom_outline(self.screen, f"High Score: {self.high_score}", self.score_font, WHITE, PURPLE_OUTLINE,
-                                         (WIDTH // 2, HEIGHT // 2 + 40), is_centered=True)
+                                         high_score_pos, is_centered=True, custom_offsets=self.outline_offsets)
             draw_text_with_custom_outline(self.screen, "Press R to Restart", self.instruction_font, WHITE, GRAY,
-                                         (WIDTH // 2, HEIGHT * 2 // 3), is_centered=True)
+                                         restart_pos, is_centered=True, custom_offsets=self.outline_offsets)
             draw_text_with_custom_outline(self.screen, "Press Q to Quit", self.instruction_font, WHITE, GRAY,
-                                         (WIDTH // 2, HEIGHT * 2 // 3 + 40), is_centered=True)
+                                         quit_pos, is_centered=True, custom_offsets=self.outline_offsets)
 
             pygame.display.flip()
-            self.clock.tick(FPS)
-            if platform.system() == "Emscripten":
-                await asyncio.sleep(0)
+            self.clock.tick(self.frame_rate())
+            await asyncio.sleep(0)
         return False
 
     # запуск всей игры
     async def run_game(self):
-        try:
-            if hasattr(pygame.mixer.music, 'get_busy'):
-                 pygame.mixer.music.play(-1)
-        except pygame.error as e:
-            print(f"Не удалось запустить музыку: {e}")
+        # музыка стартует, как только догрузится
+        self.music_requested = True
+        if self.music_loaded:
+            self.start_music()
 
         while self.running:
             if self.game_over:
@@ -561,16 +769,97 @@ class BlockBlast:
                     break
             else:
                 await self.game_loop_iteration()
-        try:
-            if hasattr(pygame.mixer.music, 'get_busy'):
-                pygame.mixer.music.stop()
-        except pygame.error:
-            pass
+        if not self.game_over and self.moves_made:
+            self.save_replay(finished=False)
+        self.audio.close()
+        self.profiler.close()
+        if self.score_writer:
+            self.score_writer.close()
         pygame.quit()
 
-# запуск BlockBlast
+# воспроизведение записанной партии в окне: ввод игрока отключен, действия идут из реплея
+# со скоростью speed (1 - одно действие за REPLAY_STEP_MS). R на экране конца игры запускает реплей заново
+class ReplayBlockBlast(ReplayDeals, BlockBlast):
+    def __init__(self, replay, speed=1.0, rules=None, **display_options):
+        if (rules or GameRules()).grid_size != replay.grid_size:
+            raise ReplayError(f"Реплей записан на поле {replay.grid_size}x{replay.grid_size}, нужен файл правил")
+        self.replay = replay
+        self.player = ReplayPlayer(self, speed, REPLAY_STEP_MS)
+        self.hand_pos = (0, 0)
+        self.reported = False
+        BlockBlast.__init__(self, rules, **display_options)
+
+    def start_new_recording(self):
+        self.start_replay(self.replay)
+        self.recorder = None
+        self.player.rewind()
+        self.reported = False
+
+    # блок в руке рисуется там, где он лежал в лотке, до следующего действия
+    def pick_block(self, block_index):
+        self.hand_pos = self.tray_block_rects()[block_index][0].topleft
+        super().pick_block(block_index)
+
+    # пока реплей идет, экономить нечего
+    def is_idle(self):
+        return self.player.done and super().is_idle()
+
+    async def game_loop_iteration(self):
+        self.profiler.begin_frame()
+        self.apply_loaded_assets()
+        _, events = self.input.poll()
+        for event in events:
+            if event.type == pygame.QUIT:
+                self.running = False
+                return
+            self.handle_window_event(event)
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.profiler.toggle_overlay()
+                self.dirty.mark(self.layout.profiler_rect)
+        self.apply_window_size()
+        self.player.advance(self.clock.get_time())
+        self.profiler.lap("events")
+        if self.player.done and not self.reported:
+            self.reported = True
+            print(f"Реплей окончен: счет {self.score}, записано {self.replay.final_score}, "
+                  f"расхождений раздач {self.deal_mismatches}")
+
+        self.update_and_draw(*self.hand_pos)
+        self.clock.tick(self.frame_rate())
+        await asyncio.sleep(0)
+
+
+# запуск BlockBlast; --replay воспроизводит записанную партию
 if __name__ == "__main__":
-    game_instance = BlockBlast()
+    parser = argparse.ArgumentParser(description="Block Blast")
+    parser.add_argument("--replay", help="файл реплея для воспроизведения")
+    parser.add_argument("--speed", type=float, default=1.0, help="скорость воспроизведения реплея")
+    parser.add_argument("--rules", help="файл правил варианта игры (JSON): размер поля, формы, повороты")
+    parser.add_argument("--generator", choices=sorted(GENERATORS),
+                        help="генератор раздач вместо заданного в правилах (по умолчанию uniform)")
+    parser.add_argument("--window", default=f"{WINDOW_SIZE[0]}x{WINDOW_SIZE[1]}", help="размер окна ШИРИНАxВЫСОТА")
+    parser.add_argument("--fullscreen", action="store_true", help="полный экран (переключается F11)")
+    parser.add_argument("--render-height", type=int, default=None,
+                        help="наибольшая высота кадра: на окне выше кадр рисуется меньше и растягивается")
+    args, _ = parser.parse_known_args()
+    game_rules = load_rules(args.rules) if args.rules else None
+    if args.generator:
+        game_rules = game_rules or GameRules()
+        game_rules.generator = make_generator(args.generator).spec()
+    try:
+        window_size = tuple(int(part) for part in args.window.lower().split("x"))
+        if len(window_size) != 2 or min(window_size) <= 0:
+            raise ValueError
+    except ValueError:
+        parser.error(f"размер окна задается как 550x700: {args.window}")
+    if args.render_height is not None and args.render_height <= 0:
+        parser.error("--render-height должен быть больше нуля")
+    display_options = {"window_size": window_size, "fullscreen": args.fullscreen, "render_height": args.render_height}
+    if args.replay:
+        # реплей варианта игры воспроизводится с теми же правилами, что и записывался
+        game_instance = ReplayBlockBlast(load_replay(args.replay), args.speed, game_rules, **display_options)
+    else:
+        game_instance = BlockBlast(game_rules, **display_options)
     if platform.system() == "Emscripten":
         asyncio.ensure_future(game_instance.run_game())
     else:
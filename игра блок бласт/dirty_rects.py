@@ -0,0 +1,56 @@
+import pygame
+
+# учет "грязных" областей экрана: перерисовываем и отправляем на дисплей только то, что изменилось
+
+
+class DirtyRegions:
+    def __init__(self, bounds):
+        self.bounds = pygame.Rect(bounds)
+        self.rects = []
+        self.full = True
+
+    # пометить прямоугольник (или None, тогда ничего не делаем)
+    def mark(self, rect):
+        if rect is None or self.full:
+            return
+        rect = pygame.Rect(rect).clip(self.bounds)
+        if rect.width and rect.height:
+            self.rects.append(rect)
+
+    # перерисовать весь экран, например после сворачивания окна или рестарта
+    def mark_all(self):
+        self.full = True
+        self.rects = []
+
+    def __bool__(self):
+        return self.full or bool(self.rects)
+
+    # забирает накопленные области, склеивая пересекающиеся, и сбрасывает учет
+    def take(self):
+        if self.full:
+            self.full = False
+            self.rects = []
+            return [self.bounds.copy()]
+
+        merged = []
+        for rect in self.rects:
+            rect = rect.copy()
+            changed = True
+            while changed:
+                changed = False
+                for other in merged:
+                    if rect.colliderect(other):
+                        rect.union_ip(other)
+                        merged.remove(other)
+                        changed = True
+                        break
+            merged.append(rect)
+        self.rects = []
+        return merged
+
+
+# общий прямоугольник, охватывающий список областей
+def union_of(rects):
+    if not rects:
+        return None
+    return rects[0].unionall(rects[1:])
@@ -0,0 +1,246 @@
+import random
+
+from bitboard import BitGrid, full_lines_mask
+from generators import make_generator
+from history import GameHistory, apply_events, restore_snapshot, revert_events
+
+# правила игры без pygame: этот модуль можно импортировать без окна, звука и картинок
+
+GRID_SIZE = 8
+LINE_CLEAR_POINTS = 50
+TRAY_SIZE = 3
+
+COLORS = [
+    (138, 43, 226),
+    (148, 0, 211),
+    (255, 20, 147),
+    (255, 105, 180),
+    (0, 0, 205),
+    (75, 0, 130),
+]
+
+# формы блоков для игры
+BLOCK_SHAPES = [
+    [[1]], [[1, 1]], [[1], [1]], [[1, 1], [1, 1]],
+    [[1, 1, 1]], [[1], [1], [1]], [[1, 1], [0, 1]],
+]
+
+
+# состояние одной партии: поле, счет и лоток из трех блоков
+class GameState:
+    # набор форм, цветов и очки за линию можно подменить на экземпляре для подбора баланса
+    block_shapes = BLOCK_SHAPES
+    colors = COLORS
+    line_clear_points = LINE_CLEAR_POINTS
+    # запись партии (replay.ReplayRecorder); None - партия не записывается
+    recorder = None
+    # журнал ходов для отмены и повтора (history.py); False - без журнала, чуть быстрее для самоигры
+    keep_history = True
+    # индекс допустимых мест на поле; False - без индекса, если конец игры проверяется снаружи пакетом (server.py)
+    track_placements = True
+
+    def __init__(self, rng=None, grid_size=GRID_SIZE, rules=None):
+        # rng - любой объект с choice/random, по умолчанию общий модуль random
+        self.rng = rng if rng is not None else random
+        rules = dict(rules or {})
+        # размер поля из правил (rules.GameRules.as_dict) важнее аргумента
+        grid_size = rules.pop("grid_size", grid_size)
+        # генератор раздач (generators.py): описание из правил или готовый объект с методом deal
+        generator = rules.pop("generator", None)
+        self.generator = generator if hasattr(generator, "deal") else make_generator(generator)
+        for key, value in rules.items():
+            if key not in ("block_shapes", "colors", "line_clear_points"):
+                raise ValueError(f"Неизвестное правило: {key}")
+            setattr(self, key, value)
+        self.grid_size = grid_size
+        self.reset_game_state()
+
+    # сброс состояния игры
+    def reset_game_state(self):
+        self.grid = BitGrid(self.grid_size)
+        # индекс допустимых мест для всех форм обновляется на каждом ходу,
+        # поэтому проверка конца игры и список ходов не сканируют поле заново
+        if self.track_placements:
+            self.grid.track_shapes(self.block_shapes)
+        self.score = 0
+        self.moves_made = 0
+        self.lines_cleared_total = 0
+        self.game_over = False
+        # блок, взятый из лотка в руку, и его цвет
+        self.current_block = None
+        self.current_block_color = None
+        self.current_block_index = None
+        self.history = GameHistory() if self.keep_history else None
+        self.available_blocks = self.generate_new_available_blocks()
+
+        if self.check_if_game_is_over():
+            self.game_over = True
+        if self.history:
+            self.history.maybe_snapshot(self)
+
+    # генерация новых блоков для выбора игроком: раздача, а затем запись в реплей и журнал ходов
+    def generate_new_available_blocks(self):
+        blocks, self.available_colors = self.deal_tray()
+        if self.recorder:
+            self.recorder.deal(blocks, self.available_colors)
+        if self.history:
+            self.history.record(("deal", tuple(blocks), tuple(self.available_colors)))
+        return blocks
+
+    # сам лоток: формы и цвета. наследники подменяют только его, запись остается общей
+    def deal_tray(self):
+        return self.generator.deal(self, TRAY_SIZE)
+
+    # проверка, можно ли поставить блок в указанную позицию
+    def can_place_block_at(self, block_shape, grid_r, grid_c):
+        return self.grid.can_place(block_shape, grid_r, grid_c)
+
+    # размещение блока на сетке
+    def place_block_on_grid(self, block_shape, grid_r, grid_c, color):
+        points = self.grid.place(block_shape, grid_r, grid_c, color)
+        self.score += points
+        self.moves_made += 1
+        if self.history:
+            self.history.record(("place", self.grid.shape_masks(block_shape).mask_at(grid_r, grid_c), color, points))
+
+    # очистка заполненных линий, возвращает очищенные клетки и число линий
+    def clear_completed_lines(self):
+        rows_to_clear, cols_to_clear = self.grid.find_full_lines()
+        lines_cleared_count = len(rows_to_clear) + len(cols_to_clear)
+        if lines_cleared_count and self.history:
+            cleared_mask = full_lines_mask(self.grid.occupancy, self.grid_size)[0]
+            self.history.record(("clear", cleared_mask, self.grid.cell_colors(cleared_mask),
+                                 lines_cleared_count * self.line_clear_points, lines_cleared_count))
+        cleared_cells = self.grid.clear_lines(rows_to_clear, cols_to_clear)
+        if lines_cleared_count:
+            self.score += lines_cleared_count * self.line_clear_points
+            self.lines_cleared_total += lines_cleared_count
+        return cleared_cells, lines_cleared_count
+
+    # проверка окончания игры (нет доступных ходов)
+    def check_if_game_is_over(self):
+        if not self.available_blocks:
+            return True
+        return not self.grid.any_fits(self.available_blocks)
+
+    # все ходы для текущего лотка: (индекс блока, строка, столбец)
+    def legal_moves(self):
+        moves = []
+        for idx, block_shape in enumerate(self.available_blocks):
+            moves.extend([(idx, grid_r, grid_c) for grid_r, grid_c in self.grid.legal_anchors(block_shape)])
+        return moves
+
+    # взять блок из лотка в руку
+    def pick_block(self, block_index):
+        self.current_block = self.available_blocks.pop(block_index)
+        self.current_block_color = self.available_colors.pop(block_index)
+        self.current_block_index = block_index
+        if self.recorder:
+            self.recorder.pick(block_index)
+
+    # вернуть блок из руки в конец лотка (правая кнопка мыши)
+    def return_held_block(self):
+        self.available_blocks.append(self.current_block)
+        self.available_colors.append(self.current_block_color)
+        self.current_block = None
+        self.current_block_color = None
+        self.current_block_index = None
+        # порядок лотка изменился, отмененные ходы уже не повторить
+        if self.history:
+            self.history.drop_redo()
+        if self.recorder:
+            self.recorder.cancel()
+
+    # поставить блок из руки: очистить линии, при пустом лотке раздать новый и проверить конец игры
+    def place_held_block(self, grid_r, grid_c):
+        if self.recorder:
+            self.recorder.place(grid_r, grid_c)
+        if self.history:
+            self.history.begin_move()
+            self.history.record(("pick", self.current_block_index, self.current_block, self.current_block_color))
+        self.place_block_on_grid(self.current_block, grid_r, grid_c, self.current_block_color)
+        result = self.clear_completed_lines()
+        self.current_block = None
+        self.current_block_color = None
+        self.current_block_index = None
+        if not self.available_blocks:
+            self.available_blocks = self.generate_new_available_blocks()
+        if self.check_if_game_is_over():
+            self.game_over = True
+        if self.history:
+            self.history.end_recording()
+            self.history.maybe_snapshot(self)
+        return result
+
+    # полный ход без интерфейса: взять блок из лотка и сразу поставить
+    def play_move(self, block_index, grid_r, grid_c):
+        if not self.can_place_block_at(self.available_blocks[block_index], grid_r, grid_c):
+            raise ValueError(f"Нельзя поставить блок {block_index} в ({grid_r}, {grid_c})")
+        self.pick_block(block_index)
+        return self.place_held_block(grid_r, grid_c)
+
+    # отмена последнего хода; блок в руке сначала нужно вернуть в лоток
+    def undo(self):
+        if self.current_block is not None or not self.history or not self.history.can_undo():
+            return False
+        self.history.cursor -= 1
+        revert_events(self, self.history.moves[self.history.cursor])
+        self.game_over = False
+        if self.recorder:
+            self.recorder.undo()
+        return True
+
+    def redo(self):
+        if self.current_block is not None or not self.history or not self.history.can_redo():
+            return False
+        apply_events(self, self.history.moves[self.history.cursor])
+        self.history.cursor += 1
+        self.game_over = self.check_if_game_is_over()
+        if self.recorder:
+            self.recorder.redo()
+        return True
+
+    # переход к состоянию после move_number ходов: от ближайшего снимка или от текущего хода
+    def seek(self, move_number):
+        history = self.history
+        if self.current_block is not None or not history or not 0 <= move_number <= len(history.moves):
+            return False
+        snapshot_move, snapshot = history.snapshot_before(move_number)
+        if move_number - snapshot_move < abs(history.cursor - move_number):
+            restore_snapshot(self, snapshot)
+            history.cursor = snapshot_move
+        while history.cursor < move_number:
+            apply_events(self, history.moves[history.cursor])
+            history.cursor += 1
+        while history.cursor > move_number:
+            history.cursor -= 1
+            revert_events(self, history.moves[history.cursor])
+        self.game_over = self.check_if_game_is_over()
+        if self.recorder:
+            self.recorder.seek(move_number)
+        return True
+
+    # пробный ход для поиска и подсказок: меняются только поле и счет, без лотка, раздачи и записи.
+    # возвращает (очки за ход, число линий); вернуть все назад - undo_trial.
+    # индекс допустимых мест на время проб отключается: после отката поле то же, и индекс верен
+    def try_place(self, block_shape, grid_r, grid_c):
+        score_before = self.score
+        history = self.history
+        if not history:
+            raise ValueError("Пробные ходы работают только с журналом ходов")
+        if not history.trials:
+            history.trial_index = self.grid.placement_index
+            self.grid.placement_index = None
+        recording = history.recording
+        history.begin_trial()
+        GameState.place_block_on_grid(self, block_shape, grid_r, grid_c, None)
+        _, lines = GameState.clear_completed_lines(self)
+        history.recording = recording
+        return self.score - score_before, lines
+
+    def undo_trial(self):
+        history = self.history
+        revert_events(self, history.trials.pop())
+        if not history.trials:
+            self.grid.placement_index = history.trial_index
+            history.trial_index = None
@@ -0,0 +1,116 @@
+import bisect
+import itertools
+
+# раздача лотка. генератор получает состояние партии (поле, формы, цвета, rng) и возвращает
+# формы и цвета новых блоков. вся случайность берется из state.rng, поэтому при одном сиде
+# и одних ходах раздачи повторяются, а реплей может проверить их заново.
+# в правилах генератор задается так:
+#   {"generator": {"name": "fair", "size_weights": {"1": 0.5, "5": 2}, "guarantee": 1}}
+
+GENERATOR_FIELDS = ("name", "size_weights", "guarantee")
+
+
+# старое поведение: каждая форма и цвет независимо и равновероятно
+class UniformGenerator:
+    name = "uniform"
+
+    def deal(self, state, count):
+        rng = state.rng
+        blocks = [rng.choice(state.block_shapes) for _ in range(count)]
+        colors = [rng.choice(state.colors) for _ in range(count)]
+        return blocks, colors
+
+    def spec(self):
+        return {"name": self.name}
+
+
+# веса форм по числу клеток и гарантия: хотя бы guarantee блоков лотка можно поставить на поле.
+# если случайный лоток не проходит, лишние места заменяются формами из тех, что сейчас помещаются.
+# какие формы помещаются, видно из индекса допустимых мест поля - это проход по списку форм без
+# сканирования клеток. без весов розыгрыш тратит rng так же, как UniformGenerator
+class FairGenerator:
+    name = "fair"
+
+    def __init__(self, size_weights=None, guarantee=1):
+        self.size_weights = {int(cells): float(weight) for cells, weight in (size_weights or {}).items()}
+        self.guarantee = guarantee
+        # накопленные веса по набору форм; сам набор хранится рядом, чтобы id не достался другому объекту
+        self._cum_weights = {}
+        # сколько раздач пришлось исправлять
+        self.repairs = 0
+
+    def cum_weights(self, block_shapes):
+        entry = self._cum_weights.get(id(block_shapes))
+        if entry is None or entry[0] is not block_shapes:
+            weights = [self.size_weights.get(sum(map(sum, block_shape)), 1.0) for block_shape in block_shapes]
+            entry = (block_shapes, list(itertools.accumulate(weights)))
+            self._cum_weights[id(block_shapes)] = entry
+        return entry[1]
+
+    # одна форма из списка с учетом весов; если у всех нулевой вес - равновероятно
+    def choose(self, rng, block_shapes, cum_weights):
+        if not self.size_weights or cum_weights[-1] <= 0:
+            return rng.choice(block_shapes)
+        return block_shapes[bisect.bisect(cum_weights, rng.random() * cum_weights[-1])]
+
+    def deal(self, state, count):
+        rng = state.rng
+        block_shapes = state.block_shapes
+        cum_weights = self.cum_weights(block_shapes)
+        blocks = [self.choose(rng, block_shapes, cum_weights) for _ in range(count)]
+        colors = [rng.choice(state.colors) for _ in range(count)]
+
+        fitting = state.grid.fitting_shapes(block_shapes)
+        fitting_ids = {id(block_shape) for block_shape in fitting}
+        missing = min(self.guarantee, count) - sum(id(block_shape) in fitting_ids for block_shape in blocks)
+        if missing > 0 and fitting:
+            self.repairs += 1
+            fitting_cum = list(itertools.accumulate(
+                self.size_weights.get(sum(map(sum, block_shape)), 1.0) for block_shape in fitting))
+            slots = [slot for slot, block_shape in enumerate(blocks) if id(block_shape) not in fitting_ids]
+            for _ in range(missing):
+                slot = slots.pop(rng.randrange(len(slots)))
+                blocks[slot] = self.choose(rng, fitting, fitting_cum)
+        return blocks, colors
+
+    def spec(self):
+        return {"name": self.name, "size_weights": {str(cells): weight for cells, weight in self.size_weights.items()},
+                "guarantee": self.guarantee}
+
+
+GENERATORS = {
+    "uniform": UniformGenerator,
+    "fair": FairGenerator,
+}
+# по умолчанию раздача прежняя, чтобы партии по старым сидам повторялись; fair включается
+# правилами или флагом --generator
+DEFAULT_GENERATOR = "uniform"
+
+
+# генератор из описания в правилах: имя, словарь с полями GENERATOR_FIELDS или None (по умолчанию)
+def make_generator(spec=None):
+    if spec is None:
+        spec = {}
+    elif isinstance(spec, str):
+        spec = {"name": spec}
+    unknown = set(spec) - set(GENERATOR_FIELDS)
+    if unknown:
+        raise ValueError(f"Неизвестные поля генератора: {', '.join(sorted(unknown))}")
+    name = spec.get("name", DEFAULT_GENERATOR)
+    if name not in GENERATORS:
+        raise ValueError(f"Неизвестный генератор: {name}")
+    if name == "uniform":
+        if set(spec) - {"name"}:
+            raise ValueError("У генератора uniform нет настроек")
+        return UniformGenerator()
+
+    guarantee = spec.get("guarantee", 1)
+    if not isinstance(guarantee, int) or guarantee < 0:
+        raise ValueError(f"guarantee - целое число от 0: {guarantee}")
+    size_weights = spec.get("size_weights", {})
+    try:
+        if any(int(cells) <= 0 or float(weight) < 0 for cells, weight in size_weights.items()):
+            raise ValueError
+    except (AttributeError, TypeError, ValueError):
+        raise ValueError(f"size_weights - словарь число клеток -> неотрицательный вес: {size_weights}") from None
+    return FairGenerator(size_weights, guarantee)
@@ -0,0 +1,131 @@
+import itertools
+
+# журнал партии: каждый ход - список событий с разницей состояния, а не копия поля.
+#   ("pick", индекс в лотке, форма, цвет)         - блок ушел из лотка в руку
+#   ("place", маска клеток, цвет, очки)           - place_block_on_grid
+#   ("clear", маска клеток, цвета, очки, линии)   - clear_completed_lines, цвета по возрастанию номера клетки
+#   ("deal", формы, цвета)                        - раздача в опустевший лоток
+# отмена и повтор хода проходят события хода назад или вперед: время зависит от числа клеток
+# в ходе, а не от длины партии. каждые SNAPSHOT_INTERVAL ходов сохраняется снимок состояния,
+# и seek доходит до любого хода от ближайшего снимка или от текущего хода, что ближе
+
+SNAPSHOT_INTERVAL = 32
+
+
+class GameHistory:
+    def __init__(self, snapshot_interval=SNAPSHOT_INTERVAL):
+        self.snapshot_interval = snapshot_interval
+        self.moves = []
+        # сколько ходов из moves сейчас применено; ходы после cursor можно повторить
+        self.cursor = 0
+        # снимок k - состояние после k * snapshot_interval ходов
+        self.snapshots = []
+        # пробные ходы (GameState.try_place), отменяются по одному с конца
+        self.trials = []
+        # индекс допустимых мест поля, отложенный на время пробных ходов
+        self.trial_index = None
+        # список, в который сейчас пишутся события, None - запись выключена
+        self.recording = None
+
+    def can_undo(self):
+        return self.cursor > 0
+
+    def can_redo(self):
+        return self.cursor < len(self.moves)
+
+    def record(self, event):
+        if self.recording is not None:
+            self.recording.append(event)
+
+    # новый ход отменяет возможность повтора
+    def drop_redo(self):
+        del self.moves[self.cursor:]
+        del self.snapshots[self.cursor // self.snapshot_interval + 1:]
+
+    def begin_move(self):
+        self.drop_redo()
+        events = []
+        self.moves.append(events)
+        self.cursor += 1
+        self.recording = events
+        return events
+
+    def begin_trial(self):
+        events = []
+        self.trials.append(events)
+        self.recording = events
+        return events
+
+    def end_recording(self):
+        self.recording = None
+
+    # снимок, если ход попал на границу интервала и снимка для нее еще нет
+    def maybe_snapshot(self, state):
+        if self.cursor % self.snapshot_interval == 0 and len(self.snapshots) == self.cursor // self.snapshot_interval:
+            self.snapshots.append(take_snapshot(state))
+
+    # ближайший снимок не позже хода move_number: (номер хода, снимок)
+    def snapshot_before(self, move_number):
+        index = min(move_number // self.snapshot_interval, len(self.snapshots) - 1)
+        return index * self.snapshot_interval, self.snapshots[index]
+
+
+def take_snapshot(state):
+    grid = state.grid
+    return (grid.occupancy, tuple(grid.colors), state.score, state.moves_made, state.lines_cleared_total,
+            tuple(state.available_blocks), tuple(state.available_colors))
+
+
+def restore_snapshot(state, snapshot):
+    occupancy, colors, state.score, state.moves_made, state.lines_cleared_total, blocks, block_colors = snapshot
+    grid = state.grid
+    grid.occupancy = occupancy
+    grid.colors = list(colors)
+    if grid.placement_index is not None:
+        grid.placement_index.rebuild(occupancy)
+    state.available_blocks = list(blocks)
+    state.available_colors = list(block_colors)
+
+
+def apply_events(state, events):
+    for event in events:
+        kind = event[0]
+        if kind == "pick":
+            state.available_blocks.pop(event[1])
+            state.available_colors.pop(event[1])
+        elif kind == "place":
+            _, mask, color, points = event
+            state.grid.fill_mask(mask, itertools.repeat(color))
+            state.score += points
+            state.moves_made += 1
+        elif kind == "clear":
+            _, mask, _, points, lines = event
+            state.grid.clear_mask(mask)
+            state.score += points
+            state.lines_cleared_total += lines
+        elif kind == "deal":
+            state.available_blocks = list(event[1])
+            state.available_colors = list(event[2])
+
+
+def revert_events(state, events):
+    for event in reversed(events):
+        kind = event[0]
+        if kind == "pick":
+            _, block_index, block_shape, color = event
+            state.available_blocks.insert(block_index, block_shape)
+            state.available_colors.insert(block_index, color)
+        elif kind == "place":
+            _, mask, _, points = event
+            state.grid.clear_mask(mask)
+            state.score -= points
+            state.moves_made -= 1
+        elif kind == "clear":
+            _, mask, colors, points, lines = event
+            state.grid.fill_mask(mask, colors)
+            state.score -= points
+            state.lines_cleared_total -= lines
+        elif kind == "deal":
+            # раздача бывает только в пустой лоток
+            state.available_blocks = []
+            state.available_colors = []
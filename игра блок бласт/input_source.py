@@ -0,0 +1,115 @@
+import random
+from collections import deque
+
+import pygame
+
+# источник ввода игрового цикла: poll() раз в кадр отдает положение мыши и события кадра.
+# PygameInput - настоящие мышь и клавиатура; ScriptedInput - кадры из сценария, которые можно
+# подавать быстрее реального времени, а SyntheticPlayer дописывает сценарий сам, глядя на игру
+
+INPUT_EVENTS = (pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.KEYDOWN, pygame.KEYUP)
+
+
+class PygameInput:
+    def poll(self):
+        return pygame.mouse.get_pos(), pygame.event.get()
+
+
+class ScriptedInput:
+    # feeder(source) вызывается, когда кадры сценария закончились, и может добавить новые
+    def __init__(self, feeder=None):
+        self.feeder = feeder
+        # (положение мыши, события) по кадрам
+        self.frames = deque()
+        self.pos = (0, 0)
+        # где окажется мышь после уже добавленных кадров
+        self.script_pos = (0, 0)
+        self.frames_polled = 0
+
+    def frame(self, pos=None, events=()):
+        if pos is not None:
+            self.script_pos = pos
+        self.frames.append((self.script_pos, list(events)))
+
+    def move(self, x, y):
+        self.frame((x, y), [pygame.event.Event(pygame.MOUSEMOTION, pos=(x, y), rel=(0, 0), buttons=(0, 0, 0))])
+
+    def click(self, x, y, button=1):
+        self.frame((x, y), [pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(x, y), button=button),
+                            pygame.event.Event(pygame.MOUSEBUTTONUP, pos=(x, y), button=button)])
+
+    # нажать в start, провести мышь за steps кадров и отпустить в end
+    def drag(self, start, end, steps, button=1):
+        self.frame(start, [pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=start, button=button)])
+        for step in range(1, steps + 1):
+            self.move(start[0] + (end[0] - start[0]) * step // steps, start[1] + (end[1] - start[1]) * step // steps)
+        self.frame(end, [pygame.event.Event(pygame.MOUSEBUTTONUP, pos=end, button=button)])
+
+    def key(self, key):
+        self.frame(events=[pygame.event.Event(pygame.KEYDOWN, key=key, mod=0, unicode=""),
+                           pygame.event.Event(pygame.KEYUP, key=key, mod=0)])
+
+    def quit(self):
+        self.frame(events=[pygame.event.Event(pygame.QUIT)])
+
+    # настоящая очередь pygame тоже разбирается, чтобы не переполнилась; из нее остаются
+    # только события окна (выход, перерисовка), мышь и клавиатура идут из сценария
+    def poll(self):
+        if not self.frames and self.feeder:
+            self.feeder(self)
+        system_events = [event for event in pygame.event.get() if event.type not in INPUT_EVENTS]
+        if not self.frames:
+            return self.pos, system_events
+        self.pos, events = self.frames.popleft()
+        self.frames_polled += 1
+        return self.pos, events + system_events
+
+
+# синтетический игрок для ScriptedInput: берет блоки, тащит и ставит их на поле, иногда
+# возвращает блок правой кнопкой, двигает слайдеры громкости, после конца игры жмет R
+class SyntheticPlayer:
+    def __init__(self, game, seed=0, drag_steps=4, cancel_share=0.1, slider_share=0.05):
+        self.game = game
+        self.rng = random.Random(seed)
+        self.drag_steps = drag_steps
+        self.cancel_share = cancel_share
+        self.slider_share = slider_share
+        self.counts = {"placements": 0, "cancels": 0, "slider_drags": 0, "restarts": 0}
+
+    def __call__(self, source):
+        game = self.game
+        rng = self.rng
+        if game.game_over:
+            source.key(pygame.K_r)
+            self.counts["restarts"] += 1
+            return
+        if game.current_block is not None:
+            source.click(*source.script_pos, button=3)
+            return
+        if rng.random() < self.slider_share:
+            rect = rng.choice(game.slider_rects())
+            y = rect.centery
+            source.drag((rect.x + rng.randrange(rect.width), y), (rect.x + rng.randrange(rect.width), y), self.drag_steps)
+            self.counts["slider_drags"] += 1
+            return
+        moves = game.legal_moves()
+        if not moves:
+            source.frame()
+            return
+        block_index, grid_r, grid_c = rng.choice(moves)
+        rect = game.tray_block_rects()[block_index][0]
+        # блок берется за точку внутри первой клетки; на столько же он смещен от мыши при переносе
+        grab_x, grab_y = rng.randrange(game.cell_size), rng.randrange(game.cell_size)
+        start = (rect.x + grab_x, rect.y + grab_y)
+        source.click(*start)
+        if rng.random() < self.cancel_share:
+            source.move(start[0] + game.cell_size, start[1] - game.cell_size)
+            source.click(start[0] + game.cell_size, start[1] - game.cell_size, button=3)
+            self.counts["cancels"] += 1
+            return
+        end = (game.grid_offset_x + grid_c * game.cell_size + grab_x, game.grid_offset_y + grid_r * game.cell_size + grab_y)
+        for step in range(1, self.drag_steps + 1):
+            source.move(start[0] + (end[0] - start[0]) * step // self.drag_steps,
+                        start[1] + (end[1] - start[1]) * step // self.drag_steps)
+        source.click(*end)
+        self.counts["placements"] += 1
@@ -0,0 +1,95 @@
+import pygame
+
+from game_state import TRAY_SIZE
+
+# раскладка кадра: все прямоугольники экрана считаются здесь из размера поверхности, размера поля
+# и самой большой формы. макет нарисован для окна DESIGN_WIDTH x DESIGN_HEIGHT; на окне другого
+# размера он масштабируется по меньшей стороне и встает по центру, фон занимает все окно.
+# при масштабе 1 раскладка совпадает с прежними постоянными координатами
+
+DESIGN_WIDTH, DESIGN_HEIGHT = 550, 700
+# клетка не больше CELL_SIZE (в единицах макета); на больших полях и с длинными формами она
+# уменьшается, чтобы поле и лоток поместились
+CELL_SIZE = 50
+GRID_OFFSET_Y = 120
+GRID_MARGIN_X = 20
+# зазор между полем и лотком, отступ лотка от нижнего края и расстояние между блоками лотка
+TRAY_GAP = 10
+TRAY_BOTTOM_MARGIN = 20
+TRAY_SPACING = 20
+# тень и боковые грани блока выступают за клетку на столько пикселей при клетке CELL_SIZE
+BLOCK_OVERHANG = 5
+SCORE_Y = 60
+# слайдеры громкости: левый край, верх первого, шаг между ними и размер полосы
+SLIDER_X, SLIDER_Y, SLIDER_STEP = 20, 30, 50
+SLIDER_WIDTH, SLIDER_HEIGHT = 180, 18
+SLIDER_KNOB_RADIUS = 8
+SLIDER_BORDER_RADIUS = 5
+SLIDER_LABEL_GAP = 15
+# слайдеры вместе с подписями и ручками - для пометки на перерисовку
+SLIDERS_RECT = (10, 10, 210, 100)
+# строки экрана конца игры по высоте
+GAME_OVER_LINES_Y = (DESIGN_HEIGHT // 3, DESIGN_HEIGHT // 2 - 20, DESIGN_HEIGHT // 2 + 40,
+                     DESIGN_HEIGHT * 2 // 3, DESIGN_HEIGHT * 2 // 3 + 40)
+# панель профилировщика не масштабируется и стоит в правом верхнем углу поверхности
+PROFILER_PANEL_SIZE = (230, 250)
+PROFILER_PANEL_MARGIN = 5
+
+
+class Layout:
+    def __init__(self, size, grid_size, max_shape_size=(1, 1)):
+        self.width, self.height = size
+        self.rect = pygame.Rect(0, 0, self.width, self.height)
+        self.scale = min(self.width / DESIGN_WIDTH, self.height / DESIGN_HEIGHT)
+        self.design_width = round(DESIGN_WIDTH * self.scale)
+        self.origin_x = (self.width - self.design_width) // 2
+        self.origin_y = (self.height - round(DESIGN_HEIGHT * self.scale)) // 2
+        self.center_x = self.origin_x + self.design_width // 2
+
+        # размер клетки считается в единицах макета, как раньше, и только потом масштабируется
+        max_h, max_w = max_shape_size
+        by_width = (DESIGN_WIDTH - 2 * GRID_MARGIN_X) // grid_size
+        by_height = (DESIGN_HEIGHT - GRID_OFFSET_Y - TRAY_GAP - TRAY_BOTTOM_MARGIN) // (grid_size + max_h)
+        by_tray = (DESIGN_WIDTH - 2 * GRID_MARGIN_X - (TRAY_SIZE - 1) * TRAY_SPACING) // (TRAY_SIZE * max_w)
+        self.cell_size = max(1, int(min(CELL_SIZE, by_width, by_height, by_tray) * self.scale))
+        self.block_overhang = max(2, round(BLOCK_OVERHANG * self.cell_size / CELL_SIZE))
+        self.grid_offset_x = self.origin_x + (self.design_width - grid_size * self.cell_size) // 2
+        self.grid_offset_y = self.origin_y + self.px(GRID_OFFSET_Y)
+        self.tray_y = self.grid_offset_y + grid_size * self.cell_size + self.px(TRAY_GAP)
+        self.tray_spacing = self.px(TRAY_SPACING)
+        # лоток с тенями блоков - полоса во всю ширину до низа
+        self.tray_rect = pygame.Rect(0, self.tray_y, self.width, self.height - self.tray_y)
+
+        self.score_center = self.point(DESIGN_WIDTH // 2, SCORE_Y)
+        self.music_slider = self.design_rect(SLIDER_X, SLIDER_Y, SLIDER_WIDTH, SLIDER_HEIGHT)
+        self.effects_slider = self.design_rect(SLIDER_X, SLIDER_Y + SLIDER_STEP, SLIDER_WIDTH, SLIDER_HEIGHT)
+        self.sliders_rect = self.design_rect(*SLIDERS_RECT)
+        self.slider_knob_radius = max(2, self.px(SLIDER_KNOB_RADIUS))
+        self.slider_border_radius = self.px(SLIDER_BORDER_RADIUS)
+        self.slider_label_gap = self.px(SLIDER_LABEL_GAP)
+        self.game_over_positions = [self.point(DESIGN_WIDTH // 2, y) for y in GAME_OVER_LINES_Y]
+        panel_w, panel_h = PROFILER_PANEL_SIZE
+        self.profiler_rect = pygame.Rect(self.width - panel_w - PROFILER_PANEL_MARGIN, PROFILER_PANEL_MARGIN, panel_w, panel_h)
+
+    def px(self, value):
+        return round(value * self.scale)
+
+    # точка и прямоугольник макета в пикселях поверхности
+    def point(self, x, y):
+        return self.origin_x + self.px(x), self.origin_y + self.px(y)
+
+    def design_rect(self, x, y, w, h):
+        return pygame.Rect(*self.point(x, y), self.px(w), self.px(h))
+
+    # прямоугольники блоков лотка по центру под полем: по ним и рисуется лоток, и ловятся клики
+    def tray_block_rects(self, block_shapes):
+        cell_size = self.cell_size
+        total_width = sum(len(block_shape[0]) * cell_size for block_shape in block_shapes)
+        total_width += self.tray_spacing * (len(block_shapes) - 1) if block_shapes else 0
+        x = self.origin_x + (self.design_width - total_width) // 2
+        rects = []
+        for block_shape in block_shapes:
+            rect = pygame.Rect(x, self.tray_y, len(block_shape[0]) * cell_size, len(block_shape) * cell_size)
+            rects.append(rect)
+            x += rect.width + self.tray_spacing
+        return rects
@@ -0,0 +1,154 @@
+import numpy as np
+import pygame
+
+# система частиц на массивах: все частицы лежат в пуле фиксированного размера,
+# живые занимают первые count ячеек, обновление идет сразу по всем массивам
+
+GRAVITY = 0.18
+ALPHA_DECAY = 7
+MIN_SIZE, MAX_SIZE = 6, 12
+# квадрат симметричен при повороте на 90 градусов, поэтому хватает углов от 0 до 90
+ANGLE_STEP = 5
+ANGLE_BINS = 90 // ANGLE_STEP
+
+
+# повернутые квадраты всех размеров и цветов с заранее посчитанным смещением до центра
+def bake_particle_sprites(colors, scale=1.0):
+    sprites = []
+    for color in colors:
+        by_size = []
+        for size in range(MIN_SIZE, MAX_SIZE + 1):
+            side = max(1, round(size * scale))
+            square = pygame.Surface((side, side), pygame.SRCALPHA)
+            square.fill((*color, 255))
+            by_angle = []
+            for angle_bin in range(ANGLE_BINS):
+                rotated = pygame.transform.rotate(square, angle_bin * ANGLE_STEP).convert_alpha()
+                by_angle.append((rotated, rotated.get_width() // 2, rotated.get_height() // 2))
+            by_size.append(by_angle)
+        sprites.append(by_size)
+    return sprites
+
+
+# scale - масштаб раскладки экрана: размеры, скорости и тяжесть частиц в пикселях умножаются на него
+class ParticlePool:
+    def __init__(self, colors, capacity=4096, seed=None, scale=1.0):
+        self.colors = list(colors)
+        self.scale = scale
+        self.capacity = capacity
+        self.count = 0
+        self.rng = np.random.default_rng(seed)
+        self.x = np.zeros(capacity, dtype=np.float32)
+        self.y = np.zeros(capacity, dtype=np.float32)
+        # положение на предыдущем шаге - для интерполяции между шагами симуляции
+        self.prev_x = np.zeros(capacity, dtype=np.float32)
+        self.prev_y = np.zeros(capacity, dtype=np.float32)
+        self.vx = np.zeros(capacity, dtype=np.float32)
+        self.vy = np.zeros(capacity, dtype=np.float32)
+        self.angle = np.zeros(capacity, dtype=np.float32)
+        self.angular_velocity = np.zeros(capacity, dtype=np.float32)
+        self.alpha = np.zeros(capacity, dtype=np.float32)
+        self.size = np.zeros(capacity, dtype=np.int16)
+        self.color = np.zeros(capacity, dtype=np.int16)
+        self._arrays = (self.x, self.y, self.prev_x, self.prev_y, self.vx, self.vy, self.angle, self.angular_velocity,
+                        self.alpha, self.size, self.color)
+        self.sprites = None
+
+    def __len__(self):
+        return self.count
+
+    # новый масштаб: спрайты запекаются заново при следующей отрисовке, живые частицы пропадают
+    def set_scale(self, scale):
+        if scale != self.scale:
+            self.scale = scale
+            self.sprites = None
+        self.clear()
+
+    def clear(self):
+        self.count = 0
+
+    # сколько повернутых спрайтов уже запечено
+    def sprite_count(self):
+        if self.sprites is None:
+            return 0
+        return sum(len(by_angle) for by_size in self.sprites for by_angle in by_size)
+
+    # выпускает n частиц из точки; если пул заполнен, лишние просто не появляются
+    def emit(self, x, y, n):
+        start = self.count
+        stop = min(self.capacity, start + n)
+        if stop <= start:
+            return
+        k = stop - start
+        rng = self.rng
+        self.x[start:stop] = x
+        self.y[start:stop] = y
+        self.prev_x[start:stop] = x
+        self.prev_y[start:stop] = y
+        self.vx[start:stop] = rng.uniform(-3, 3, k) * self.scale
+        self.vy[start:stop] = rng.uniform(-4.5, -1.5, k) * self.scale
+        self.angle[start:stop] = rng.uniform(0, 360, k)
+        self.angular_velocity[start:stop] = rng.uniform(-10, 10, k)
+        self.alpha[start:stop] = 255
+        self.size[start:stop] = rng.integers(MIN_SIZE, MAX_SIZE + 1, k)
+        self.color[start:stop] = rng.integers(0, len(self.colors), k)
+        self.count = stop
+
+    # один шаг физики (шаг симуляции фиксированной длины) для всех живых частиц,
+    # погасшие сдвигаются в хвост пула
+    def update(self):
+        n = self.count
+        if not n:
+            return
+        self.prev_x[:n] = self.x[:n]
+        self.prev_y[:n] = self.y[:n]
+        self.x[:n] += self.vx[:n]
+        self.y[:n] += self.vy[:n]
+        self.angle[:n] += self.angular_velocity[:n]
+        np.mod(self.angle[:n], 360, out=self.angle[:n])
+        self.vy[:n] += GRAVITY * self.scale
+        self.alpha[:n] -= ALPHA_DECAY
+
+        alive = self.alpha[:n] > 0
+        alive_count = int(np.count_nonzero(alive))
+        if alive_count != n:
+            for array in self._arrays:
+                array[:alive_count] = array[:n][alive]
+        self.count = alive_count
+
+    # общая рамка всех частиц (на прошлом и текущем шаге) с запасом на поворот
+    def bounds(self):
+        n = self.count
+        if not n:
+            return None
+        half = int(MAX_SIZE * self.scale * 0.71) + 2
+        left = int(min(self.x[:n].min(), self.prev_x[:n].min())) - half
+        top = int(min(self.y[:n].min(), self.prev_y[:n].min())) - half
+        right = int(max(self.x[:n].max(), self.prev_x[:n].max())) + half
+        bottom = int(max(self.y[:n].max(), self.prev_y[:n].max())) + half
+        return pygame.Rect(left, top, right - left, bottom - top)
+
+    # t - доля шага после последнего update: положение и прозрачность берутся между шагами
+    def draw(self, screen, t=1.0):
+        n = self.count
+        if not n:
+            return
+        if self.sprites is None:
+            self.sprites = bake_particle_sprites(self.colors, self.scale)
+        angle_bins = ((self.angle[:n] % 90) // ANGLE_STEP).astype(np.int16).tolist()
+        sizes = (self.size[:n] - MIN_SIZE).tolist()
+        colors = self.color[:n].tolist()
+        if t >= 1.0:
+            xs = self.x[:n].astype(np.int32).tolist()
+            ys = self.y[:n].astype(np.int32).tolist()
+            alphas = self.alpha[:n].astype(np.int16).tolist()
+        else:
+            xs = (self.prev_x[:n] + (self.x[:n] - self.prev_x[:n]) * t).astype(np.int32).tolist()
+            ys = (self.prev_y[:n] + (self.y[:n] - self.prev_y[:n]) * t).astype(np.int32).tolist()
+            alphas = np.minimum(self.alpha[:n] + ALPHA_DECAY * (1 - t), 255).astype(np.int16).tolist()
+        sprites = self.sprites
+        blit = screen.blit
+        for i in range(n):
+            sprite, half_w, half_h = sprites[colors[i]][sizes[i]][angle_bins[i]]
+            sprite.set_alpha(alphas[i])
+            blit(sprite, (xs[i] - half_w, ys[i] - half_h))
@@ -0,0 +1,121 @@
+import csv
+import json
+import time
+from collections import deque
+
+# профилировщик кадра: время по участкам кадра, перцентили, оверлей на экране и запись трассы в файл.
+# участки меряются "кругами": lap(имя) записывает время с предыдущей отметки
+
+DEFAULT_HISTORY = 600
+PERCENTILES = (50, 95, 99)
+OVERLAY_REFRESH_FRAMES = 15
+# счетчики, которые попадают в CSV-трассу отдельными колонками
+TRACE_COUNTERS = ("particles", "surfaces", "dirty_rects", "sim_steps")
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+# трасса по кадрам: .csv - таблица, любое другое расширение - JSON по строке на кадр
+class TraceWriter:
+    def __init__(self, path, section_names):
+        self.path = path
+        self.section_names = list(section_names)
+        self.file = open(path, "w", newline="")
+        self.csv_writer = None
+        if path.endswith(".csv"):
+            self.csv_writer = csv.writer(self.file)
+            self.csv_writer.writerow(["frame", "interval_ms", "work_ms"] + self.section_names + list(TRACE_COUNTERS))
+
+    def write(self, frame_number, interval_ms, work_ms, sections, counters):
+        if self.csv_writer:
+            self.csv_writer.writerow([frame_number, f"{interval_ms:.3f}", f"{work_ms:.3f}"]
+                                     + [f"{sections.get(name, 0.0):.3f}" for name in self.section_names]
+                                     + [counters.get(name, 0) for name in TRACE_COUNTERS])
+        else:
+            record = {"frame": frame_number, "interval_ms": round(interval_ms, 3), "work_ms": round(work_ms, 3),
+                      "sections": {name: round(value, 3) for name, value in sections.items()}}
+            record.update(counters)
+            self.file.write(json.dumps(record) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+class FrameProfiler:
+    def __init__(self, section_names, history=DEFAULT_HISTORY, trace_path=None, frame_budget_ms=1000 / 60):
+        self.section_names = list(section_names)
+        self.frame_budget_ms = frame_budget_ms
+        self.work_times = deque(maxlen=history)
+        self.section_times = {name: deque(maxlen=history) for name in self.section_names}
+        self.frame_number = 0
+        self.slow_frames = 0
+        self.counters = {}
+        self.overlay_visible = False
+        self.overlay_lines = []
+        self.trace = TraceWriter(trace_path, self.section_names) if trace_path else None
+        self._frame_start = None
+        self._last_frame_start = None
+        self._lap_start = None
+        self._current = {}
+
+    def begin_frame(self):
+        now = time.perf_counter()
+        self._last_frame_start = self._frame_start
+        self._frame_start = now
+        self._lap_start = now
+        self._current = {}
+
+    # время с прошлой отметки записывается в участок name
+    def lap(self, name):
+        now = time.perf_counter()
+        self._current[name] = self._current.get(name, 0.0) + (now - self._lap_start) * 1000
+        self._lap_start = now
+
+    def end_frame(self, **counters):
+        now = time.perf_counter()
+        work_ms = (now - self._frame_start) * 1000
+        interval_ms = (self._frame_start - self._last_frame_start) * 1000 if self._last_frame_start else 0.0
+        self.frame_number += 1
+        self.work_times.append(work_ms)
+        if work_ms > self.frame_budget_ms:
+            self.slow_frames += 1
+        for name in self.section_names:
+            self.section_times[name].append(self._current.get(name, 0.0))
+        self.counters = counters
+        if self.trace:
+            self.trace.write(self.frame_number, interval_ms, work_ms, self._current, counters)
+
+    def summary(self):
+        work = sorted(self.work_times)
+        result = {f"p{p}": percentile(work, p) for p in PERCENTILES}
+        result["frames"] = self.frame_number
+        result["slow_frames"] = self.slow_frames
+        result["sections"] = {name: percentile(sorted(values), 95) for name, values in self.section_times.items()}
+        return result
+
+    def toggle_overlay(self):
+        self.overlay_visible = not self.overlay_visible
+        self.overlay_lines = []
+
+    # строки оверлея пересчитываются раз в несколько кадров, чтобы сам оверлей не мешал замерам
+    def overlay_text(self):
+        if not self.overlay_lines or self.frame_number % OVERLAY_REFRESH_FRAMES == 0:
+            summary = self.summary()
+            lines = ["frame ms " + " ".join(f"p{p}={summary[f'p{p}']:.2f}" for p in PERCENTILES),
+                     f"slow {summary['slow_frames']}/{summary['frames']}"]
+            for name, value in summary["sections"].items():
+                lines.append(f"{name} p95={value:.2f}")
+            for name, value in self.counters.items():
+                lines.append(f"{name}: {value}")
+            self.overlay_lines = lines
+        return self.overlay_lines
+
+    def close(self):
+        if self.trace:
+            self.trace.close()
+            self.trace = None
@@ -0,0 +1,278 @@
+import argparse
+import json
+import os
+import random
+import struct
+import sys
+import time
+from collections import deque
+
+from game_state import GameState
+from rules import load_rules
+
+# запись партий и их воспроизведение. файл - заголовок и записи фиксированной ширины по 4 байта:
+# раздача (по записи на блок лотка), взять блок, поставить блок, вернуть блок правой кнопкой,
+# отменить и повторить ход, перейти к ходу с номером (три байта аргументов - одно 24-битное число).
+# записанные раздачи подставляются при воспроизведении вместо генератора, а сид позволяет
+# проверить, что генератор с этим сидом выдал бы то же самое
+
+MAGIC = b"BBRP"
+VERSION = 1
+# сигнатура, версия, размер поля, флаги, сид, итоговый счет
+HEADER = struct.Struct("<4sBBHQI")
+# код действия и три однобайтовых аргумента
+RECORD = struct.Struct("<BBBB")
+
+OP_DEAL = 1
+OP_PICK = 2
+OP_PLACE = 3
+OP_CANCEL = 4
+OP_UNDO = 5
+OP_REDO = 6
+OP_SEEK = 7
+OP_NAMES = {OP_DEAL: "deal", OP_PICK: "pick", OP_PLACE: "place", OP_CANCEL: "cancel", OP_UNDO: "undo",
+            OP_REDO: "redo", OP_SEEK: "seek"}
+
+# партия доиграна до конца (иначе запись оборвана выходом из игры)
+FLAG_FINISHED = 1
+
+REPLAY_DIR_ENV = "BLOCKBLAST_REPLAY_DIR"
+REPLAY_SUFFIX = ".bbr"
+
+
+class ReplayError(Exception):
+    pass
+
+
+# пишет действия партии в память; на диск файл попадает одним вызовом save в конце партии
+class ReplayRecorder:
+    def __init__(self, seed, grid_size, block_shapes, colors):
+        self.seed = seed
+        self.grid_size = grid_size
+        self.shape_index = {id(block_shape): i for i, block_shape in enumerate(block_shapes)}
+        self.color_index = {tuple(color): i for i, color in enumerate(colors)}
+        self.data = bytearray()
+
+    def deal(self, blocks, colors):
+        for slot, (block_shape, color) in enumerate(zip(blocks, colors)):
+            self.data += RECORD.pack(OP_DEAL, slot, self.shape_index[id(block_shape)], self.color_index[tuple(color)])
+
+    def pick(self, block_index):
+        self.data += RECORD.pack(OP_PICK, block_index, 0, 0)
+
+    def place(self, grid_r, grid_c):
+        self.data += RECORD.pack(OP_PLACE, grid_r, grid_c, 0)
+
+    def cancel(self):
+        self.data += RECORD.pack(OP_CANCEL, 0, 0, 0)
+
+    def undo(self):
+        self.data += RECORD.pack(OP_UNDO, 0, 0, 0)
+
+    def redo(self):
+        self.data += RECORD.pack(OP_REDO, 0, 0, 0)
+
+    def seek(self, move_number):
+        self.data += RECORD.pack(OP_SEEK, move_number & 0xFF, move_number >> 8 & 0xFF, move_number >> 16 & 0xFF)
+
+    def to_bytes(self, final_score, finished):
+        header = HEADER.pack(MAGIC, VERSION, self.grid_size, FLAG_FINISHED if finished else 0, self.seed, final_score)
+        return header + bytes(self.data)
+
+    # запись через временный файл, чтобы не оставить недописанный реплей
+    def save(self, path, final_score, finished):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.to_bytes(final_score, finished))
+        os.replace(tmp_path, path)
+
+
+class Replay:
+    def __init__(self, seed, grid_size, final_score, finished, events):
+        self.seed = seed
+        self.grid_size = grid_size
+        self.final_score = final_score
+        self.finished = finished
+        # список (код, a, b, c)
+        self.events = events
+
+    # раздачи по порядку: списки (индекс формы, индекс цвета) на каждый блок лотка
+    def deals(self):
+        deals = []
+        for op, slot, shape_idx, color_idx in self.events:
+            if op != OP_DEAL:
+                continue
+            if slot == 0:
+                deals.append([])
+            deals[-1].append((shape_idx, color_idx))
+        return deals
+
+    # действия игрока без раздач
+    def actions(self):
+        return [event for event in self.events if event[0] != OP_DEAL]
+
+
+def parse_replay(data):
+    if len(data) < HEADER.size or (len(data) - HEADER.size) % RECORD.size:
+        raise ReplayError("Неверная длина файла реплея")
+    magic, version, grid_size, flags, seed, final_score = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ReplayError("Это не файл реплея")
+    if version != VERSION:
+        raise ReplayError(f"Неизвестная версия реплея: {version}")
+    events = list(RECORD.iter_unpack(data[HEADER.size:]))
+    for op, _, _, _ in events:
+        if op not in OP_NAMES:
+            raise ReplayError(f"Неизвестное действие в реплее: {op}")
+    return Replay(seed, grid_size, final_score, bool(flags & FLAG_FINISHED), events)
+
+
+def load_replay(path):
+    with open(path, "rb") as f:
+        return parse_replay(f.read())
+
+
+def replay_file_name(seed):
+    return time.strftime("%Y%m%d-%H%M%S") + f"_{seed}{REPLAY_SUFFIX}"
+
+
+# примесь к GameState: раздачи берутся из реплея. генератор с записанным сидом тоже крутится,
+# и каждое расхождение с записанной раздачей считается в deal_mismatches
+class ReplayDeals:
+    # вызывается до reset_game_state, потому что тот сразу раздает первый лоток
+    def start_replay(self, replay):
+        self.replay = replay
+        self.pending_deals = deque(replay.deals())
+        self.deal_mismatches = 0
+        self.rng = random.Random(replay.seed)
+
+    # в журнал ходов попадает записанная раздача, та, что на экране
+    def deal_tray(self):
+        expected, expected_colors = super().deal_tray()
+        if not self.pending_deals:
+            raise ReplayError("В реплее закончились раздачи")
+        deal = self.pending_deals.popleft()
+        blocks = [self.block_shapes[shape_idx] for shape_idx, _ in deal]
+        colors = [self.colors[color_idx] for _, color_idx in deal]
+        if blocks != expected or colors != expected_colors:
+            self.deal_mismatches += 1
+        return blocks, colors
+
+    # одно действие игрока; некорректное действие - ReplayError
+    def apply_replay_event(self, event):
+        op, a, b, c = event
+        if op == OP_PICK:
+            if self.current_block is not None or a >= len(self.available_blocks):
+                raise ReplayError(f"Нельзя взять блок {a}")
+            self.pick_block(a)
+        elif op == OP_PLACE:
+            if self.current_block is None or not self.can_place_block_at(self.current_block, a, b):
+                raise ReplayError(f"Нельзя поставить блок в ({a}, {b})")
+            return self.place_held_block(a, b)
+        elif op == OP_CANCEL:
+            if self.current_block is None:
+                raise ReplayError("Нечего возвращать в лоток")
+            self.return_held_block()
+        elif op == OP_UNDO:
+            if not self.undo():
+                raise ReplayError("Нечего отменять")
+        elif op == OP_REDO:
+            if not self.redo():
+                raise ReplayError("Нечего повторять")
+        elif op == OP_SEEK:
+            if not self.seek(a | b << 8 | c << 16):
+                raise ReplayError(f"Нельзя перейти к ходу {a | b << 8 | c << 16}")
+        return None
+
+
+class ReplayState(ReplayDeals, GameState):
+    def __init__(self, replay, rules=None):
+        self.start_replay(replay)
+        GameState.__init__(self, self.rng, replay.grid_size, rules)
+
+
+# прогон реплея без окна; результат - словарь, как у selfplay.play_game
+def verify_replay(replay, rules=None):
+    start = time.perf_counter()
+    error = None
+    try:
+        state = ReplayState(replay, rules)
+        actions = replay.actions()
+        for event in actions:
+            state.apply_replay_event(event)
+    except (ReplayError, IndexError, KeyError) as e:
+        error = str(e)
+        state = None
+    elapsed = time.perf_counter() - start
+    if state is None:
+        return {"seed": replay.seed, "recorded_score": replay.final_score, "ok": False, "error": error}
+    moves = state.moves_made
+    return {
+        "seed": replay.seed,
+        "score": state.score,
+        "recorded_score": replay.final_score,
+        "moves": moves,
+        "actions": len(actions),
+        "finished": replay.finished,
+        "game_over": state.game_over,
+        "deal_mismatches": state.deal_mismatches,
+        "moves_per_second": round(moves / elapsed) if elapsed else 0,
+        # счет сходится, а доигранная партия действительно закончилась
+        "ok": state.score == replay.final_score and state.game_over == replay.finished,
+    }
+
+
+# воспроизведение с заданной скоростью: применяет к state (ReplayDeals) действия,
+# время которых уже наступило. при скорости 1 одно действие занимает step_ms
+class ReplayPlayer:
+    def __init__(self, state, speed=1.0, step_ms=250):
+        self.state = state
+        self.actions = state.replay.actions()
+        self.speed = speed
+        self.step_ms = step_ms
+        self.rewind()
+
+    def rewind(self):
+        self.position = 0
+        self.elapsed_ms = 0.0
+
+    @property
+    def done(self):
+        return self.position >= len(self.actions)
+
+    # продвигает воспроизведение на dt_ms реального времени и возвращает примененные действия
+    def advance(self, dt_ms):
+        self.elapsed_ms += dt_ms * self.speed
+        applied = []
+        while not self.done and self.elapsed_ms >= self.step_ms:
+            self.elapsed_ms -= self.step_ms
+            event = self.actions[self.position]
+            self.position += 1
+            applied.append((event, self.state.apply_replay_event(event)))
+        if self.done:
+            self.elapsed_ms = 0.0
+        return applied
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Проверка реплеев Block Blast без окна")
+    parser.add_argument("paths", nargs="+", help="файлы реплеев")
+    parser.add_argument("--rules", help="файл правил, с которыми записывались реплеи")
+    args = parser.parse_args(argv)
+    rules = load_rules(args.rules).as_dict() if args.rules else None
+
+    failed = 0
+    for path in args.paths:
+        try:
+            result = verify_replay(load_replay(path), rules)
+        except (OSError, ReplayError) as e:
+            result = {"ok": False, "error": str(e)}
+        result["path"] = path
+        failed += not result["ok"]
+        print(json.dumps(result, ensure_ascii=False))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+import json
+
+from bitboard import shape_key
+from game_state import BLOCK_SHAPES, COLORS, GRID_SIZE, LINE_CLEAR_POINTS
+from generators import make_generator
+
+# варианты игры из файла правил (JSON): размер поля, наборы форм, свои формы, повороты,
+# цвета, очки за линию и генератор раздач (generators.py). пример:
+#   {"grid_size": 12, "packs": ["classic", "pentomino"], "rotate": true, "mirror": false,
+#    "generator": {"name": "fair", "size_weights": {"5": 0.5}}}
+
+MIN_GRID_SIZE, MAX_GRID_SIZE = 4, 32
+RULE_FIELDS = ("name", "grid_size", "packs", "shapes", "rotate", "mirror", "colors", "line_clear_points",
+               "generator")
+
+# двенадцать свободных пентамино
+PENTOMINOES = [
+    [[0, 1, 1], [1, 1, 0], [0, 1, 0]],
+    [[1, 1, 1, 1, 1]],
+    [[1, 0], [1, 0], [1, 0], [1, 1]],
+    [[0, 1], [0, 1], [1, 1], [1, 0]],
+    [[1, 1], [1, 1], [1, 0]],
+    [[1, 1, 1], [0, 1, 0], [0, 1, 0]],
+    [[1, 0, 1], [1, 1, 1]],
+    [[1, 0, 0], [1, 0, 0], [1, 1, 1]],
+    [[1, 0, 0], [1, 1, 0], [0, 1, 1]],
+    [[0, 1, 0], [1, 1, 1], [0, 1, 0]],
+    [[0, 1], [1, 1], [0, 1], [0, 1]],
+    [[1, 1, 0], [0, 1, 0], [0, 1, 1]],
+]
+
+TETROMINOES = [
+    [[1, 1, 1, 1]],
+    [[1, 1], [1, 1]],
+    [[1, 1, 1], [0, 1, 0]],
+    [[0, 1, 1], [1, 1, 0]],
+    [[1, 0], [1, 0], [1, 1]],
+]
+
+SHAPE_PACKS = {
+    "classic": BLOCK_SHAPES,
+    "tetromino": TETROMINOES,
+    "pentomino": PENTOMINOES,
+}
+
+
+def rotate_shape(block_shape):
+    return [list(row) for row in zip(*block_shape[::-1])]
+
+
+def mirror_shape(block_shape):
+    return [list(row[::-1]) for row in block_shape]
+
+
+# все различные повороты (и отражения) формы, исходная - первой
+def shape_variants(block_shape, rotate=True, mirror=False):
+    variants = []
+    bases = [block_shape, mirror_shape(block_shape)] if mirror else [block_shape]
+    for base in bases:
+        current = base
+        for _ in range(4 if rotate else 1):
+            variants.append(current)
+            current = rotate_shape(current)
+    return unique_shapes(variants)
+
+
+# убирает повторы, сохраняя порядок
+def unique_shapes(block_shapes):
+    seen = set()
+    result = []
+    for block_shape in block_shapes:
+        key = shape_key(block_shape)
+        if key not in seen:
+            seen.add(key)
+            result.append(block_shape)
+    return result
+
+
+def validate_shape(block_shape, grid_size):
+    if not isinstance(block_shape, list) or not block_shape or not all(isinstance(row, list) and row for row in block_shape):
+        raise ValueError(f"Форма должна быть непустым списком строк: {block_shape}")
+    if len({len(row) for row in block_shape}) != 1:
+        raise ValueError(f"Строки формы разной длины: {block_shape}")
+    if any(cell not in (0, 1) for row in block_shape for cell in row):
+        raise ValueError(f"Клетки формы - только 0 и 1: {block_shape}")
+    if not any(cell for row in block_shape for cell in row):
+        raise ValueError(f"В форме нет ни одной клетки: {block_shape}")
+    if len(block_shape) > grid_size or len(block_shape[0]) > grid_size:
+        raise ValueError(f"Форма не помещается на поле {grid_size}x{grid_size}: {block_shape}")
+
+
+# форма без пустых крайних строк и столбцов: иначе у ее мест на поле будут отрицательные координаты
+def trim_shape(block_shape):
+    rows = [r for r, row in enumerate(block_shape) if any(row)]
+    cols = [c for c in range(len(block_shape[0])) if any(row[c] for row in block_shape)]
+    return [row[cols[0]:cols[-1] + 1] for row in block_shape[rows[0]:rows[-1] + 1]]
+
+
+def is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class GameRules:
+    def __init__(self, name="classic", grid_size=GRID_SIZE, block_shapes=BLOCK_SHAPES, colors=COLORS,
+                 line_clear_points=LINE_CLEAR_POINTS, generator=None):
+        self.name = name
+        self.grid_size = grid_size
+        self.block_shapes = block_shapes
+        self.colors = colors
+        self.line_clear_points = line_clear_points
+        # описание генератора раздач, None - генератор по умолчанию
+        self.generator = generator
+
+    # словарь для GameState(rules=...) и selfplay: сериализуется и передается между процессами
+    def as_dict(self):
+        rules = {
+            "grid_size": self.grid_size,
+            "block_shapes": self.block_shapes,
+            "colors": self.colors,
+            "line_clear_points": self.line_clear_points,
+        }
+        if self.generator is not None:
+            rules["generator"] = self.generator
+        return rules
+
+    def max_shape_size(self):
+        return (max(len(block_shape) for block_shape in self.block_shapes),
+                max(len(block_shape[0]) for block_shape in self.block_shapes))
+
+
+def rules_from_dict(data):
+    if not isinstance(data, dict):
+        raise ValueError(f"Неверные правила: нужен объект JSON, а не {type(data).__name__}")
+    unknown = set(data) - set(RULE_FIELDS)
+    if unknown:
+        raise ValueError(f"Неизвестные поля правил: {', '.join(sorted(unknown))}")
+    grid_size = data.get("grid_size", GRID_SIZE)
+    if not isinstance(grid_size, int) or not MIN_GRID_SIZE <= grid_size <= MAX_GRID_SIZE:
+        raise ValueError(f"Размер поля должен быть от {MIN_GRID_SIZE} до {MAX_GRID_SIZE}: {grid_size}")
+
+    for field in ("rotate", "mirror"):
+        if not isinstance(data.get(field, False), bool):
+            raise ValueError(f"Неверные правила: {field} - true или false")
+    name = data.get("name", "custom")
+    if not isinstance(name, str):
+        raise ValueError("Неверные правила: name - строка")
+
+    packs = data.get("packs", [] if data.get("shapes") else ["classic"])
+    shapes = data.get("shapes", [])
+    if not isinstance(packs, list) or not isinstance(shapes, list):
+        raise ValueError("Наборы форм и формы задаются списками")
+    base_shapes = []
+    for pack in packs:
+        if not isinstance(pack, str) or pack not in SHAPE_PACKS:
+            raise ValueError(f"Неизвестный набор форм: {pack}")
+        base_shapes.extend(SHAPE_PACKS[pack])
+    base_shapes.extend(shapes)
+    if not base_shapes:
+        raise ValueError("В правилах нет ни одной формы")
+
+    block_shapes = []
+    for block_shape in base_shapes:
+        validate_shape(block_shape, grid_size)
+        block_shape = trim_shape(block_shape)
+        block_shapes.extend(shape_variants(block_shape, data.get("rotate", False), data.get("mirror", False)))
+    block_shapes = unique_shapes(block_shapes)
+
+    colors = data.get("colors", COLORS)
+    if (not isinstance(colors, list) or not colors
+            or any(not isinstance(color, (list, tuple)) or len(color) != 3
+                   or not all(is_int(part) and 0 <= part <= 255 for part in color) for color in colors)):
+        raise ValueError("Цвета задаются списком [r, g, b] из целых чисел от 0 до 255")
+    colors = [tuple(color) for color in colors]
+    line_clear_points = data.get("line_clear_points", LINE_CLEAR_POINTS)
+    if not is_int(line_clear_points) or line_clear_points < 0:
+        raise ValueError(f"Очки за линию - целое неотрицательное число: {line_clear_points}")
+    generator = data.get("generator")
+    if generator is not None:
+        # ошибки в описании всплывают при загрузке правил, а не при первой раздаче
+        generator = make_generator(generator).spec()
+    return GameRules(name, grid_size, block_shapes, colors, line_clear_points, generator)
+
+
+def load_rules(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return rules_from_dict(json.load(f))
@@ -0,0 +1,204 @@
+import argparse
+import getpass
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+# хранилище результатов на SQLite: каждая партия - отдельная строка, ничего не перезаписывается.
+# транзакции и блокировки SQLite дают атомарную запись и безопасную работу нескольких копий игры
+# с одним файлом, а индексы по счету отвечают на запросы таблицы лидеров без полного просмотра
+
+SCORES_DB_ENV = "BLOCKBLAST_SCORES_DB"
+PLAYER_ENV = "BLOCKBLAST_PLAYER"
+# сколько ждать, пока другая копия игры держит блокировку записи
+BUSY_TIMEOUT_S = 10.0
+DEFAULT_TOP = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY,
+    player TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    moves INTEGER NOT NULL DEFAULT 0,
+    lines INTEGER NOT NULL DEFAULT 0,
+    seed INTEGER,
+    finished_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scores_by_score ON scores (score DESC, finished_at);
+CREATE INDEX IF NOT EXISTS scores_by_player ON scores (player, finished_at DESC);
+CREATE INDEX IF NOT EXISTS scores_by_player_score ON scores (player, score DESC);
+"""
+COLUMNS = ("player", "score", "moves", "lines", "seed", "finished_at")
+
+
+def default_scores_path():
+    path = os.environ.get(SCORES_DB_ENV)
+    if path:
+        return path
+    xdg = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(xdg, "block_blast", "scores.sqlite3")
+
+
+def default_player():
+    player = os.environ.get(PLAYER_ENV)
+    if player:
+        return player
+    try:
+        return getpass.getuser()
+    except (OSError, KeyError):
+        return "player"
+
+
+def connect(path):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT_S, isolation_level=None)
+    # журнал WAL: читатели не ждут писателя, запись после сбоя либо целиком есть, либо ее нет
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+# результат одной партии в виде словаря с полями COLUMNS
+def score_record(player, score, moves=0, lines=0, seed=None, finished_at=None):
+    return {"player": player, "score": score, "moves": moves, "lines": lines, "seed": seed,
+            "finished_at": time.time() if finished_at is None else finished_at}
+
+
+# запросы и синхронная запись; соединение принадлежит потоку, который создал хранилище
+class ScoreStore:
+    def __init__(self, path=None):
+        self.path = path or default_scores_path()
+        self.connection = connect(self.path)
+
+    def add_many(self, records):
+        rows = [tuple(record[name] for name in COLUMNS) for record in records]
+        if not rows:
+            return
+        connection = self.connection
+        # IMMEDIATE сразу берет блокировку записи, пачка попадает в файл одной транзакцией
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(f"INSERT INTO scores ({', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)", rows)
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def add(self, record):
+        self.add_many([record])
+
+    def best_score(self, player=None):
+        if player is None:
+            row = self.connection.execute("SELECT MAX(score) FROM scores").fetchone()
+        else:
+            row = self.connection.execute("SELECT MAX(score) FROM scores WHERE player = ?", (player,)).fetchone()
+        return row[0] or 0
+
+    def top(self, n=DEFAULT_TOP, player=None):
+        if player is None:
+            cursor = self.connection.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM scores ORDER BY score DESC, finished_at LIMIT ?", (n,))
+        else:
+            cursor = self.connection.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM scores WHERE player = ? ORDER BY score DESC LIMIT ?", (player, n))
+        return [dict(zip(COLUMNS, row)) for row in cursor]
+
+    # последние партии игрока, новые первыми
+    def history(self, player, limit=DEFAULT_TOP):
+        cursor = self.connection.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM scores WHERE player = ? ORDER BY finished_at DESC LIMIT ?",
+            (player, limit))
+        return [dict(zip(COLUMNS, row)) for row in cursor]
+
+    def count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    # перенос рекорда из старого текстового файла, если хранилище еще пустое
+    def import_legacy_high_score(self, path, player):
+        try:
+            with open(path, "r") as f:
+                legacy_score = int(f.read())
+        except (OSError, ValueError):
+            return False
+        if self.count() or legacy_score <= 0:
+            return False
+        self.add(score_record(player, legacy_score, finished_at=os.path.getmtime(path)))
+        return True
+
+    def close(self):
+        self.connection.close()
+
+
+# запись в отдельном потоке: submit только кладет результат в очередь, поток забирает все,
+# что накопилось, и пишет одной транзакцией. кадр и экран конца игры никогда не ждут диска
+class ScoreWriter:
+    def __init__(self, path=None):
+        self.path = path or default_scores_path()
+        self.queue = queue.Queue()
+        self.errors = []
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, record):
+        self.queue.put(record)
+
+    def _run(self):
+        store = None
+        while True:
+            batch = [self.queue.get()]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            records = [record for record in batch if record is not None]
+            try:
+                if store is None:
+                    store = ScoreStore(self.path)
+                store.add_many(records)
+            except (sqlite3.Error, OSError) as e:
+                self.errors.append(e)
+                print(f"Не удалось сохранить результат: {e}")
+            for _ in batch:
+                self.queue.task_done()
+            if stop:
+                break
+        if store is not None:
+            store.close()
+
+    # ожидание, пока все отправленные результаты не окажутся в файле
+    def flush(self):
+        self.queue.join()
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Таблица результатов Block Blast")
+    parser.add_argument("--db", help="файл хранилища (по умолчанию BLOCKBLAST_SCORES_DB или ~/.local/share)")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help="сколько лучших результатов показать")
+    parser.add_argument("--player", help="только этот игрок")
+    parser.add_argument("--history", action="store_true", help="последние партии игрока вместо лучших")
+    args = parser.parse_args(argv)
+
+    store = ScoreStore(args.db)
+    if args.history:
+        rows = store.history(args.player or default_player(), args.top)
+    else:
+        rows = store.top(args.top, args.player)
+    store.close()
+    for row in rows:
+        print(json.dumps(row, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
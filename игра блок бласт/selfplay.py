@@ -0,0 +1,173 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+
+from advisor import advisor_policy
+from game_state import GameState
+from generators import GENERATORS, make_generator
+from rules import load_rules
+
+# пакетная самоигра: много партий с заданными сидами, разложенных по процессам.
+# одна и та же пара (сид, политика) всегда дает одну и ту же партию
+
+DEFAULT_MAX_MOVES = 10000
+
+
+# политики выбирают ход из state.legal_moves(); у каждой партии свой генератор случайных чисел
+def random_policy(state, moves, rng):
+    return rng.choice(moves)
+
+
+def first_fit_policy(state, moves, rng):
+    return moves[0]
+
+
+# жадная политика: больше очков сразу, при равенстве - меньше занятых клеток после хода.
+# ходы пробуются на самом состоянии и откатываются по журналу, поле не копируется
+def greedy_policy(state, moves, rng):
+    best_move = None
+    best_key = None
+    for idx, grid_r, grid_c in moves:
+        points, _ = state.try_place(state.available_blocks[idx], grid_r, grid_c)
+        key = (points, -state.grid.occupied_count())
+        state.undo_trial()
+        if best_key is None or key > best_key:
+            best_key = key
+            best_move = (idx, grid_r, grid_c)
+    return best_move
+
+
+POLICIES = {
+    "random": random_policy,
+    "first": first_fit_policy,
+    "greedy": greedy_policy,
+    "advisor": advisor_policy,
+}
+
+
+# одна партия от начала до конца, результат - обычный словарь, чтобы его было легко сериализовать
+def play_game(seed, policy_name, rules=None, max_moves=DEFAULT_MAX_MOVES):
+    policy = POLICIES[policy_name]
+    state = GameState(random.Random(seed), rules=rules)
+    policy_rng = random.Random(f"{seed}:policy")
+
+    end_reason = "no_moves"
+    while not state.game_over:
+        if state.moves_made >= max_moves:
+            end_reason = "move_limit"
+            break
+        state.play_move(*policy(state, state.legal_moves(), policy_rng))
+
+    return {
+        "seed": seed,
+        "score": state.score,
+        "moves": state.moves_made,
+        "lines_cleared": state.lines_cleared_total,
+        "end_reason": end_reason,
+    }
+
+
+def _play_chunk(args):
+    seeds, policy_name, rules, max_moves = args
+    return [play_game(seed, policy_name, rules, max_moves) for seed in seeds]
+
+
+# разбивает диапазон сидов на куски, чтобы не гонять каждую партию через межпроцессный обмен
+def _chunks(seeds, chunk_size):
+    for start in range(0, len(seeds), chunk_size):
+        yield seeds[start:start + chunk_size]
+
+
+# отдает результаты по мере готовности; порядок партий не гарантирован, но сами партии детерминированы
+def run_batch(seeds, policy_name="random", workers=None, rules=None, max_moves=DEFAULT_MAX_MOVES, chunk_size=None):
+    seeds = list(seeds)
+    workers = workers or os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, min(256, len(seeds) // (workers * 8) or 1))
+    tasks = [(chunk, policy_name, rules, max_moves) for chunk in _chunks(seeds, chunk_size)]
+
+    if workers == 1:
+        for task in tasks:
+            yield from _play_chunk(task)
+        return
+
+    with multiprocessing.Pool(workers) as pool:
+        for chunk_results in pool.imap_unordered(_play_chunk, tasks):
+            yield from chunk_results
+
+
+# сводный отчет по потоку результатов
+class BatchReport:
+    def __init__(self):
+        self.scores = []
+        self.moves = []
+        self.lines = []
+        self.end_reasons = {}
+
+    def add(self, result):
+        self.scores.append(result["score"])
+        self.moves.append(result["moves"])
+        self.lines.append(result["lines_cleared"])
+        self.end_reasons[result["end_reason"]] = self.end_reasons.get(result["end_reason"], 0) + 1
+
+    def summary(self):
+        if not self.scores:
+            return {"games": 0}
+        return {
+            "games": len(self.scores),
+            "score_mean": statistics.fmean(self.scores),
+            "score_median": statistics.median(self.scores),
+            "score_max": max(self.scores),
+            "moves_mean": statistics.fmean(self.moves),
+            "lines_mean": statistics.fmean(self.lines),
+            "end_reasons": dict(self.end_reasons),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетная самоигра Block Blast")
+    parser.add_argument("--seeds", default="0:1000", help="диапазон сидов start:stop")
+    parser.add_argument("--policy", default="random", choices=sorted(POLICIES))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-moves", type=int, default=DEFAULT_MAX_MOVES)
+    parser.add_argument("--rules", default=None, help="файл правил варианта игры (JSON)")
+    parser.add_argument("--line-points", type=int, default=None, help="очки за одну очищенную линию")
+    parser.add_argument("--generator", choices=sorted(GENERATORS),
+                        help="генератор раздач вместо заданного в правилах (по умолчанию uniform)")
+    parser.add_argument("--results", default=None, help="файл для построчного JSON по каждой партии")
+    args = parser.parse_args(argv)
+
+    start_seed, stop_seed = (int(part) for part in args.seeds.split(":"))
+    rules = load_rules(args.rules).as_dict() if args.rules else {}
+    if args.line_points is not None:
+        rules["line_clear_points"] = args.line_points
+    if args.generator:
+        rules["generator"] = make_generator(args.generator).spec()
+
+    report = BatchReport()
+    results_file = open(args.results, "w") if args.results else None
+    start = time.perf_counter()
+    try:
+        for result in run_batch(range(start_seed, stop_seed), args.policy, args.workers, rules, args.max_moves):
+            report.add(result)
+            if results_file:
+                results_file.write(json.dumps(result) + "\n")
+    finally:
+        if results_file:
+            results_file.close()
+    elapsed = time.perf_counter() - start
+
+    summary = report.summary()
+    summary["seconds"] = round(elapsed, 3)
+    summary["games_per_second"] = round(summary["games"] / elapsed, 1) if elapsed else None
+    json.dump(summary, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
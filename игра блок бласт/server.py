@@ -0,0 +1,447 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+
+from batch_eval import trays_fit
+from game_state import GRID_SIZE, GameState
+from profiler import percentile
+from rules import load_rules
+
+# сервер партий для турниров: тысячи партий без окна в одном процессе, каждая - своя задача
+# одного цикла asyncio со своей очередью команд. клиенты говорят строками JSON через локальный
+# сокет (TCP на 127.0.0.1 или Unix-сокет), на каждую строку приходит строка ответа:
+#   {"op": "new", "seed": 1}                                      -> номер партии, поле и лоток
+#   {"op": "legal", "session": 7}                                 -> все ходы [блок, строка, столбец]
+#   {"op": "move", "session": 7, "block": 0, "row": 3, "col": 4}  -> очки, линии, game_over
+#   {"op": "undo", "session": 7}, {"op": "state", "session": 7}, {"op": "close", "session": 7}
+#   {"op": "stats"}                                               -> метрики сервера
+# поле "id" из запроса возвращается в ответе: запросы одного соединения можно слать не дожидаясь
+# ответов, ответы разных партий приходят по мере готовности, одной партии - по порядку.
+# индекса допустимых мест у партий нет: конец игры после ходов всех партий за один проход цикла
+# проверяется одним пакетом на NumPy (batch_eval.trays_fit).
+#   python server.py --unix /tmp/block_blast.sock --rules variant.json
+#   python server.py --unix /tmp/block_blast.sock --load 2000 --seconds 30
+
+DEFAULT_PORT = 8765
+# последние задержки: по всему серверу и по каждой партии
+LATENCY_HISTORY = 100000
+SESSION_LATENCY_HISTORY = 256
+# темп, для которого считается sessions_per_core: ходов в секунду на одну партию
+DEFAULT_SESSION_RATE = 1.0
+DEFAULT_LOAD_CONNECTIONS = 16
+SESSION_OPS = ("new", "legal", "move", "undo", "state", "close")
+
+
+# партия на сервере: состояние игры, очередь команд и задержки ответов
+class ServerSession(GameState):
+    track_placements = False
+
+    def __init__(self, session_id, seed, rules=None):
+        self.session_id = session_id
+        self.seed = seed
+        self.queue = asyncio.Queue()
+        self.latencies = deque(maxlen=SESSION_LATENCY_HISTORY)
+        super().__init__(random.Random(seed), rules=rules)
+
+    # конец игры выставляет GameOverBatcher после каждого хода
+    def check_if_game_is_over(self):
+        return False
+
+    def tray(self):
+        return [list(map(list, block_shape)) for block_shape in self.available_blocks]
+
+    def grid_rows(self):
+        return ["".join("#" if self.grid.is_occupied(r, c) else "." for c in range(self.grid_size))
+                for r in range(self.grid_size)]
+
+    def summary(self):
+        return {"ok": True, "session": self.session_id, "score": self.score, "moves": self.moves_made,
+                "game_over": self.game_over}
+
+
+# проверки конца игры собираются со всех партий, пока цикл не дойдет до задачи проверки,
+# и считаются одним вызовом trays_fit
+class GameOverBatcher:
+    def __init__(self, grid_size):
+        self.grid_size = grid_size
+        self.pending = []
+        self.wakeup = asyncio.Event()
+        self.batches = 0
+        self.checked = 0
+
+    def check(self, session):
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((session, future))
+        self.wakeup.set()
+        return future
+
+    async def run(self):
+        while True:
+            await self.wakeup.wait()
+            # еще один проход цикла: партии, которые уже получили команды, успевают встать в пакет
+            await asyncio.sleep(0)
+            self.wakeup.clear()
+            pending, self.pending = self.pending, []
+            fits = trays_fit([session.grid.occupancy for session, _ in pending],
+                             [session.available_blocks for session, _ in pending], self.grid_size)
+            for (session, future), any_fits in zip(pending, fits):
+                session.game_over = not any_fits
+                if not future.done():
+                    future.set_result(session.game_over)
+            self.batches += 1
+            self.checked += len(pending)
+
+
+def int_field(command, name):
+    value = command.get(name)
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError(f"Поле {name} должно быть целым числом")
+    return value
+
+
+# уже готовый ответ с ошибкой, в том же виде, что и ответы партий
+def error_future(message):
+    future = asyncio.get_running_loop().create_future()
+    future.set_result({"ok": False, "error": message})
+    return future
+
+
+class GameServer:
+    def __init__(self, rules=None, session_rate=DEFAULT_SESSION_RATE, seed=None):
+        self.rules = rules or {}
+        self.grid_size = self.rules.get("grid_size", GRID_SIZE)
+        self.session_rate = session_rate
+        self.rng = random.Random(seed)
+        self.sessions = {}
+        self.next_session_id = 1
+        self.batcher = None
+        self.latencies = deque(maxlen=LATENCY_HISTORY)
+        # p95 задержки уже закрытых партий
+        self.closed_p95 = deque(maxlen=LATENCY_HISTORY)
+        self.counts = {"sessions_opened": 0, "commands": 0, "moves": 0, "games_over": 0, "errors": 0}
+        self.started_at = time.perf_counter()
+        self.cpu_started_at = time.process_time()
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT, unix_path=None):
+        self.batcher = GameOverBatcher(self.grid_size)
+        self.batcher_task = asyncio.ensure_future(self.batcher.run())
+        if unix_path:
+            if os.path.exists(unix_path):
+                os.unlink(unix_path)
+            return await asyncio.start_unix_server(self.handle_connection, unix_path)
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_id = session = None
+                try:
+                    # слишком длинная строка - ValueError, буфер при этом уже сброшен
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    received = time.perf_counter()
+                    command = json.loads(line)
+                    if not isinstance(command, dict):
+                        raise ValueError("Запрос должен быть объектом JSON")
+                    request_id = command.get("id")
+                    session, future = self.dispatch(command)
+                except ConnectionError:
+                    raise
+                except ValueError as error:
+                    received = time.perf_counter()
+                    future = error_future(str(error))
+                except Exception as error:
+                    # неожиданная ошибка в разборе запроса не рвет соединение: клиент получает ответ
+                    received = time.perf_counter()
+                    future = error_future(f"Ошибка сервера: {error!r}")
+                future.add_done_callback(lambda done, request_id=request_id, session=session, received=received:
+                                         self.reply(writer, done.result(), request_id, session, received))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def reply(self, writer, response, request_id, session, received):
+        latency = time.perf_counter() - received
+        self.latencies.append(latency)
+        if session is not None:
+            session.latencies.append(latency)
+        if not response.get("ok"):
+            self.counts["errors"] += 1
+        if request_id is not None:
+            response["id"] = request_id
+        if not writer.is_closing():
+            writer.write((json.dumps(response) + "\n").encode())
+
+    # команда ставится в очередь партии; результат - (партия или None, будущий ответ)
+    def dispatch(self, command):
+        self.counts["commands"] += 1
+        op = command.get("op")
+        if op == "stats":
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(self.stats())
+            return None, future
+        if op not in SESSION_OPS:
+            raise ValueError(f"Неизвестная команда: {op}")
+        if op == "new":
+            session = self.open_session(command)
+        else:
+            session_id = int_field(command, "session")
+            session = self.sessions.get(session_id)
+            if session is None:
+                raise ValueError(f"Нет партии {session_id}")
+        future = asyncio.get_running_loop().create_future()
+        session.queue.put_nowait((op, command, future))
+        return session, future
+
+    def open_session(self, command):
+        seed = command.get("seed")
+        if seed is None:
+            seed = self.rng.getrandbits(32)
+        elif not isinstance(seed, int) or isinstance(seed, bool):
+            raise ValueError("Поле seed должно быть целым числом")
+        session = ServerSession(self.next_session_id, seed, self.rules)
+        self.next_session_id += 1
+        self.sessions[session.session_id] = session
+        self.counts["sessions_opened"] += 1
+        session.task = asyncio.ensure_future(self.run_session(session))
+        return session
+
+    # задача партии: команды по одной из очереди, пока партию не закроют
+    async def run_session(self, session):
+        while True:
+            op, command, future = await session.queue.get()
+            try:
+                response = await self.execute(session, op, command)
+            except ValueError as error:
+                response = {"ok": False, "error": str(error)}
+            except Exception as error:
+                # ошибка одной команды не останавливает задачу партии
+                response = {"ok": False, "error": f"Ошибка сервера: {error!r}"}
+            future.set_result(response)
+            if op == "close":
+                break
+        # команды, пришедшие вслед за close
+        while not session.queue.empty():
+            session.queue.get_nowait()[2].set_result({"ok": False, "error": f"Партия {session.session_id} закрыта"})
+
+    async def execute(self, session, op, command):
+        if op == "new":
+            await self.batcher.check(session)
+            return dict(session.summary(), seed=session.seed, grid=session.grid_rows(), tray=session.tray())
+        if op == "state":
+            return dict(session.summary(), grid=session.grid_rows(), tray=session.tray())
+        if op == "legal":
+            moves = [] if session.game_over else session.legal_moves()
+            return {"ok": True, "session": session.session_id, "moves": [list(move) for move in moves]}
+        if op == "move":
+            if session.game_over:
+                raise ValueError("Партия окончена")
+            block_index = int_field(command, "block")
+            if not 0 <= block_index < len(session.available_blocks):
+                raise ValueError(f"Нет блока {block_index} в лотке")
+            score_before = session.score
+            tray_before = session.available_blocks
+            _, lines = session.play_move(block_index, int_field(command, "row"), int_field(command, "col"))
+            self.counts["moves"] += 1
+            if await self.batcher.check(session):
+                self.counts["games_over"] += 1
+            response = dict(session.summary(), points=session.score - score_before, lines=lines)
+            # после раздачи лоток - новый список
+            if session.available_blocks is not tray_before:
+                response["tray"] = session.tray()
+            return response
+        if op == "undo":
+            if not session.undo():
+                raise ValueError("Нечего отменять")
+            await self.batcher.check(session)
+            return dict(session.summary(), grid=session.grid_rows(), tray=session.tray())
+        # close
+        del self.sessions[session.session_id]
+        if session.latencies:
+            self.closed_p95.append(percentile(sorted(session.latencies), 95))
+        return session.summary()
+
+    def stats(self):
+        wall = time.perf_counter() - self.started_at
+        cpu = time.process_time() - self.cpu_started_at
+        ordered = sorted(self.latencies)
+        # у каждой партии свой p95, по ним - распределение между открытыми и недавно закрытыми партиями
+        session_p95 = sorted([percentile(sorted(session.latencies), 95)
+                              for session in self.sessions.values() if session.latencies] + list(self.closed_p95))
+        moves_per_cpu_second = self.counts["moves"] / cpu if cpu > 0 else 0.0
+
+        def ms(value):
+            return round(value * 1000, 3)
+
+        return dict(self.counts, **{
+            "ok": True,
+            "sessions": len(self.sessions),
+            "wall_s": round(wall, 3),
+            "cpu_s": round(cpu, 3),
+            "cpu_count": os.cpu_count(),
+            "latency_ms": {"p50": ms(percentile(ordered, 50)), "p95": ms(percentile(ordered, 95)),
+                           "p99": ms(percentile(ordered, 99)), "max": ms(ordered[-1] if ordered else 0.0)},
+            "session_p95_ms": {"p50": ms(percentile(session_p95, 50)), "p99": ms(percentile(session_p95, 99)),
+                               "max": ms(session_p95[-1] if session_p95 else 0.0)},
+            "game_over_batches": self.batcher.batches if self.batcher else 0,
+            "game_over_batch_mean": round(self.batcher.checked / self.batcher.batches, 1)
+            if self.batcher and self.batcher.batches else 0.0,
+            "moves_per_second": round(self.counts["moves"] / wall, 1) if wall > 0 else 0.0,
+            "moves_per_cpu_second": round(moves_per_cpu_second, 1),
+            # сколько партий одно ядро тянет в темпе session_rate ходов в секунду
+            "session_rate": self.session_rate,
+            "sessions_per_core": round(moves_per_cpu_second / self.session_rate, 1),
+        })
+
+
+async def serve(args, rules):
+    server = GameServer(rules, args.session_rate, args.seed)
+    listener = await server.start(args.host, args.port, args.unix)
+    where = args.unix or f"{args.host}:{args.port}"
+    print(f"Сервер Block Blast слушает {where}", file=sys.stderr, flush=True)
+    async with listener:
+        while True:
+            await asyncio.sleep(args.stats_every or 3600)
+            if args.stats_every:
+                print(json.dumps(server.stats()), flush=True)
+
+
+# клиент: запросы с полем id, ответы разбираются одной задачей чтения
+class ServerClient:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.waiting = {}
+        self.next_id = 1
+        self.reader_task = asyncio.ensure_future(self.read_responses())
+
+    async def request(self, **command):
+        command["id"] = self.next_id
+        self.next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[command["id"]] = future
+        self.writer.write((json.dumps(command) + "\n").encode())
+        return await future
+
+    async def read_responses(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                future = self.waiting.pop(response.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        finally:
+            for future in self.waiting.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Сервер закрыл соединение"))
+
+    async def close(self):
+        self.writer.close()
+        self.reader_task.cancel()
+
+
+async def connect(host, port, unix_path):
+    if unix_path:
+        return ServerClient(*await asyncio.open_unix_connection(unix_path))
+    return ServerClient(*await asyncio.open_connection(host, port))
+
+
+# нагрузка: sessions партий со случайными ходами по connections соединениям, новая партия после конца
+async def run_load(args):
+    clients = [await connect(args.host, args.port, args.unix) for _ in range(args.connections)]
+    deadline = time.perf_counter() + args.seconds
+    round_trips = []
+    counts = {"games": 0, "moves": 0}
+
+    async def play(number):
+        client = clients[number % len(clients)]
+        rng = random.Random(f"{args.seed}:{number}")
+
+        async def request(**command):
+            start = time.perf_counter()
+            response = await client.request(**command)
+            round_trips.append(time.perf_counter() - start)
+            if not response.get("ok"):
+                raise ValueError(response.get("error"))
+            return response
+
+        while time.perf_counter() < deadline:
+            response = await request(op="new", seed=rng.getrandbits(32))
+            session, game_over = response["session"], response["game_over"]
+            counts["games"] += 1
+            while not game_over and time.perf_counter() < deadline:
+                moves = (await request(op="legal", session=session))["moves"]
+                block_index, grid_r, grid_c = rng.choice(moves)
+                game_over = (await request(op="move", session=session, block=block_index, row=grid_r,
+                                           col=grid_c))["game_over"]
+                counts["moves"] += 1
+            await request(op="close", session=session)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(play(number) for number in range(args.load)))
+    elapsed = time.perf_counter() - started
+    server_stats = await clients[0].request(op="stats")
+    for client in clients:
+        await client.close()
+    ordered = sorted(round_trips)
+    return {
+        "sessions": args.load,
+        "connections": args.connections,
+        "seconds": round(elapsed, 3),
+        "games": counts["games"],
+        "moves": counts["moves"],
+        "moves_per_second": round(counts["moves"] / elapsed, 1),
+        "round_trip_ms": {"p50": round(percentile(ordered, 50) * 1000, 3),
+                          "p95": round(percentile(ordered, 95) * 1000, 3),
+                          "p99": round(percentile(ordered, 99) * 1000, 3)},
+        "server": server_stats,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сервер партий Block Blast без окна")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="путь Unix-сокета вместо TCP")
+    parser.add_argument("--rules", help="файл правил варианта игры (JSON) для всех партий")
+    parser.add_argument("--seed", type=int, default=None, help="сид для партий без своего seed")
+    parser.add_argument("--session-rate", type=float, default=DEFAULT_SESSION_RATE,
+                        help="ходов в секунду на партию для расчета sessions_per_core")
+    parser.add_argument("--stats-every", type=float, default=0, help="печатать метрики раз в столько секунд")
+    parser.add_argument("--load", type=int, help="не сервер, а нагрузка: столько партий на уже запущенный сервер")
+    parser.add_argument("--connections", type=int, default=DEFAULT_LOAD_CONNECTIONS, help="соединений для --load")
+    parser.add_argument("--seconds", type=float, default=10.0, help="сколько секунд длится --load")
+    args = parser.parse_args(argv)
+    if args.session_rate <= 0:
+        parser.error("--session-rate должен быть больше нуля")
+
+    if args.load:
+        try:
+            report = asyncio.run(run_load(args))
+        except (ConnectionError, OSError) as error:
+            print(f"Не удалось подключиться к серверу: {error}", file=sys.stderr)
+            return 1
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0
+
+    rules = load_rules(args.rules).as_dict() if args.rules else {}
+    try:
+        asyncio.run(serve(args, rules))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
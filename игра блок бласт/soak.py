@@ -0,0 +1,136 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+# окно и звук - пустые драйверы SDL, как в bench_suite
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from bench_suite import make_game
+from input_source import ScriptedInput, SyntheticPlayer
+
+# долгий прогон настоящего цикла игры (run_game) с синтетическим игроком и без ограничения
+# частоты кадров. раз в report_every кадров печатается строка JSON: скорость, память процесса
+# и размеры всего, что может расти (частицы, журнал ходов, кэши спрайтов, очереди потоков).
+# если память после разогрева выросла больше чем на max_growth_mb, код выхода 1:
+#   python soak.py --minutes 60 --report-every 20000
+
+DEFAULT_REPORT_EVERY = 5000
+DEFAULT_MAX_GROWTH_MB = 64.0
+# первый отчет - точка отсчета для роста памяти: кэши к этому времени уже заполнены
+WARMUP_REPORTS = 1
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        # пик вместо текущего значения, в килобайтах на Linux и в байтах на macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+class SoakMonitor:
+    def __init__(self, game, player, frames=None, seconds=None, report_every=DEFAULT_REPORT_EVERY, out=None):
+        self.game = game
+        self.out = out or sys.stdout
+        self.player = player
+        self.frames = frames
+        self.seconds = seconds
+        self.report_every = report_every
+        self.started_at = time.perf_counter()
+        self.next_report = report_every
+        self.last_report = (self.started_at, 0)
+        self.reports = []
+        self.stopping = False
+
+    # обертка над синтетическим игроком: отчеты по ходу и выход, когда время или кадры кончились
+    def __call__(self, source):
+        if self.stopping:
+            source.frame()
+            return
+        frames = source.frames_polled
+        if frames >= self.next_report:
+            self.next_report += self.report_every
+            self.report(frames)
+        elapsed = time.perf_counter() - self.started_at
+        if (self.frames is not None and frames >= self.frames) or (self.seconds is not None and elapsed >= self.seconds):
+            self.stopping = True
+            if self.last_report[1] != frames:
+                self.report(frames)
+            source.quit()
+            return
+        self.player(source)
+
+    def report(self, frames):
+        game = self.game
+        now = time.perf_counter()
+        last_at, last_frames = self.last_report
+        self.last_report = (now, frames)
+        record = {
+            "elapsed_s": round(now - self.started_at, 1),
+            "frames": frames,
+            "fps": round((frames - last_frames) / (now - last_at), 1) if now > last_at else 0.0,
+            "rss_mb": round(rss_mb(), 1),
+            "particles": len(game.particles),
+            "history_moves": len(game.history.moves) if game.history else 0,
+            "block_sprites": len(game.block_sprites),
+            "particle_sprites": game.particles.sprite_count(),
+            "audio_queue": game.audio.commands.qsize(),
+            "score_queue": game.score_writer.queue.qsize() if game.score_writer else 0,
+            "score": game.score,
+        }
+        record.update(self.player.counts)
+        self.reports.append(record)
+        print(json.dumps(record), file=self.out, flush=True)
+
+    # рост памяти от конца разогрева до последнего отчета
+    def memory_growth_mb(self):
+        if len(self.reports) <= WARMUP_REPORTS:
+            return 0.0
+        return self.reports[-1]["rss_mb"] - self.reports[WARMUP_REPORTS - 1]["rss_mb"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Долгий прогон Block Blast с синтетическим игроком")
+    parser.add_argument("--minutes", type=float, help="сколько минут гонять")
+    parser.add_argument("--frames", type=int, help="сколько кадров гонять (по умолчанию 20000, если нет --minutes)")
+    parser.add_argument("--seed", type=int, default=0, help="сид синтетического игрока")
+    parser.add_argument("--report-every", type=int, default=DEFAULT_REPORT_EVERY, help="кадров между отчетами")
+    parser.add_argument("--max-growth-mb", type=float, default=DEFAULT_MAX_GROWTH_MB,
+                        help="допустимый рост памяти после разогрева")
+    args = parser.parse_args(argv)
+    frames = args.frames
+    if frames is None and args.minutes is None:
+        frames = 20000
+
+    data_dir = tempfile.TemporaryDirectory(prefix="block_blast_soak_")
+    # сообщения игры - в stderr, в stdout только строки отчетов
+    out = sys.stdout
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            game = make_game(data_dir.name)
+            monitor = SoakMonitor(game, SyntheticPlayer(game, args.seed), frames,
+                                  args.minutes * 60 if args.minutes is not None else None, args.report_every, out)
+            game.input = ScriptedInput(monitor)
+            asyncio.run(game.run_game())
+    finally:
+        data_dir.cleanup()
+
+    growth = monitor.memory_growth_mb()
+    print(json.dumps({"memory_growth_mb": round(growth, 1), "max_growth_mb": args.max_growth_mb}), flush=True)
+    if growth > args.max_growth_mb:
+        print(f"Память выросла на {growth:.1f} МБ после разогрева", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
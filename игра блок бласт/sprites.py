@@ -0,0 +1,84 @@
+import pygame
+
+# заранее нарисованные спрайты: блоки во всех цветах и прозрачностях и подложка поля.
+# в кадре остаются только blit, без создания поверхностей
+
+
+# функция затемнения цвета
+def darken_color(color, factor=0.7):
+    return tuple(int(c * factor) for c in color)
+
+
+# один блок с 3D-эффектом на прозрачной поверхности; рисуется так же, как раньше рисовался прямо на экран
+def render_3d_block(cell_size, color, alpha, shadow_color, overhang):
+    surface = pygame.Surface((cell_size + overhang, cell_size + overhang), pygame.SRCALPHA)
+    surface.fill(shadow_color, (overhang, overhang, cell_size, cell_size))
+    surface.fill((*color, alpha), (1, 1, cell_size - 2, cell_size - 2))
+
+    # там, где полупрозрачный блок лежит на тени, цвет и прозрачность смешиваем сами,
+    # чтобы при выводе на экран получилось то же, что и при двух отдельных blit
+    if alpha < 255:
+        block_a = alpha / 255
+        shadow_a = shadow_color[3] / 255
+        out_a = block_a + shadow_a * (1 - block_a)
+        mixed = tuple(round((c * block_a + s * shadow_a * (1 - block_a)) / out_a)
+                      for c, s in zip(color, shadow_color[:3]))
+        surface.fill((*mixed, round(out_a * 255)), (overhang, overhang, cell_size - 1 - overhang, cell_size - 1 - overhang))
+
+    # боковые грани выступают на overhang - при клетке 50 это прежние 5 пикселей
+    dark_color = darken_color(color)
+    pygame.draw.polygon(surface, dark_color, [
+        (cell_size - 2, 1),
+        (cell_size - 2, cell_size - 2),
+        (cell_size - 2 + overhang, cell_size - 2 - overhang),
+        (cell_size - 2 + overhang, 1 + overhang)
+    ])
+    pygame.draw.polygon(surface, dark_color, [
+        (1, cell_size - 2),
+        (cell_size - 2, cell_size - 2),
+        (cell_size - 2 + overhang, cell_size - 2 - overhang),
+        (1 + overhang, cell_size - 2 - overhang)
+    ])
+    return surface.convert_alpha()
+
+
+# атлас блоков: ключ (цвет, прозрачность), новые варианты дорисовываются один раз при первом запросе
+class BlockSprites:
+    def __init__(self, cell_size, shadow_color, overhang, colors=(), alphas=(255,)):
+        self.cell_size = cell_size
+        self.shadow_color = shadow_color
+        self.overhang = overhang
+        self.sprites = {}
+        for color in colors:
+            for alpha in alphas:
+                self.get(color, alpha)
+
+    def get(self, color, alpha=255):
+        key = (tuple(color), alpha)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = render_3d_block(self.cell_size, key[0], alpha, self.shadow_color, self.overhang)
+            self.sprites[key] = sprite
+        return sprite
+
+    def __len__(self):
+        return len(self.sprites)
+
+
+# подложка поля: полупрозрачный фон и линии сетки одной поверхностью
+def render_grid_backdrop(grid_size, cell_size, background_color, line_color):
+    side = grid_size * cell_size
+    surface = pygame.Surface((side + 1, side + 1), pygame.SRCALPHA)
+    surface.fill(background_color, (0, 0, side, side))
+    for i in range(grid_size + 1):
+        pygame.draw.line(surface, line_color, (0, i * cell_size), (side, i * cell_size), 1)
+        pygame.draw.line(surface, line_color, (i * cell_size, 0), (i * cell_size, side), 1)
+    return surface.convert_alpha()
+
+
+# подсветка одной клетки под перетаскиваемым блоком
+def render_cell_highlight(cell_size, fill_color, border_color):
+    surface = pygame.Surface((cell_size, cell_size), pygame.SRCALPHA)
+    surface.fill(fill_color)
+    pygame.draw.rect(surface, border_color, (0, 0, cell_size, cell_size), 3)
+    return surface.convert_alpha()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# модули игры лежат плоско в папке над tests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
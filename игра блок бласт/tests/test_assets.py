@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+import pytest
+
+from assets import BACKGROUND_CACHE_SIZES, AssetManager
+
+# перетаскивание края окна: фон под новый размер декодируется один раз, когда размер перестал
+# меняться, а не на каждом шаге, и кэш на диске не растет с каждым размером
+
+ASSET_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def assets(tmp_path):
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+    yield AssetManager(ASSET_DIR, cache_dir=str(tmp_path))
+    pygame.display.quit()
+
+
+def background_threads():
+    return sum(thread.name.endswith("(_decode_background)") for thread in threading.enumerate())
+
+
+# шаги перетаскивания раз в step_ms; возвращает, сколько потоков декодирования запустилось по пути
+def drag(assets, sizes, step_ms, delay_ms):
+    started = len(assets.threads)
+    background = assets.load_background("eee.jpg", sizes[0], (0, 0, 0))
+    for size in sizes[1:]:
+        time.sleep(step_ms / 1000)
+        assets.poll()
+        background = assets.load_background("eee.jpg", size, (0, 0, 0), background, delay_ms)
+        assert background.get_size() == size
+        assert background_threads() <= 1
+    return len(assets.threads) - started
+
+
+def settle(assets, size):
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        for kind, _, value in assets.poll():
+            if kind == "background" and value.get_size() == size:
+                return value
+        time.sleep(0.01)
+    raise AssertionError("фон не загрузился")
+
+
+def test_drag_decodes_once_after_size_settles(assets, tmp_path):
+    sizes = [(400 + 10 * step, 500 + 10 * step) for step in range(20)]
+    assets.load_background("eee.jpg", sizes[0], (0, 0, 0))
+    settle(assets, sizes[0])
+    # кэш пишется уже после того, как фон отдан в poll()
+    assets.wait()
+
+    assert drag(assets, sizes, step_ms=16, delay_ms=200) == 0
+    assert settle(assets, sizes[-1]).get_size() == sizes[-1]
+    # всего два декодирования: первый размер и последний
+    assets.wait()
+    assert len(assets.threads) == 2
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_stale_decode_is_dropped(assets):
+    sizes = [(300 + 7 * step, 300) for step in range(15)]
+    drag(assets, sizes, step_ms=5, delay_ms=0)
+    assert settle(assets, sizes[-1]).get_size() == sizes[-1]
+    assets.wait()
+    assert not assets.pending()
+    assert all(value.get_size() == sizes[-1] for kind, _, value in assets.poll() if kind == "background")
+
+
+def test_cache_keeps_recent_sizes(assets, tmp_path):
+    (tmp_path / "eee_extra.rgb").write_bytes(b"")
+    sizes = [(200 + step, 200) for step in range(6)]
+    for size in sizes:
+        assets.load_background("eee.jpg", size, (0, 0, 0))
+        settle(assets, size)
+        assets.wait()
+    cached = sorted(entry for entry in os.listdir(tmp_path) if entry != "eee_extra.rgb")
+    assert len(cached) == BACKGROUND_CACHE_SIZES
+    assert all(entry.startswith(f"eee_{size[0]}x{size[1]}_") for entry, size in zip(cached, sizes[-3:]))
+    assert os.path.exists(tmp_path / "eee_extra.rgb")
+
+    # размер из кэша приходит сразу и сам считается нужным последним
+    assets.load_background("eee.jpg", sizes[-3], (0, 0, 0))
+    assets.load_background("eee.jpg", (199, 200), (0, 0, 0))
+    settle(assets, (199, 200))
+    assets.wait()
+    remaining = os.listdir(tmp_path)
+    assert any(entry.startswith(f"eee_{sizes[-3][0]}x200_") for entry in remaining)
+    assert not any(entry.startswith(f"eee_{sizes[-2][0]}x200_") for entry in remaining)
@@ -0,0 +1,86 @@
+import random
+
+import numpy as np
+import pytest
+
+from batch_eval import boards_to_occupancies, evaluate_placements, occupancy_to_boards, place_batch, trays_fit
+from bitboard import BitGrid
+from game_state import BLOCK_SHAPES, COLORS, LINE_CLEAR_POINTS
+
+# пакетная оценка на NumPy должна совпадать с BitGrid ход в ход: доски после постановки,
+# линии, очки и допустимость. поле 8x8 идет через упакованные uint64, 10x10 - через bool
+
+
+def make_grids(count, size, seed):
+    rng = random.Random(seed)
+    grids = []
+    for _ in range(count):
+        bit_grid = BitGrid(size)
+        bit_grid.fill_random(rng.choice([0.3, 0.6, 0.85, 0.95]), COLORS, rng)
+        grids.append(bit_grid)
+    return grids
+
+
+@pytest.mark.parametrize("size", [8, 10])
+def test_occupancy_round_trip(size):
+    grids = make_grids(40, size, size)
+    occupancies = [bit_grid.occupancy for bit_grid in grids]
+    assert boards_to_occupancies(occupancy_to_boards(occupancies, size)) == occupancies
+
+
+@pytest.mark.parametrize("size", [8, 10])
+def test_trays_fit_matches_any_fits(size):
+    rng = random.Random(size + 1)
+    grids = make_grids(200, size, size + 1)
+    trays = [[rng.choice(BLOCK_SHAPES) for _ in range(3)] for _ in grids]
+    expected = [bit_grid.any_fits(tray) for bit_grid, tray in zip(grids, trays)]
+    assert trays_fit([bit_grid.occupancy for bit_grid in grids], trays, size).tolist() == expected
+
+
+@pytest.mark.parametrize("size", [8, 10])
+@pytest.mark.parametrize("shape_number", range(len(BLOCK_SHAPES)))
+def test_evaluate_placements_matches_bitgrid(size, shape_number):
+    block_shape = BLOCK_SHAPES[shape_number]
+    grids = make_grids(30, size, size * 100 + shape_number)
+    stack = occupancy_to_boards([bit_grid.occupancy for bit_grid in grids], size)
+    batch = evaluate_placements(stack, block_shape)
+    anchors = [tuple(anchor) for anchor in batch.anchors.tolist()]
+    after = boards_to_occupancies(batch.boards.reshape(-1, size, size))
+    for n, bit_grid in enumerate(grids):
+        assert {anchor for anchor, legal in zip(anchors, batch.legal[n]) if legal} \
+            == set(bit_grid.legal_anchors(block_shape))
+        for a, (grid_r, grid_c) in enumerate(anchors):
+            if not batch.legal[n, a]:
+                assert after[n * len(anchors) + a] == bit_grid.occupancy
+                continue
+            grid = bit_grid.copy()
+            placed = grid.place(block_shape, grid_r, grid_c, None)
+            rows, cols = grid.find_full_lines()
+            grid.clear_lines(rows, cols)
+            lines = len(rows) + len(cols)
+            assert after[n * len(anchors) + a] == grid.occupancy
+            assert batch.lines[n, a] == lines
+            assert batch.score_delta[n, a] == placed + lines * LINE_CLEAR_POINTS
+
+
+# одна постановка на доску, включая заведомо недопустимые якоря
+@pytest.mark.parametrize("size", [8, 10])
+@pytest.mark.parametrize("shape_number", range(len(BLOCK_SHAPES)))
+def test_place_batch_matches_evaluate_placements(size, shape_number):
+    block_shape = BLOCK_SHAPES[shape_number]
+    rng = random.Random(size * 100 + shape_number)
+    grids = make_grids(30, size, size * 100 + shape_number)
+    stack = occupancy_to_boards([bit_grid.occupancy for bit_grid in grids], size)
+    batch = evaluate_placements(stack, block_shape)
+    anchors = [tuple(anchor) for anchor in batch.anchors.tolist()]
+    rows = [rng.randrange(-1, size) for _ in grids]
+    cols = [rng.randrange(-1, size) for _ in grids]
+    placed_boards, lines, score_delta, legal = place_batch(stack, block_shape, rows, cols)
+    for n, bit_grid in enumerate(grids):
+        assert legal[n] == bit_grid.can_place(block_shape, rows[n], cols[n])
+        if legal[n]:
+            a = anchors.index((rows[n], cols[n]))
+            assert np.array_equal(placed_boards[n], batch.boards[n, a])
+            assert lines[n] == batch.lines[n, a] and score_delta[n] == batch.score_delta[n, a]
+        else:
+            assert np.array_equal(placed_boards[n], stack[n]) and lines[n] == 0 and score_delta[n] == 0
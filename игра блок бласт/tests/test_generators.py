@@ -0,0 +1,35 @@
+import random
+
+import pytest
+
+from game_state import BLOCK_SHAPES, COLORS, TRAY_SIZE, GameState
+from generators import DEFAULT_GENERATOR, make_generator
+
+# раздачи по сиду: генератор по умолчанию тратит rng так же, как раздача до генераторов,
+# поэтому старые сиды дают те же партии; fair включается только явно
+
+
+def test_default_generator_is_uniform():
+    assert DEFAULT_GENERATOR == "uniform"
+    assert GameState(random.Random(0)).generator.name == "uniform"
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_default_deal_matches_plain_rng_draws(seed):
+    state = GameState(random.Random(seed))
+    rng = random.Random(seed)
+    blocks = [rng.choice(BLOCK_SHAPES) for _ in range(TRAY_SIZE)]
+    colors = [rng.choice(COLORS) for _ in range(TRAY_SIZE)]
+    assert state.available_blocks == blocks
+    assert state.available_colors == colors
+
+
+# на почти полном поле fair заменяет лоток так, чтобы хотя бы один блок помещался
+@pytest.mark.parametrize("seed", range(20))
+def test_fair_generator_guarantees_a_placeable_block(seed):
+    rng = random.Random(seed)
+    state = GameState(random.Random(seed), rules={"generator": "fair"})
+    state.grid.fill_random(0.9, state.colors, rng)
+    blocks, _ = make_generator({"name": "fair"}).deal(state, TRAY_SIZE)
+    if state.grid.fitting_shapes(state.block_shapes):
+        assert state.grid.any_fits(blocks)
@@ -0,0 +1,76 @@
+import random
+
+import pytest
+
+from game_state import GameState
+from history import take_snapshot
+from replay import ReplayRecorder, ReplayState, parse_replay, verify_replay
+
+# журнал ходов: после случайных undo, redo и seek состояние совпадает с записанным по ходу
+# партии, индекс мест - с перебором, а реплей с отменами воспроизводится заново
+
+
+def recorded_game(seed, rules=None):
+    state = GameState(rules=rules)
+    state.rng = random.Random(seed)
+    state.recorder = ReplayRecorder(seed, state.grid_size, state.block_shapes, state.colors)
+    state.reset_game_state()
+    return state
+
+
+def check_walk(state, expected, rng, steps=200):
+    for _ in range(steps):
+        action = rng.random()
+        if action < 0.4:
+            state.undo()
+        elif action < 0.8:
+            state.redo()
+        else:
+            state.seek(rng.randrange(len(expected)))
+        assert take_snapshot(state) == expected[state.history.cursor]
+        assert not state.grid.placement_index.mismatches(state.grid.occupancy)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_undo_redo_seek_match_recorded_states(seed):
+    rng = random.Random(seed + 100)
+    state = recorded_game(seed)
+    expected = [take_snapshot(state)]
+    while not state.game_over:
+        state.play_move(*rng.choice(state.legal_moves()))
+        expected.append(take_snapshot(state))
+    check_walk(state, expected, rng)
+
+    # с середины партия уходит в другую сторону, а реплей с отменами должен воспроизвестись
+    state.seek(len(expected) // 2)
+    while not state.game_over:
+        state.play_move(*rng.choice(state.legal_moves()))
+    result = verify_replay(parse_replay(state.recorder.to_bytes(state.score, True)))
+    assert result["ok"] and not result["deal_mismatches"], result
+
+
+# реплей, записанный с другим генератором: раздачи в нем не совпадают с тем, что раздал бы
+# генератор по умолчанию. отмена и повтор через раздачу должны вернуть лоток из реплея
+@pytest.mark.parametrize("seed", range(6))
+def test_undo_across_replayed_deal_restores_replayed_tray(seed):
+    rng = random.Random(seed + 200)
+    game = recorded_game(seed, {"generator": {"name": "fair", "size_weights": {"1": 0.1, "5": 5}}})
+    trays = [take_snapshot(game)]
+    while not game.game_over:
+        game.play_move(*rng.choice(game.legal_moves()))
+        trays.append(take_snapshot(game))
+    replay = parse_replay(game.recorder.to_bytes(game.score, True))
+
+    state = ReplayState(replay)
+    expected = [take_snapshot(state)]
+    for event in replay.actions():
+        if state.apply_replay_event(event) is not None:
+            expected.append(take_snapshot(state))
+    assert state.deal_mismatches > 0
+    assert expected == trays
+
+    while state.undo():
+        assert take_snapshot(state) == expected[state.history.cursor]
+    while state.redo():
+        assert take_snapshot(state) == expected[state.history.cursor]
+    check_walk(state, expected, rng, steps=100)
@@ -0,0 +1,98 @@
+import random
+
+import pytest
+
+from game_state import GameState
+from rules import rules_from_dict
+
+# индекс допустимых мест сверяется с перебором после каждого хода случайных партий по сиду:
+# ходы с очисткой линий снимают занятость, и индекс должен вернуть места обратно
+
+
+# место проверяется по клеткам, без масок и индекса
+def brute_can_place(state, block_shape, grid_r, grid_c):
+    for r, row in enumerate(block_shape):
+        for c, cell in enumerate(row):
+            if not cell:
+                continue
+            actual_r, actual_c = grid_r + r, grid_c + c
+            if not (0 <= actual_r < state.grid_size and 0 <= actual_c < state.grid_size):
+                return False
+            if state.grid.is_occupied(actual_r, actual_c):
+                return False
+    return True
+
+
+def brute_anchors(state, block_shape):
+    size = state.grid_size
+    return [(r, c) for r in range(-size, size) for c in range(-size, size)
+            if brute_can_place(state, block_shape, r, c)]
+
+
+def check_against_brute_force(state, rng):
+    grid = state.grid
+    assert not grid.placement_index.mismatches(grid.occupancy)
+    fits = {}
+    for block_shape in state.block_shapes:
+        brute = brute_anchors(state, block_shape)
+        assert sorted(grid.legal_anchors(block_shape)) == brute
+        fits[id(block_shape)] = bool(brute)
+        for _ in range(4):
+            grid_r = rng.randrange(-2, state.grid_size + 1)
+            grid_c = rng.randrange(-2, state.grid_size + 1)
+            assert grid.can_place(block_shape, grid_r, grid_c) == brute_can_place(state, block_shape, grid_r, grid_c)
+    tray = state.available_blocks
+    assert grid.any_fits(tray) == any(fits[id(block_shape)] for block_shape in tray)
+
+
+# случайный ход, но ход с очисткой линии берется первым: без очисток индекс только убывает
+def choose_move(state, rng):
+    moves = state.legal_moves()
+    rng.shuffle(moves)
+    for block_index, grid_r, grid_c in moves:
+        grid = state.grid.copy()
+        grid.place(state.available_blocks[block_index], grid_r, grid_c, None)
+        if any(grid.find_full_lines()):
+            return block_index, grid_r, grid_c
+    return moves[0]
+
+
+def play_and_check(state, rng):
+    lines = 0
+    while not state.game_over:
+        _, cleared = state.play_move(*choose_move(state, rng))
+        lines += cleared
+        check_against_brute_force(state, rng)
+    return lines
+
+
+@pytest.mark.parametrize("seed", range(12))
+def test_classic_games_match_brute_force(seed):
+    rng = random.Random(seed)
+    state = GameState(random.Random(seed))
+    check_against_brute_force(state, rng)
+    assert play_and_check(state, rng) > 0
+
+
+# на поле 10x10 с пентамино случайная партия бывает короткой и без очисток, поэтому линии
+# считаются по всем партиям сразу
+def test_large_board_with_rotated_pentominoes_matches_brute_force():
+    game_rules = rules_from_dict({"grid_size": 10, "packs": ["classic", "pentomino"], "rotate": True})
+    lines = 0
+    for seed in range(6):
+        rng = random.Random(seed)
+        state = GameState(random.Random(seed), rules=game_rules.as_dict())
+        lines += play_and_check(state, rng)
+    assert lines > 0
+
+
+# доски случайной заполненности: сразу много занятых клеток и почти полных линий
+@pytest.mark.parametrize("seed", range(6))
+def test_index_rebuilt_on_random_boards(seed):
+    rng = random.Random(seed)
+    state = GameState(random.Random(seed))
+    state.grid.fill_random(rng.choice([0.3, 0.6, 0.85]), state.colors, rng)
+    state.grid.placement_index.rebuild(state.grid.occupancy)
+    check_against_brute_force(state, rng)
+    if state.grid.any_fits(state.available_blocks):
+        play_and_check(state, rng)
@@ -0,0 +1,63 @@
+import json
+import random
+
+import pytest
+
+from game_state import GameState
+from replay import ReplayRecorder
+from rules import load_rules, rules_from_dict
+
+# файл правил: формы с пустыми краями обрезаются (иначе места в углу поля не пишутся в реплей),
+# а неверные поля дают ValueError при загрузке, а не ошибку посреди партии
+
+
+@pytest.mark.parametrize("block_shape, trimmed", [
+    ([[0, 0], [1, 1]], [[1, 1]]),
+    ([[0, 1], [0, 1]], [[1], [1]]),
+    ([[0, 0, 0], [0, 1, 0], [0, 0, 0]], [[1]]),
+])
+def test_empty_shape_edges_are_trimmed(block_shape, trimmed):
+    game_rules = rules_from_dict({"shapes": [block_shape]})
+    assert game_rules.block_shapes == [trimmed]
+    state = GameState(random.Random(0), rules=game_rules.as_dict())
+    recorder = ReplayRecorder(0, state.grid_size, state.block_shapes, state.colors)
+    block_index, grid_r, grid_c = state.legal_moves()[0]
+    assert (grid_r, grid_c) == (0, 0)
+    recorder.pick(block_index)
+    recorder.place(grid_r, grid_c)
+    state.play_move(block_index, grid_r, grid_c)
+
+
+@pytest.mark.parametrize("data", [
+    [1],
+    "classic",
+    {"line_clear_points": "x"},
+    {"line_clear_points": -1},
+    {"colors": [["a", "b", "c"]]},
+    {"colors": [[0, 0, 256]]},
+    {"colors": 5},
+    {"shapes": [[[2]]]},
+    {"shapes": 5},
+    {"shapes": [[[0, 0]]]},
+    {"packs": [["classic"]]},
+    {"packs": ["nope"]},
+    {"grid_size": 2},
+    {"rotate": "no"},
+    {"mirror": 1},
+    {"name": 5},
+    {"unknown": 1},
+])
+def test_malformed_rules_raise_value_error(data):
+    with pytest.raises(ValueError):
+        rules_from_dict(data)
+
+
+def test_load_rules_from_file(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"name": "big", "grid_size": 10, "packs": ["tetromino"], "rotate": True,
+                                "mirror": False}), encoding="utf-8")
+    game_rules = load_rules(str(path))
+    assert game_rules.name == "big"
+    assert game_rules.grid_size == 10
+    # I, O, T, S и L с поворотами: 2 + 1 + 4 + 2 + 4 различных формы
+    assert len(game_rules.block_shapes) == 13
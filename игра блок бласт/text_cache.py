@@ -0,0 +1,114 @@
+from collections import OrderedDict
+
+import pygame
+
+# кэш надписей с контуром: текст, контур и восемь сдвигов собираются в одну поверхность один раз,
+# дальше надпись выводится одним blit. для счета есть атлас цифр, чтобы новое число не требовало render
+
+DEFAULT_OUTLINE_OFFSETS = ((-2, -2), (-2, 2), (2, -2), (2, 2), (-1, -1), (-1, 1), (1, -1), (1, 1))
+DEFAULT_CAPACITY = 128
+
+
+# контур из сдвинутых копий на прозрачной поверхности; возвращает поверхность и сдвиг ее угла от позиции текста.
+# прозрачный фон заливается цветом контура, иначе при смешивании края букв темнели бы
+def render_outline_layer(font, text_str, outline_color, offsets):
+    outline_surface = font.render(text_str, True, outline_color)
+    text_w, text_h = outline_surface.get_size()
+    min_dx = min(dx for dx, _ in offsets)
+    min_dy = min(dy for _, dy in offsets)
+    max_dx = max(dx for dx, _ in offsets)
+    max_dy = max(dy for _, dy in offsets)
+    left, top = min(0, min_dx), min(0, min_dy)
+    width = text_w + max(0, max_dx) - left
+    height = text_h + max(0, max_dy) - top
+    layer = pygame.Surface((width, height), pygame.SRCALPHA)
+    layer.fill((*outline_color[:3], 0))
+    for dx, dy in offsets:
+        layer.blit(outline_surface, (dx - left, dy - top))
+    return layer, (left, top)
+
+
+# готовая надпись: контур и текст в одной поверхности
+def render_outlined_text(font, text_str, base_color, outline_color, offsets):
+    layer, corner = render_outline_layer(font, text_str, outline_color, offsets)
+    layer.blit(font.render(text_str, True, base_color), (-corner[0], -corner[1]))
+    return layer.convert_alpha(), corner
+
+
+# сдвиги контура под масштаб раскладки: ненулевой сдвиг при уменьшении остается хотя бы в пиксель,
+# совпавшие сдвиги склеиваются
+def scale_offsets(offsets, scale):
+    def scaled(value):
+        if value == 0:
+            return 0
+        return max(1, round(abs(value) * scale)) * (1 if value > 0 else -1)
+    return tuple(dict.fromkeys((scaled(dx), scaled(dy)) for dx, dy in offsets))
+
+
+class TextCache:
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # (поверхность, сдвиг угла, размер текста без контура)
+    def get(self, text_str, font, base_color, outline_color, offsets=DEFAULT_OUTLINE_OFFSETS):
+        offsets = tuple(map(tuple, offsets))
+        key = (text_str, font, tuple(base_color), tuple(outline_color), offsets)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+        self.misses += 1
+        surface, corner = render_outlined_text(font, text_str, base_color, outline_color, offsets)
+        entry = (surface, corner, font.size(text_str))
+        self.entries[key] = entry
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+        return entry
+
+    def __len__(self):
+        return len(self.entries)
+
+
+# атлас цифр для счета: контур и заливка каждой цифры отдельно. число рисуется в два прохода -
+# сначала контуры всех цифр, потом заливка, как и при выводе строки целиком
+class DigitAtlas:
+    def __init__(self, font, base_color, outline_color, offsets=DEFAULT_OUTLINE_OFFSETS, characters="0123456789"):
+        self.font = font
+        self.glyphs = {}
+        for character in characters:
+            outline, corner = render_outline_layer(font, character, outline_color, offsets)
+            fill = font.render(character, True, base_color).convert_alpha()
+            self.glyphs[character] = (outline.convert_alpha(), corner, fill)
+        self.layout_key = None
+        self.layout_x = []
+
+    def size(self, text_str):
+        return self.font.size(text_str)
+
+    # положение цифры: конец префикса с ней минус ее ширина. так учитываются кернинг и синтетический
+    # жирный шрифт, и цифры встают как при выводе строки целиком (font.size ничего не рисует).
+    # раскладка запоминается для последнего числа - счет меняется редко
+    def layout(self, text_str):
+        if self.layout_key != text_str:
+            size = self.font.size
+            self.layout_key = text_str
+            self.layout_x = [size(text_str[:i + 1])[0] - size(character)[0] for i, character in enumerate(text_str)]
+        return self.layout_x
+
+    def draw(self, screen, text_str, pos, is_centered=True):
+        x, y = pos
+        if is_centered:
+            text_w, text_h = self.size(text_str)
+            x, y = x - text_w // 2, y - text_h // 2
+        placed = [(self.glyphs[character], x + glyph_x) for character, glyph_x in zip(text_str, self.layout(text_str))]
+        for (outline, corner, _), glyph_x in placed:
+            screen.blit(outline, (glyph_x + corner[0], y + corner[1]))
+        for (_, _, fill), glyph_x in placed:
+            screen.blit(fill, (glyph_x, y))
+
+
+TEXT_CACHE = TextCache()
@@ -0,0 +1,43 @@
+# фиксированный шаг симуляции: реальное время копится в аккумуляторе и расходуется шагами
+# по step_ms, остаток дает долю для интерполяции отрисовки между двумя последними шагами.
+# за один кадр делается не больше max_steps шагов: если машина не успевает, лишнее время
+# отбрасывается, а не копится (иначе каждый следующий кадр был бы еще дольше)
+
+SIM_HZ = 60
+MAX_STEPS_PER_FRAME = 5
+# пауза длиннее этого (перетаскивание окна, отладчик) считается одним таким кадром
+MAX_FRAME_MS = 250
+
+
+class FixedTimestep:
+    def __init__(self, hz=SIM_HZ, max_steps=MAX_STEPS_PER_FRAME, max_frame_ms=MAX_FRAME_MS):
+        self.step_ms = 1000 / hz
+        self.max_steps = max_steps
+        self.max_frame_ms = max_frame_ms
+        self.accumulator = 0.0
+        self.steps_total = 0
+        # кадры, в которых пришлось делать больше одного шага (пропущенные отрисовки)
+        self.skipped_frames = 0
+        self.dropped_ms = 0.0
+
+    # сколько шагов симуляции сделать за кадр длиной elapsed_ms
+    def advance(self, elapsed_ms):
+        self.accumulator += min(elapsed_ms, self.max_frame_ms)
+        steps = min(int(self.accumulator // self.step_ms), self.max_steps)
+        self.accumulator -= steps * self.step_ms
+        if self.accumulator >= self.step_ms:
+            dropped = self.accumulator - self.accumulator % self.step_ms
+            self.dropped_ms += dropped
+            self.accumulator -= dropped
+        if steps > 1:
+            self.skipped_frames += steps - 1
+        self.steps_total += steps
+        return steps
+
+    # доля шага, прошедшая после последнего шага симуляции (0..1)
+    @property
+    def alpha(self):
+        return self.accumulator / self.step_ms
+
+    def reset(self):
+        self.accumulator = 0.0